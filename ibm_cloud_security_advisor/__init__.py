@@ -15,13 +15,67 @@
 
 """Python client library for the IBM Cloud Security Advisor Services"""
 
-from ibm_cloud_sdk_core import IAMTokenManager, DetailedResponse, BaseService, ApiException
+# The service modules are large and pull in ibm_cloud_sdk_core, so the names
+# exported here are imported on first access (PEP 562) rather than when the
+# package is imported.
+
+import importlib
+from typing import TYPE_CHECKING
 
-from .common import get_sdk_headers
 from .version import __version__
 
-#Findings
-from .findings_api_v1 import FindingsApiV1
+if TYPE_CHECKING:
+    from ibm_cloud_sdk_core import IAMTokenManager, DetailedResponse, BaseService, ApiException
+    from .common import get_sdk_headers
+    from .transport import Transport, RequestsTransport, TransportWrapper
+    from .findings_api_v1 import FindingsApiV1
+    from .notifications_api_v1 import NotificationsApiV1
+
+_FINDINGS_MODELS = (
+    'PostGraphEnums', 'Card', 'CardElement', 'Certainty', 'Context', 'DataTransferred', 'Finding',
+    'FindingCountValueType', 'FindingType', 'Kpi', 'KpiType', 'NetworkConnection', 'RemediationStep',
+    'Reporter', 'Section', 'Severity', 'SocketAddress', 'ValueType', 'ApiListNoteOccurrencesResponse',
+    'ApiListNotesResponse', 'ApiListOccurrencesResponse', 'ApiListProvidersResponse', 'ApiNote', 'ApiNoteKind',
+    'ApiNoteRelatedUrl', 'ApiOccurrence', 'ApiProvider', 'BreakdownCardElement', 'NumericCardElement',
+    'TimeSeriesCardElement'
+)
+
+_NOTIFICATIONS_MODELS = (
+    'ChannelAlertSourceItem', 'ChannelDelete', 'ChannelGet', 'ChannelGetChannel',
+    'ChannelGetChannelAlertSourceItem', 'ChannelGetChannelSeverity', 'ChannelInfo', 'ChannelSeverity',
+    'ChannelsDelete', 'ChannelsList', 'NotificationChannelAlertSourceItem', 'PublicKeyGet', 'TestChannel',
+    'Channel'
+)
+
+_LAZY_ATTRIBUTES = {
+    'IAMTokenManager': 'ibm_cloud_sdk_core',
+    'DetailedResponse': 'ibm_cloud_sdk_core',
+    'BaseService': 'ibm_cloud_sdk_core',
+    'ApiException': 'ibm_cloud_sdk_core',
+    'get_sdk_headers': '.common',
+    'Transport': '.transport',
+    'RequestsTransport': '.transport',
+    'TransportWrapper': '.transport',
+    #Findings
+    'FindingsApiV1': '.findings_api_v1',
+    #Notifications
+    'NotificationsApiV1': '.notifications_api_v1',
+}
+_LAZY_ATTRIBUTES.update((name, '.findings_api_v1') for name in _FINDINGS_MODELS)
+_LAZY_ATTRIBUTES.update((name, '.notifications_api_v1') for name in _NOTIFICATIONS_MODELS)
+
+__all__ = ['__version__'] + sorted(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError('module {0!r} has no attribute {1!r}'.format(__name__, name))
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    # Cache the value so that later lookups do not go through __getattr__.
+    globals()[name] = value
+    return value
+
 
-#Notifications
-from .notifications_api_v1 import NotificationsApiV1
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
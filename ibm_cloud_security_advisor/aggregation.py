@@ -0,0 +1,269 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Incremental, mergeable rollups of occurrences.
+
+`FindingAggregate` counts findings by severity, region, resource type and
+note, sums KPI values and estimates the number of distinct resources with a
+`HyperLogLog` sketch. Aggregates built by parallel workers are combined with
+`merge`, and round-trip through `to_dict`/`from_dict` so that they can be
+sent between processes or stored.
+
+The generated `ApiOccurrence` model does not keep the values of `kind` and
+`finding.severity`, so aggregates only accept occurrence dictionaries, for
+example those returned by `FindingsApiV1.scan_occurrences`.
+"""
+
+import base64
+import hashlib
+import json
+import math
+from collections import Counter
+from typing import Dict, Iterable
+
+DEFAULT_PRECISION = 14
+
+_DIMENSIONS = (
+    ('by_severity', ('finding', 'severity')),
+    ('by_region', ('context', 'region')),
+    ('by_resource_type', ('context', 'resource_type')),
+    ('by_note_name', ('note_name',)),
+)
+
+
+class HyperLogLog():
+    """
+    An estimate of the number of distinct strings added to it, with a
+    standard error of about `1.04 / sqrt(2 ** precision)`.
+
+    :attr int precision: The number of bits used to choose a register.
+    """
+
+    def __init__(self, precision: int = DEFAULT_PRECISION, *, registers: bytes = None) -> None:
+        if precision is None or not 4 <= precision <= 18:
+            raise ValueError('precision must be between 4 and 18')
+        self.precision = precision
+        size = 1 << precision
+        if registers is not None and len(registers) != size:
+            raise ValueError('registers must hold {0} bytes'.format(size))
+        self._registers = bytearray(registers) if registers is not None else bytearray(size)
+
+    def add(self, value: str) -> None:
+        """Add a string to the sketch."""
+        digest = hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest()
+        hashed = int.from_bytes(digest, 'big')
+        index = hashed >> (64 - self.precision)
+        rest = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self._registers[index]:
+            self._registers[index] = rank
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        """Add the strings counted by `other` to this sketch and return it."""
+        if other.precision != self.precision:
+            raise ValueError('cannot merge sketches of different precision')
+        self._registers = bytearray(max(a, b) for (a, b) in zip(self._registers, other._registers))
+        return self
+
+    def count(self) -> int:
+        """Return the estimated number of distinct strings."""
+        size = len(self._registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum(2.0 ** -register for register in self._registers)
+        zeros = self._registers.count(0)
+        if estimate <= 2.5 * size and zeros:
+            estimate = size * math.log(size / zeros)
+        return int(round(estimate))
+
+    def to_dict(self) -> Dict:
+        """Return a json dictionary representing this sketch."""
+        return {'precision': self.precision, 'registers': base64.b64encode(bytes(self._registers)).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, _dict: Dict) -> 'HyperLogLog':
+        """Initialize a HyperLogLog object from a json dictionary."""
+        return cls(_dict['precision'], registers=base64.b64decode(_dict['registers']))
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __eq__(self, other: 'HyperLogLog') -> bool:
+        """Return `true` when self and other are equal, false otherwise."""
+        if not isinstance(other, self.__class__):
+            return False
+        return self.precision == other.precision and self._registers == other._registers
+
+    def __ne__(self, other: 'HyperLogLog') -> bool:
+        """Return `true` when self and other are not equal, false otherwise."""
+        return not self == other
+
+
+def _get(_dict: Dict, path: tuple):
+    for name in path:
+        if not isinstance(_dict, dict):
+            return None
+        _dict = _dict.get(name)
+    return _dict
+
+
+def _occurrence_dict(occurrence) -> Dict:
+    # Accepts occurrence dictionaries and the results of a scan.
+    occurrence = getattr(occurrence, 'occurrence', occurrence)
+    if not isinstance(occurrence, dict):
+        raise TypeError('occurrences must be dictionaries, not {0}: the model loses kind and severity'.format(
+            type(occurrence).__name__))
+    return occurrence
+
+
+def _kind(occurrence: Dict) -> str:
+    kind = occurrence.get('kind')
+    if isinstance(kind, str):
+        return kind
+    if occurrence.get('finding') is not None:
+        return 'FINDING'
+    if occurrence.get('kpi') is not None:
+        return 'KPI'
+    return None
+
+
+class FindingAggregate():
+    """
+    Counts of findings and sums of KPIs over a stream of occurrences.
+
+    :attr int occurrences: The number of occurrences added.
+    :attr int findings: The number of FINDING occurrences added.
+    :attr Counter by_severity: Findings by `finding.severity`.
+    :attr Counter by_region: Findings by `context.region`.
+    :attr Counter by_resource_type: Findings by `context.resource_type`.
+    :attr Counter by_note_name: Findings by `note_name`.
+    :attr int kpis: The number of KPI occurrences added.
+    :attr float kpi_value: The sum of `kpi.value`.
+    :attr float kpi_total: The sum of `kpi.total`.
+    :attr HyperLogLog resources: The distinct `context.resource_crn` of the
+          findings.
+    """
+
+    def __init__(self, *, precision: int = DEFAULT_PRECISION) -> None:
+        self.occurrences = 0
+        self.findings = 0
+        self.by_severity = Counter()
+        self.by_region = Counter()
+        self.by_resource_type = Counter()
+        self.by_note_name = Counter()
+        self.kpis = 0
+        self.kpi_value = 0.0
+        self.kpi_total = 0.0
+        self.resources = HyperLogLog(precision)
+
+    @classmethod
+    def from_occurrences(cls, occurrences: Iterable, *, precision: int = DEFAULT_PRECISION) -> 'FindingAggregate':
+        """Return the aggregate of a stream of occurrences."""
+        aggregate = cls(precision=precision)
+        aggregate.update(occurrences)
+        return aggregate
+
+    @property
+    def distinct_resources(self) -> int:
+        """The estimated number of distinct resources with findings."""
+        return self.resources.count()
+
+    def add(self, occurrence) -> None:
+        """
+        Add an occurrence, given as a dictionary or a `ScannedOccurrence`.
+
+        :raises TypeError: If the occurrence is a model, such as an
+                `ApiOccurrence`.
+        """
+        occurrence = _occurrence_dict(occurrence)
+        self.occurrences += 1
+        kind = _kind(occurrence)
+        if kind == 'FINDING':
+            self.findings += 1
+            for (name, path) in _DIMENSIONS:
+                value = _get(occurrence, path)
+                if isinstance(value, str):
+                    getattr(self, name)[value] += 1
+            resource_crn = _get(occurrence, ('context', 'resource_crn'))
+            if resource_crn:
+                self.resources.add(resource_crn)
+        elif kind == 'KPI':
+            self.kpis += 1
+            self.kpi_value += _get(occurrence, ('kpi', 'value')) or 0
+            self.kpi_total += _get(occurrence, ('kpi', 'total')) or 0
+
+    def update(self, occurrences: Iterable) -> 'FindingAggregate':
+        """Add every occurrence of a stream and return this aggregate."""
+        for occurrence in occurrences:
+            self.add(occurrence)
+        return self
+
+    def merge(self, other: 'FindingAggregate') -> 'FindingAggregate':
+        """Add the occurrences counted by `other` to this aggregate and return it."""
+        self.occurrences += other.occurrences
+        self.findings += other.findings
+        for (name, _) in _DIMENSIONS:
+            getattr(self, name).update(getattr(other, name))
+        self.kpis += other.kpis
+        self.kpi_value += other.kpi_value
+        self.kpi_total += other.kpi_total
+        self.resources.merge(other.resources)
+        return self
+
+    def __add__(self, other: 'FindingAggregate') -> 'FindingAggregate':
+        return FindingAggregate.from_dict(self.to_dict()).merge(other)
+
+    def to_dict(self) -> Dict:
+        """Return a json dictionary representing this aggregate."""
+        _dict = {'occurrences': self.occurrences, 'findings': self.findings}
+        for (name, _) in _DIMENSIONS:
+            _dict[name] = dict(getattr(self, name))
+        _dict['kpi'] = {'count': self.kpis, 'value': self.kpi_value, 'total': self.kpi_total}
+        _dict['distinct_resources'] = self.distinct_resources
+        _dict['resources'] = self.resources.to_dict()
+        return _dict
+
+    @classmethod
+    def from_dict(cls, _dict: Dict) -> 'FindingAggregate':
+        """Initialize a FindingAggregate object from a json dictionary."""
+        resources = HyperLogLog.from_dict(_dict['resources'])
+        aggregate = cls(precision=resources.precision)
+        aggregate.resources = resources
+        aggregate.occurrences = _dict.get('occurrences', 0)
+        aggregate.findings = _dict.get('findings', 0)
+        for (name, _) in _DIMENSIONS:
+            setattr(aggregate, name, Counter(_dict.get(name) or {}))
+        kpi = _dict.get('kpi') or {}
+        aggregate.kpis = kpi.get('count', 0)
+        aggregate.kpi_value = kpi.get('value', 0.0)
+        aggregate.kpi_total = kpi.get('total', 0.0)
+        return aggregate
+
+    def __str__(self) -> str:
+        """Return a `str` version of this FindingAggregate object."""
+        _dict = self.to_dict()
+        del _dict['resources']
+        return json.dumps(_dict, indent=2)
+
+    def __eq__(self, other: 'FindingAggregate') -> bool:
+        """Return `true` when self and other are equal, false otherwise."""
+        if not isinstance(other, self.__class__):
+            return False
+        return self.__dict__ == other.__dict__
+
+    def __ne__(self, other: 'FindingAggregate') -> bool:
+        """Return `true` when self and other are not equal, false otherwise."""
+        return not self == other
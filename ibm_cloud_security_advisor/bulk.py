@@ -0,0 +1,118 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Helpers for running many service calls over a bounded worker pool.
+"""
+
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List
+
+from .tracing import span
+
+DEFAULT_MAX_WORKERS = 8
+
+
+class BulkResult():
+    """
+    The outcome of one item of a bulk operation.
+
+    :attr int index: The position of the item in the input.
+    :attr item: The input item.
+    :attr result: The result of the call, if it succeeded.
+    :attr Exception error: The exception raised by the call, if it failed.
+    """
+
+    __slots__ = ('index', 'item', 'result', 'error')
+
+    def __init__(self, index: int, item, result=None, error: Exception = None) -> None:
+        self.index = index
+        self.item = item
+        self.result = result
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        """Whether the call succeeded."""
+        return self.error is None
+
+    def __str__(self) -> str:
+        """Return a `str` version of this BulkResult object."""
+        result = self.result.to_dict() if hasattr(self.result, 'to_dict') else self.result
+        return json.dumps({'index': self.index, 'result': result,
+                           'error': str(self.error) if self.error is not None else None}, indent=2, default=str)
+
+    def __repr__(self) -> str:
+        return 'BulkResult(index={0}, ok={1})'.format(self.index, self.ok)
+
+
+def run_bulk(func: Callable, items: Iterable, *, max_workers: int = DEFAULT_MAX_WORKERS,
+             name: str = 'bulk') -> List[BulkResult]:
+    """
+    Call `func(item)` for every item on at most `max_workers` threads.
+
+    Exceptions raised by `func` are captured in the results rather than
+    raised. The transaction id and span of the caller are propagated to the
+    workers.
+
+    :param Callable func: The function to call for each item.
+    :param Iterable items: The items.
+    :param int max_workers: (optional) The maximum number of concurrent calls.
+    :param str name: (optional) The name of the span recording the operation.
+    :return: One result per item, in input order.
+    :rtype: List[BulkResult]
+    """
+    if max_workers is None or max_workers < 1:
+        raise ValueError('max_workers must be at least 1')
+    items = list(items)
+    results = [BulkResult(index, item) for (index, item) in enumerate(items)]
+    if not items:
+        return results
+
+    def call(result: BulkResult) -> None:
+        try:
+            result.result = func(result.item)
+        except Exception as err:  # pylint: disable=broad-except
+            result.error = err
+
+    with span(name, count=len(items)):
+        if max_workers == 1 or len(items) == 1:
+            for result in results:
+                call(result)
+            return results
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as executor:
+            # A context can only be entered by one thread at a time, so every
+            # task runs in its own copy of the caller's context.
+            futures = [executor.submit(contextvars.copy_context().run, call, result) for result in results]
+            for future in futures:
+                future.result()
+    return results
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    """Yield lists of at most `size` consecutive items."""
+    if size is None or size < 1:
+        raise ValueError('size must be at least 1')
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
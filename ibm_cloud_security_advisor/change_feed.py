@@ -0,0 +1,241 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A change feed of occurrences, built on polling with an `update_time`
+watermark.
+
+The feed remembers the latest `update_time` it has seen and the
+`(id, update_time)` pairs near it, so each poll yields only the occurrences
+that were created or updated since the previous one. The state is saved to a
+checkpoint after each batch has been consumed, so a restarted process
+resumes where it stopped.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional
+
+from ibm_cloud_sdk_core import datetime_to_string, string_to_datetime
+
+from .transport import run_in_executor
+
+DEFAULT_POLL_INTERVAL = 60.0
+DEFAULT_OVERLAP = 5.0
+
+
+class MemoryCheckpoint():
+    """
+    A checkpoint kept in memory, for feeds that do not need to survive a
+    restart.
+    """
+
+    def __init__(self) -> None:
+        self.state = None
+
+    def load(self) -> Optional[Dict]:
+        """Return the saved state, or None."""
+        return self.state
+
+    def save(self, state: Dict) -> None:
+        """Replace the saved state."""
+        self.state = state
+
+
+class FileCheckpoint():
+    """
+    A checkpoint saved as a JSON file. The file is replaced atomically, so a
+    crash while saving leaves the previous checkpoint intact.
+
+    :attr str path: The path of the file.
+    """
+
+    def __init__(self, path: str) -> None:
+        if path is None:
+            raise ValueError('path must be provided')
+        self.path = path
+
+    def load(self) -> Optional[Dict]:
+        """Return the saved state, or None if the file does not exist."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as checkpoint_file:
+                return json.load(checkpoint_file)
+        except FileNotFoundError:
+            return None
+
+    def save(self, state: Dict) -> None:
+        """Replace the saved state."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        (handle, temp_path) = tempfile.mkstemp(dir=directory, prefix='.checkpoint-')
+        try:
+            with os.fdopen(handle, 'w', encoding='utf-8') as checkpoint_file:
+                json.dump(state, checkpoint_file)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+class ChangeFeed():
+    """
+    Yields the items created or updated since the previous poll.
+
+    :attr Callable fetch: Called as `fetch(since)` with an RFC 3339 timestamp,
+          or None on the first poll without `start_time`, to return item
+          dictionaries updated at or after it. Items older than `since` are
+          ignored, so a source that cannot filter may return everything.
+    :attr float overlap: Seconds the window of each poll reaches back before
+          the watermark, to pick up writes that became visible late.
+    """
+
+    def __init__(self,
+                 fetch: Callable[[Optional[str]], Iterable[Dict]],
+                 *,
+                 convert: Callable[[Dict], object] = None,
+                 checkpoint=None,
+                 start_time: datetime = None,
+                 overlap: float = DEFAULT_OVERLAP) -> None:
+        """
+        :param Callable fetch: Returns the items updated since a timestamp.
+        :param Callable convert: (optional) Converts an item dictionary to the
+               object yielded by the feed.
+        :param checkpoint: (optional) A `MemoryCheckpoint`, `FileCheckpoint` or
+               object with the same `load` and `save` methods.
+        :param datetime start_time: (optional) Without a saved checkpoint, only
+               items updated at or after this time are yielded. A naive
+               datetime is assumed to be UTC. By default the first poll yields
+               every item.
+        :param float overlap: (optional) Seconds each poll reaches back before
+               the watermark.
+        """
+        if fetch is None:
+            raise ValueError('fetch must be provided')
+        if overlap is None or overlap < 0:
+            raise ValueError('overlap must not be negative')
+        self.fetch = fetch
+        self.convert = convert or (lambda item: item)
+        self.checkpoint = checkpoint if checkpoint is not None else MemoryCheckpoint()
+        self.overlap = overlap
+        self._lock = threading.Lock()
+        state = self.checkpoint.load()
+        if state:
+            self._watermark = string_to_datetime(state['watermark']) if state.get('watermark') else None
+            self._seen = {tuple(key) for key in state.get('seen', [])}
+        else:
+            if start_time is not None and start_time.tzinfo is None:
+                start_time = start_time.replace(tzinfo=timezone.utc)
+            self._watermark = start_time
+            self._seen = set()
+
+    @property
+    def watermark(self) -> Optional[datetime]:
+        """The latest `update_time` seen by the feed."""
+        return self._watermark
+
+    def poll(self) -> List:
+        """
+        Fetch the changes since the previous poll and save the checkpoint.
+
+        :return: The changed items, ordered by `update_time`.
+        :rtype: List
+        """
+        with self._lock:
+            (changed, state) = self._collect()
+            self._commit(state)
+        return [self.convert(item) for item in changed]
+
+    def follow(self, interval: float = DEFAULT_POLL_INTERVAL, *, max_polls: int = None) -> Iterator:
+        """
+        Poll every `interval` seconds and yield the changed items.
+
+        The checkpoint is saved once all items of a poll have been consumed, so
+        items that were yielded but not processed before a crash are yielded
+        again after a restart.
+
+        :param float interval: (optional) Seconds between the start of two
+               polls.
+        :param int max_polls: (optional) Stop after this many polls.
+        """
+        polls = 0
+        while max_polls is None or polls < max_polls:
+            started = time.monotonic()
+            with self._lock:
+                (changed, state) = self._collect()
+            for item in changed:
+                yield self.convert(item)
+            with self._lock:
+                self._commit(state)
+            polls += 1
+            if max_polls is None or polls < max_polls:
+                time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+    async def stream(self, interval: float = DEFAULT_POLL_INTERVAL, *, max_polls: int = None) -> AsyncIterator:
+        """
+        Like `follow`, as an asynchronous iterator. Polls run in the default
+        executor of the event loop, under the deadline of the calling task.
+        """
+        loop = asyncio.get_event_loop()
+        polls = 0
+        while max_polls is None or polls < max_polls:
+            started = loop.time()
+            (changed, state) = await run_in_executor(self._locked_collect)
+            for item in changed:
+                yield self.convert(item)
+            with self._lock:
+                self._commit(state)
+            polls += 1
+            if max_polls is None or polls < max_polls:
+                await asyncio.sleep(max(0.0, interval - (loop.time() - started)))
+
+    def _locked_collect(self):
+        with self._lock:
+            return self._collect()
+
+    def _collect(self):
+        since = self._watermark - timedelta(seconds=self.overlap) if self._watermark is not None else None
+        seen = set(self._seen)
+        watermark = self._watermark
+        changed = []
+        for item in self.fetch(datetime_to_string(since) if since is not None else None):
+            update_time = item.get('update_time')
+            updated = string_to_datetime(update_time) if update_time else None
+            if since is not None and updated is not None and updated < since:
+                continue
+            key = (item.get('id'), update_time)
+            if key in seen:
+                continue
+            seen.add(key)
+            changed.append((updated, item))
+            if updated is not None and (watermark is None or updated > watermark):
+                watermark = updated
+        changed.sort(key=lambda change: (change[0] is not None, change[0] or 0))
+        if watermark is not None:
+            # Only the keys inside the overlap window can be returned again.
+            floor = watermark - timedelta(seconds=self.overlap)
+            seen = {key for key in seen if not key[1] or string_to_datetime(key[1]) >= floor}
+        state = {'watermark': datetime_to_string(watermark) if watermark is not None else None,
+                 'seen': sorted([list(key) for key in seen], key=str)}
+        return ([item for (_, item) in changed], state)
+
+    def _commit(self, state: Dict) -> None:
+        self.checkpoint.save(state)
+        self._watermark = string_to_datetime(state['watermark']) if state['watermark'] else None
+        self._seen = {tuple(key) for key in state['seen']}
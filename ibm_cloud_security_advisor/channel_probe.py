@@ -0,0 +1,114 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+The health report produced by `NotificationsApiV1.probe_channels`.
+"""
+
+import json
+from typing import Dict, List
+
+from .bulk import BulkResult
+
+TEST_SUCCESS = 'success'
+
+
+class ChannelProbe():
+    """
+    The outcome of testing one notification channel.
+
+    :attr str channel_id: The ID of the channel.
+    :attr str name: (optional) The name of the channel, if known.
+    :attr TestChannel result: (optional) The response of
+          `test_notification_channel`, if the request succeeded.
+    :attr float latency: Seconds the test took.
+    :attr Exception error: (optional) The exception raised by the test.
+    """
+
+    __slots__ = ('channel_id', 'name', 'result', 'latency', 'error')
+
+    def __init__(self, channel_id: str, *, name: str = None, result=None, latency: float = 0.0,
+                 error: Exception = None) -> None:
+        self.channel_id = channel_id
+        self.name = name
+        self.result = result
+        self.latency = latency
+        self.error = error
+
+    @property
+    def healthy(self) -> bool:
+        """Whether the test succeeded."""
+        return self.error is None and self.result is not None and self.result.test == TEST_SUCCESS
+
+    def to_dict(self) -> Dict:
+        """Return a json dictionary representing this probe."""
+        return {
+            'channel_id': self.channel_id,
+            'name': self.name,
+            'healthy': self.healthy,
+            'latency': self.latency,
+            'test': self.result.test if self.result is not None else None,
+            'error': str(self.error) if self.error is not None else None
+        }
+
+    def __repr__(self) -> str:
+        return 'ChannelProbe({0!r}, healthy={1}, latency={2:.3f})'.format(self.channel_id, self.healthy,
+                                                                         self.latency)
+
+
+class ChannelProbeReport():
+    """
+    The health of a set of notification channels.
+
+    :attr List[ChannelProbe] probes: One probe per channel, in input order.
+    :attr float elapsed: Seconds the whole sweep took.
+    :attr List[BulkResult] disabled: The results of disabling the failing
+          channels, if requested.
+    """
+
+    def __init__(self, probes: List[ChannelProbe], elapsed: float, disabled: List[BulkResult] = None) -> None:
+        self.probes = probes
+        self.elapsed = elapsed
+        self.disabled = disabled or []
+
+    @property
+    def healthy(self) -> List[ChannelProbe]:
+        """The probes of the channels whose test succeeded."""
+        return [probe for probe in self.probes if probe.healthy]
+
+    @property
+    def failing(self) -> List[ChannelProbe]:
+        """The probes of the channels whose test failed or timed out."""
+        return [probe for probe in self.probes if not probe.healthy]
+
+    @property
+    def slowest(self) -> ChannelProbe:
+        """The probe that took the longest, or None if no channel was probed."""
+        return max(self.probes, key=lambda probe: probe.latency, default=None)
+
+    def to_dict(self) -> Dict:
+        """Return a json dictionary representing this report."""
+        return {
+            'elapsed': self.elapsed,
+            'healthy': len(self.healthy),
+            'failing': len(self.failing),
+            'probes': [probe.to_dict() for probe in self.probes],
+            'disabled': [result.item.get('channel_id') for result in self.disabled if result.ok]
+        }
+
+    def __str__(self) -> str:
+        """Return a `str` version of this ChannelProbeReport object."""
+        return json.dumps(self.to_dict(), indent=2)
@@ -0,0 +1,198 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Desired-state reconciliation of notification channels.
+
+`plan_channel_sync` compares the channels of an account with the desired
+channels, matched by name, and returns the creates, updates and deletes needed
+to converge. `NotificationsApiV1.sync_channels` lists the account once, plans,
+and applies the plan concurrently.
+"""
+
+import json
+from typing import Dict, Iterable, List, Union
+
+from ibm_cloud_sdk_core.utils import convert_model
+
+from .bulk import BulkResult
+
+SEVERITIES = ('critical', 'high', 'medium', 'low')
+
+# The arguments of create_notification_channel and update_notification_channel.
+CHANNEL_FIELDS = ('name', 'type', 'endpoint', 'description', 'severity', 'enabled', 'alert_source')
+
+
+class ChannelSyncPlan():
+    """
+    The changes needed to converge the channels of an account.
+
+    :attr List[dict] creates: The arguments of the channels to create.
+    :attr List[dict] updates: The arguments of the channels to update,
+          including `channel_id`.
+    :attr List[str] deletes: The IDs of the channels to delete.
+    :attr List[str] unchanged: The names of the channels already up to date.
+    """
+
+    def __init__(self) -> None:
+        self.creates = []
+        self.updates = []
+        self.deletes = []
+        self.unchanged = []
+
+    @property
+    def empty(self) -> bool:
+        """Whether the account already matches the desired state."""
+        return not (self.creates or self.updates or self.deletes)
+
+    def to_dict(self) -> Dict:
+        """Return a json dictionary representing this plan."""
+        return {
+            'creates': self.creates,
+            'updates': self.updates,
+            'deletes': self.deletes,
+            'unchanged': self.unchanged
+        }
+
+    def __str__(self) -> str:
+        """Return a `str` version of this ChannelSyncPlan object."""
+        return json.dumps(self.to_dict(), indent=2)
+
+
+class ChannelSyncResult():
+    """
+    The outcome of applying a `ChannelSyncPlan`.
+
+    :attr ChannelSyncPlan plan: The plan that was applied.
+    :attr List[BulkResult] created: The results of the creates.
+    :attr List[BulkResult] updated: The results of the updates.
+    :attr List[BulkResult] deleted: The results of the delete batches.
+    """
+
+    def __init__(self, plan: ChannelSyncPlan, created: List[BulkResult] = None, updated: List[BulkResult] = None,
+                 deleted: List[BulkResult] = None) -> None:
+        self.plan = plan
+        self.created = created or []
+        self.updated = updated or []
+        self.deleted = deleted or []
+
+    @property
+    def errors(self) -> List[BulkResult]:
+        """The results of the changes that failed."""
+        return [result for result in self.created + self.updated + self.deleted if not result.ok]
+
+    @property
+    def ok(self) -> bool:
+        """Whether every change was applied."""
+        return not self.errors
+
+
+def channel_arguments(channel: Union[Dict, object]) -> Dict:
+    """
+    Return the `create_notification_channel` arguments of a channel, given as a
+    `Channel` model or a dictionary in the format of `notification.json`.
+    Severity is returned as a list of severity names.
+    """
+    channel = convert_model(channel)
+    args = {field: channel.get(field) for field in CHANNEL_FIELDS if channel.get(field) is not None}
+    if 'severity' in args:
+        args['severity'] = [level for level in SEVERITIES if level in _severities(args['severity'])]
+    if 'alert_source' in args:
+        args['alert_source'] = [convert_model(item) for item in args['alert_source']]
+    return args
+
+
+def _severities(severity) -> frozenset:
+    if severity is None:
+        return frozenset()
+    if isinstance(severity, dict):
+        return frozenset(level for (level, enabled) in severity.items() if enabled)
+    return frozenset(level.lower() for level in severity)
+
+
+def _alert_sources(alert_source) -> tuple:
+    items = []
+    for item in alert_source or []:
+        item = convert_model(item)
+        items.append((item.get('provider_name'), tuple(sorted(item.get('finding_types') or []))))
+    return tuple(sorted(items))
+
+
+_NORMALIZE = {
+    'description': lambda value: value or None,
+    'enabled': bool,
+    'severity': _severities,
+    'alert_source': _alert_sources,
+}
+
+
+def _differs(channel: Dict, args: Dict) -> bool:
+    """Compare only the fields that the desired channel sets."""
+    for (field, value) in args.items():
+        normalize = _NORMALIZE.get(field, lambda value: value)
+        if normalize(channel.get(field)) != normalize(value):
+            return True
+    return False
+
+
+def plan_channel_sync(current: Iterable[Dict], desired: Iterable[Union[Dict, object]], *,
+                      prune: bool = True) -> ChannelSyncPlan:
+    """
+    Compare the channels of an account with the desired channels.
+
+    Channels are matched by name. A desired channel that does not exist is
+    created and one that differs in type, endpoint, description, enabled,
+    severity or alert_source is updated. Only the fields that the desired
+    channel sets are compared, and an update carries the current value of
+    the fields it omits, so they keep their value. Existing channels that are
+    not desired, and duplicates of a desired name, are deleted when `prune`
+    is set.
+
+    :param Iterable[dict] current: The channels of the account, as returned by
+           `list_all_channels`.
+    :param Iterable desired: The desired channels, as `Channel` models or
+           dictionaries.
+    :param bool prune: (optional) Delete channels that are not desired.
+    :rtype: ChannelSyncPlan
+    """
+    plan = ChannelSyncPlan()
+    wanted = {}
+    for channel in desired:
+        args = channel_arguments(channel)
+        if not args.get('name'):
+            raise ValueError('name must be provided for every desired channel')
+        if args['name'] in wanted:
+            raise ValueError('duplicate desired channel name: {0}'.format(args['name']))
+        wanted[args['name']] = args
+
+    existing = {}
+    for channel in current:
+        channel = convert_model(channel)
+        if channel.get('name') in wanted and channel.get('name') not in existing:
+            existing[channel['name']] = channel
+        elif prune:
+            plan.deletes.append(channel['channel_id'])
+
+    for (name, args) in wanted.items():
+        channel = existing.get(name)
+        if channel is None:
+            plan.creates.append(args)
+        elif _differs(channel, args):
+            # An update replaces the channel, so it carries the fields left out.
+            plan.updates.append(dict(channel_arguments(channel), **args, channel_id=channel['channel_id']))
+        else:
+            plan.unchanged.append(name)
+    return plan
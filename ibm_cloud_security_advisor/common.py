@@ -18,7 +18,7 @@
 This module provides common methods for use across all service modules.
 """
 
-import platform
+import functools
 from ibm_cloud_security_advisor.version import __version__
 
 HEADER_NAME_USER_AGENT = 'User-Agent'
@@ -28,20 +28,26 @@ def get_system_info():
     """
     Get information about the system to be inserted into the User-Agent header.
     """
+    import platform
     return 'lang={0}; arch={1}; os={2}; python.version={3}'.format('python',
                                 platform.machine(), # Architecture
                                 platform.system(), # OS
                                 platform.python_version()) # Python version
 
 
+@functools.lru_cache(maxsize=None)
 def get_user_agent():
     """
-    Get the value to be sent in the User-Agent header.
+    Get the value to be sent in the User-Agent header. The value is computed
+    on first use rather than when the module is imported.
     """
-    return USER_AGENT
+    return '{0}/{1} ({2})'.format(SDK_NAME, __version__, get_system_info())
 
 
-USER_AGENT = '{0}/{1} ({2})'.format(SDK_NAME, __version__, get_system_info())
+def __getattr__(name):
+    if name == 'USER_AGENT':
+        return get_user_agent()
+    raise AttributeError('module {0!r} has no attribute {1!r}'.format(__name__, name))
 
 
 def get_sdk_headers(service_name, service_version, operation_id):
@@ -20,17 +20,29 @@ The Findings API
 """
 
 import json
+from contextlib import nullcontext
 from ibm_cloud_sdk_core.authenticators.authenticator import Authenticator
 from ibm_cloud_security_advisor.common import get_sdk_headers
-from datetime import datetime
+from ibm_cloud_security_advisor.transport import Transport, RequestsTransport, budget_timeout, get_deadline, get_request_timeout
+from ibm_cloud_security_advisor.instrumentation import Instrumentation, InstrumentationHook, record_build_time
+from ibm_cloud_security_advisor.sdk_logging import ClientLogger
+from ibm_cloud_security_advisor.tracing import apply_transaction_id
+from ibm_cloud_security_advisor.pagination import DEFAULT_RANGE_FANOUT, DEFAULT_RANGE_WORKERS, iter_key_ranges
+from ibm_cloud_security_advisor.bulk import DEFAULT_MAX_WORKERS, BulkResult, run_bulk
+from ibm_cloud_security_advisor.change_feed import DEFAULT_OVERLAP, ChangeFeed
+from ibm_cloud_security_advisor.occurrence_scan import (DEFAULT_SCAN_BUFFER, DEFAULT_SCAN_WORKERS, ScannedOccurrence,
+                                                        iter_token_pages, scan_partitions)
+from datetime import datetime, timezone
 from enum import Enum
-from ibm_cloud_sdk_core import BaseService
+from ibm_cloud_sdk_core import ApiException, BaseService
 from ibm_cloud_sdk_core import datetime_to_string, string_to_datetime
 from ibm_cloud_sdk_core import read_external_sources, DetailedResponse
 from ibm_cloud_sdk_core.get_authenticator import get_authenticator_from_environment
-from typing import Dict
+from typing import Callable, Dict, Iterable, Iterator
 from typing import List
 import sys
+import threading
+import time
 
 import logging
 
@@ -43,6 +55,7 @@ class FindingsApiV1(BaseService):
 
     DEFAULT_SERVICE_URL = 'https://us-south.secadvisor.cloud.ibm.com/findings'
     DEFAULT_SERVICE_NAME = 'findings_api'
+    DEFAULT_PROVIDER_PAGE_SIZE = 200
 
     @classmethod
     def new_instance(cls, 
@@ -58,26 +71,105 @@ class FindingsApiV1(BaseService):
     def __init__(self,
                  authenticator: Authenticator = None,
                  service_name: str = DEFAULT_SERVICE_NAME,
-                 enable_error_log: bool=False
+                 enable_error_log: bool=False,
+                 *,
+                 transport: Transport = None,
+                 log_level: int = None
                 ) -> None:
         """
         Construct a new client for the Findings API service.
         :param Authenticator authenticator: The authenticator specifies the authentication mechanism.
                Get up to date information from https://github.com/IBM/python-sdk-core/blob/master/README.md
                about initializing the authenticator of your choice.
+        :param bool enable_error_log: (optional) Log failed requests at ERROR
+               to the `ibm_cloud_security_advisor` logger.
+        :param Transport transport: (optional) The transport used to send requests.
+               Defaults to a `RequestsTransport` which sends them over HTTP.
+        :param int log_level: (optional) The minimum level of the records this
+               client logs. Overrides `enable_error_log`.
         """
-        if enable_error_log:
-            # enable error log
-            logging.disable(logging.NOTSET)
-        else:
-            # disable error log
-           logging.disable(level=40)
-
         BaseService.__init__(self,
             service_url=self.DEFAULT_SERVICE_URL,
             authenticator=authenticator,
             disable_ssl_verification=False)
+        self.transport = transport if transport is not None else RequestsTransport()
+        self.instrumentation = Instrumentation()
+        if log_level is None:
+            # only critical records unless error logging is enabled
+            log_level = logging.NOTSET if enable_error_log else logging.CRITICAL
+        self.log = ClientLogger(self.instrumentation, level=log_level)
+
+    def set_transport(self, transport: Transport) -> None:
+        """
+        Set the transport used to send requests.
+        :param Transport transport: The transport to use.
+        """
+        if transport is None:
+            raise ValueError('transport must be provided')
+        self.transport = transport
+
+    def get_transport(self) -> Transport:
+        """Return the transport used to send requests."""
+        return self.transport
+
+    def send(self, request: dict, *, operation_id: str = None, **kwargs) -> 'DetailedResponse':
+        """
+        Send a prepared request through the configured transport.
+        :param dict request: The request built by `prepare_request`.
+        :param str operation_id: (optional) The operation being invoked.
+        :return: A `DetailedResponse` containing the result, headers and HTTP status code.
+        :rtype: DetailedResponse
+        """
+        timeout = get_request_timeout()
+        if timeout is not None:
+            kwargs.setdefault('timeout', timeout)
+        if get_deadline() is not None:
+            kwargs['timeout'] = budget_timeout(kwargs.get('timeout'))
+        try:
+            return self.instrumentation.send(self.transport, self, request, operation_id=operation_id, **kwargs)
+        except ApiException as err:
+            if self.log.is_enabled_for(logging.ERROR):
+                self.log.error('%s failed with status %s: %s', operation_id, err.status_code, err.message)
+            raise
 
+    def prepare_request(self, method: str, url: str, **kwargs) -> dict:
+        """
+        Build a request, recording how long it took for the instrumentation hooks.
+        A `Transaction-Id` header is added when the caller did not supply one.
+        """
+        start = time.perf_counter()
+        request = BaseService.prepare_request(self, method, url, **kwargs)
+        if isinstance(request, dict):
+            apply_transaction_id(request['headers'])
+        record_build_time(time.perf_counter() - start)
+        return request
+
+    def set_log_level(self, level: int, *, sample_rate: float = None) -> None:
+        """
+        Set the minimum level of the records this client logs.
+        :param int level: The level, for example `logging.DEBUG`.
+        :param float sample_rate: (optional) The fraction, between 0 and 1, of
+               calls whose request/response timing is logged at DEBUG.
+        """
+        self.log.configure(level=level, sample_rate=sample_rate)
+
+    def add_instrumentation_hook(self, hook: InstrumentationHook) -> InstrumentationHook:
+        """
+        Register a hook that receives an `OperationMetrics` record for every
+        operation call made by this client.
+        :param InstrumentationHook hook: The hook, or a callable taking an
+               `OperationMetrics` argument.
+        :return: The registered hook.
+        :rtype: InstrumentationHook
+        """
+        return self.instrumentation.add_hook(hook)
+
+    def remove_instrumentation_hook(self, hook: InstrumentationHook) -> None:
+        """
+        Unregister a hook added with `add_instrumentation_hook`.
+        :param InstrumentationHook hook: The hook to remove.
+        """
+        self.instrumentation.remove_hook(hook)
 
     #########################
     # findingsGraph
@@ -119,7 +211,7 @@ class FindingsApiV1(BaseService):
                                 headers=headers,
                                 data=data)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='post_graph')
         return response
 
     #########################
@@ -269,7 +361,7 @@ class FindingsApiV1(BaseService):
                                 headers=headers,
                                 data=data)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='create_note')
         return response
 
 
@@ -309,7 +401,7 @@ class FindingsApiV1(BaseService):
                                 headers=headers,
                                 params=params)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='list_notes')
         return response
 
 
@@ -344,7 +436,7 @@ class FindingsApiV1(BaseService):
                                 url=url,
                                 headers=headers)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='get_note')
         return response
 
 
@@ -494,7 +586,7 @@ class FindingsApiV1(BaseService):
                                 headers=headers,
                                 data=data)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='update_note')
         return response
 
 
@@ -529,7 +621,7 @@ class FindingsApiV1(BaseService):
                                 url=url,
                                 headers=headers)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='delete_note')
         return response
 
 
@@ -564,7 +656,7 @@ class FindingsApiV1(BaseService):
                                 url=url,
                                 headers=headers)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='get_occurrence_note')
         return response
 
     #########################
@@ -682,7 +774,7 @@ class FindingsApiV1(BaseService):
                                 headers=headers,
                                 data=data)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='create_occurrence')
         return response
 
 
@@ -723,7 +815,7 @@ class FindingsApiV1(BaseService):
                                 headers=headers,
                                 params=params)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='list_occurrences')
         return response
 
 
@@ -767,7 +859,7 @@ class FindingsApiV1(BaseService):
                                 headers=headers,
                                 params=params)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='list_note_occurrences')
         return response
 
 
@@ -802,7 +894,7 @@ class FindingsApiV1(BaseService):
                                 url=url,
                                 headers=headers)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='get_occurrence')
         return response
 
 
@@ -917,7 +1009,7 @@ class FindingsApiV1(BaseService):
                                 headers=headers,
                                 data=data)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='update_occurrence')
         return response
 
 
@@ -952,7 +1044,7 @@ class FindingsApiV1(BaseService):
                                 url=url,
                                 headers=headers)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='delete_occurrence')
         return response
 
     #########################
@@ -999,9 +1091,226 @@ class FindingsApiV1(BaseService):
                                 headers=headers,
                                 params=params)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='list_providers')
         return response
 
+    #########################
+    # account scan
+    #########################
+
+
+    def iter_providers(self, account_id: str, *, page_size: int = DEFAULT_PROVIDER_PAGE_SIZE, max_workers: int = DEFAULT_RANGE_WORKERS, fanout: int = DEFAULT_RANGE_FANOUT, start_provider_id: str = None, end_provider_id: str = None, **kwargs) -> Iterator['ApiProvider']:
+        """
+        Iterates over all `Providers` for a given account id, in provider_id order.
+        Instead of paging `list_providers` with `skip`, which gets slower the deeper
+        the offset, every request lists the first page of a provider_id range with
+        `start_provider_id`/`end_provider_id`. When a page is full, the rest of its
+        range is split into `fanout` ranges at provider ids chosen from the page,
+        and the ranges are listed concurrently.
+        :param str account_id: Account ID.
+        :param int page_size: (optional) The number of providers listed per
+               request.
+        :param int max_workers: (optional) The maximum number of concurrent
+               requests.
+        :param int fanout: (optional) The number of ranges the rest of a full
+               range is split into; 1 lists the providers sequentially.
+        :param str start_provider_id: (optional) The first provider_id to include.
+        :param str end_provider_id: (optional) The last provider_id to include.
+        :param dict headers: A `dict` containing the request headers
+        :return: An iterator of `ApiProvider` objects.
+        :rtype: Iterator[ApiProvider]
+        """
+
+        if account_id is None:
+            raise ValueError('account_id must be provided')
+
+        return self._iter_providers(account_id, page_size=page_size, max_workers=max_workers, fanout=fanout,
+                                    start_provider_id=start_provider_id, end_provider_id=end_provider_id, **kwargs)
+
+
+    def _iter_providers(self, account_id: str, *, page_size: int, max_workers: int, fanout: int,
+                        start_provider_id: str = None, end_provider_id: str = None,
+                        slots: threading.Semaphore = None, **kwargs) -> Iterator['ApiProvider']:
+        # `slots`, if given, is held during every request, so that another
+        # pool can share one concurrency limit with this one.
+        slots = slots if slots is not None else nullcontext()
+
+        def fetch(start: str, end: str, limit: int) -> List[Dict]:
+            with slots:
+                response = self.list_providers(account_id, limit=limit, start_provider_id=start,
+                                               end_provider_id=end, **kwargs)
+            return response.get_result().get('providers') or []
+
+        pages = iter_key_ranges(fetch, lambda provider: provider.get('id'), start=start_provider_id,
+                                end=end_provider_id, page_size=page_size, max_workers=max_workers, fanout=fanout)
+        return (ApiProvider.from_dict(provider) for page in pages for provider in page)
+
+
+    def iter_occurrence_pages(self, account_id: str, provider_id: str, *, page_size: int = None, **kwargs) -> Iterator[List[Dict]]:
+        """
+        Iterates over the pages of `list_occurrences` for a provider, following
+        `next_page_token`.
+        :param str account_id: Account ID.
+        :param str provider_id: The provider_id.
+        :param int page_size: (optional) Number of occurrences per page.
+        :param dict headers: A `dict` containing the request headers
+        :return: An iterator of lists of occurrence dictionaries.
+        :rtype: Iterator[List[dict]]
+        """
+
+        if account_id is None:
+            raise ValueError('account_id must be provided')
+        if provider_id is None:
+            raise ValueError('provider_id must be provided')
+
+        def fetch(page_token: str):
+            result = self.list_occurrences(account_id, provider_id, page_size=page_size, page_token=page_token,
+                                           **kwargs).get_result()
+            return (result.get('occurrences') or [], result.get('next_page_token'))
+
+        return iter_token_pages(fetch)
+
+
+    def scan_occurrences(self, account_id: str, *, provider_ids: Iterable[str] = None, page_size: int = None, max_workers: int = DEFAULT_SCAN_WORKERS, buffer_size: int = DEFAULT_SCAN_BUFFER, on_error: Callable[[str, Exception], None] = None, **kwargs) -> Iterator[ScannedOccurrence]:
+        """
+        Scans the `Occurrences` of every provider of an account concurrently.
+        Providers are listed with `iter_providers` unless `provider_ids` is given,
+        and each of at most `max_workers` threads pages the occurrences of one
+        provider at a time. Listing providers counts against the same limit, so
+        at most `max_workers` requests are in flight. The
+        occurrences of a provider are yielded in order; those of different
+        providers interleave. Closing the iterator stops the workers.
+        :param str account_id: Account ID.
+        :param Iterable[str] provider_ids: (optional) The providers to scan.
+               Defaults to all providers of the account.
+        :param int page_size: (optional) Number of occurrences per page.
+        :param int max_workers: (optional) The maximum number of concurrent
+               requests.
+        :param int buffer_size: (optional) The number of pages buffered ahead of
+               the caller.
+        :param Callable on_error: (optional) Called with the provider_id and the
+               exception when listing the occurrences of a provider fails; the
+               scan continues with the other providers. By default the error is
+               raised.
+        :param dict headers: A `dict` containing the request headers
+        :return: An iterator of `ScannedOccurrence` objects.
+        :rtype: Iterator[ScannedOccurrence]
+        """
+
+        if account_id is None:
+            raise ValueError('account_id must be provided')
+        if max_workers is None or max_workers < 1:
+            raise ValueError('max_workers must be at least 1')
+
+        slots = threading.BoundedSemaphore(max_workers)
+        if provider_ids is None:
+            providers = self._iter_providers(account_id, page_size=self.DEFAULT_PROVIDER_PAGE_SIZE,
+                                             max_workers=min(max_workers, DEFAULT_RANGE_WORKERS),
+                                             fanout=DEFAULT_RANGE_FANOUT, slots=slots, **kwargs)
+            provider_ids = (provider.id for provider in providers)
+
+        def stream(provider_id: str) -> Iterator[List[Dict]]:
+            pages = self.iter_occurrence_pages(account_id, provider_id, page_size=page_size, **kwargs)
+            while True:
+                # Each page is one request.
+                with slots:
+                    page = next(pages, None)
+                if page is None:
+                    return
+                yield page
+
+        pages = scan_partitions(provider_ids, stream, max_workers=max_workers, buffer_size=buffer_size,
+                                on_error=on_error)
+        return (ScannedOccurrence(provider_id, occurrence) for (provider_id, page) in pages for occurrence in page)
+
+    #########################
+    # change feed
+    #########################
+
+
+    def occurrence_change_feed(self, account_id: str, *, query: str = None, provider_ids: Iterable[str] = None, checkpoint=None, start_time: datetime = None, overlap: float = DEFAULT_OVERLAP, page_size: int = None, max_workers: int = DEFAULT_SCAN_WORKERS, **kwargs) -> ChangeFeed:
+        """
+        Returns a feed of the `Occurrences` of an account that were created or
+        updated since its previous poll, as `ApiOccurrence` objects.
+        With `query`, every poll sends a GraphQL query to `post_graph`, with
+        `{watermark}` replaced by the `update_time` of the last change seen, so a
+        query that filters on `update_time` costs in proportion to the number of
+        changes. The query must return `data.occurrences`. Without `query`, every
+        poll scans the occurrences of all providers with `scan_occurrences` and
+        filters them locally.
+        :param str account_id: Account ID.
+        :param str query: (optional) A GraphQL query with a `{watermark}`
+               placeholder; other braces must be doubled.
+        :param Iterable[str] provider_ids: (optional) The providers to scan when
+               no query is given. Defaults to all providers of the account.
+        :param checkpoint: (optional) Where the position of the feed is saved, for
+               example a `FileCheckpoint`. Defaults to memory.
+        :param datetime start_time: (optional) Without a saved checkpoint, the
+               time from which changes are yielded. Defaults to all occurrences.
+        :param float overlap: (optional) Seconds each poll reaches back before the
+               watermark, to pick up writes that became visible late.
+        :param int page_size: (optional) Number of occurrences per page when
+               scanning.
+        :param int max_workers: (optional) The maximum number of concurrent
+               requests when scanning.
+        :param dict headers: A `dict` containing the request headers
+        :return: A `ChangeFeed` of `ApiOccurrence` objects.
+        :rtype: ChangeFeed
+        """
+
+        if account_id is None:
+            raise ValueError('account_id must be provided')
+        if provider_ids is not None:
+            provider_ids = list(provider_ids)
+
+        def fetch(since: str) -> Iterable[Dict]:
+            if query is not None:
+                body = query.format(watermark=since or datetime_to_string(datetime.fromtimestamp(0, timezone.utc)))
+                result = self.post_graph(account_id, body, content_type='application/graphql', **kwargs).get_result()
+                return (result.get('data') or {}).get('occurrences') or []
+            scan = self.scan_occurrences(account_id, provider_ids=provider_ids, page_size=page_size,
+                                         max_workers=max_workers, **kwargs)
+            return (item.occurrence for item in scan)
+
+        return ChangeFeed(fetch, convert=ApiOccurrence.from_dict, checkpoint=checkpoint, start_time=start_time,
+                          overlap=overlap)
+
+    #########################
+    # bulk occurrence operations
+    #########################
+
+
+    def create_occurrences(self, account_id: str, occurrences: List[Dict], *, replace_if_exists: bool = None, max_workers: int = DEFAULT_MAX_WORKERS, **kwargs) -> List[BulkResult]:
+        """
+        Creates `Occurrences` concurrently, each with `create_occurrence`, on a pool of
+        at most `max_workers` threads. A failure does not stop the other occurrences
+        from being created.
+        :param str account_id: Account ID.
+        :param List[dict] occurrences: The occurrences, each a `dict` of the
+               arguments of `create_occurrence`: `provider_id`, `note_name`, `kind`,
+               `id` and optionally `resource_url`, `remediation`, `context`,
+               `finding` and `kpi`.
+        :param bool replace_if_exists: (optional) It allows replacing existing
+               occurrences when set to true.
+        :param int max_workers: (optional) The maximum number of concurrent
+               requests.
+        :param dict headers: A `dict` containing the request headers
+        :return: One result per occurrence, in input order, holding an
+                 `ApiOccurrence` or the exception raised for that occurrence.
+        :rtype: List[BulkResult]
+        """
+
+        if account_id is None:
+            raise ValueError('account_id must be provided')
+        if occurrences is None:
+            raise ValueError('occurrences must be provided')
+
+        def create(occurrence: Dict) -> 'ApiOccurrence':
+            response = self.create_occurrence(account_id, replace_if_exists=replace_if_exists, **occurrence, **kwargs)
+            return ApiOccurrence.from_dict(response.get_result())
+
+        return run_bulk(create, occurrences, max_workers=max_workers, name='create_occurrences')
+
 
 class PostGraphEnums(object):
     class ContentType(Enum):
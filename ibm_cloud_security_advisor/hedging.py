@@ -0,0 +1,212 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Hedged requests for idempotent operations.
+
+`HedgingTransport` sends a request and, if no response has arrived after a
+delay, sends a duplicate. The first response is returned and the other one is
+discarded. The delay is fixed or follows a percentile of the latencies an
+`InMemoryMetrics` hook has recorded for the operation. A budget limits the
+hedges to a fraction of the requests.
+
+    metrics = InMemoryMetrics()
+    findings_service.add_instrumentation_hook(metrics)
+    findings_service.set_transport(HedgingTransport(metrics=metrics, operations=['get_occurrence']))
+"""
+
+import contextvars
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Iterable, Union
+
+from ibm_cloud_sdk_core import ApiException, BaseService, DetailedResponse
+
+from .tracing import add_event
+from .transport import DeadlineExceeded, Transport, TransportWrapper, budget_timeout
+
+DEFAULT_HEDGE_DELAY = 0.1
+DEFAULT_HEDGE_QUANTILE = 0.95
+DEFAULT_HEDGE_RATIO = 0.1
+DEFAULT_HEDGE_BURST = 10
+DEFAULT_HEDGE_WORKERS = 32
+DEFAULT_METHODS = ('GET', 'HEAD')
+
+
+class HedgingTransport(TransportWrapper):
+    """
+    Sends a second copy of slow idempotent requests and returns whichever
+    response arrives first.
+
+    Requests of operations and methods that are not hedged are sent on the
+    calling thread. Requests that may be hedged run on a thread pool, the
+    first copy included, while the calling thread waits; the slower copy
+    cannot be interrupted, so it is cancelled if it has not started yet and
+    otherwise left to finish with its response discarded.
+
+    A response, including an error response from the service, wins as soon as
+    it arrives; a connection error only wins if the other copy fails too. When
+    both copies have completed, a response is preferred to an error and the
+    first copy to the second. The calling thread stops waiting with
+    `DeadlineExceeded` when the deadline of its context passes.
+
+    :attr float quantile: The latency quantile used as the delay when
+          `metrics` are given.
+    :attr float max_ratio: The maximum number of hedges per request.
+    """
+
+    def __init__(self, transport: Transport = None, *, delay: Union[float, Callable[[str], float]] = None,
+                 metrics=None, quantile: float = DEFAULT_HEDGE_QUANTILE, default_delay: float = DEFAULT_HEDGE_DELAY,
+                 min_delay: float = 0.0, operations: Iterable[str] = None, methods: Iterable[str] = DEFAULT_METHODS,
+                 max_ratio: float = DEFAULT_HEDGE_RATIO, burst: int = DEFAULT_HEDGE_BURST,
+                 max_workers: int = DEFAULT_HEDGE_WORKERS) -> None:
+        """
+        :param Transport transport: (optional) The transport to wrap. Defaults
+               to a `RequestsTransport`.
+        :param float delay: (optional) Seconds to wait before hedging, or a
+               function of the operation id returning them. Takes precedence
+               over `metrics`.
+        :param InMemoryMetrics metrics: (optional) The hook whose latencies set
+               the delay of each operation.
+        :param float quantile: (optional) The quantile of the recorded latencies
+               used as the delay.
+        :param float default_delay: (optional) The delay of operations without
+               recorded latencies.
+        :param float min_delay: (optional) The shortest delay used.
+        :param Iterable[str] operations: (optional) Only hedge these
+               operations, for example `get_occurrence`.
+        :param Iterable[str] methods: (optional) The HTTP methods to hedge.
+        :param float max_ratio: (optional) Each request earns this fraction of
+               a hedge, so hedges add at most this fraction of extra requests.
+        :param int burst: (optional) The number of unused hedges that can be
+               saved up.
+        :param int max_workers: (optional) The size of the thread pool.
+        """
+        super().__init__(transport)
+        if max_ratio is None or max_ratio < 0:
+            raise ValueError('max_ratio must not be negative')
+        if burst is None or burst < 1:
+            raise ValueError('burst must be at least 1')
+        self.delay = delay
+        self.metrics = metrics
+        self.quantile = quantile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.operations = frozenset(operations) if operations is not None else None
+        self.methods = tuple(method.upper() for method in methods)
+        self.max_ratio = max_ratio
+        self.burst = burst
+        self._budget = float(burst)
+        self._lock = threading.Lock()
+        self._counters = {'requests': 0, 'hedged': 0, 'hedge_wins': 0, 'primary_wins': 0, 'throttled': 0}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedge')
+
+    def get_delay(self, operation_id: str) -> float:
+        """Return the seconds to wait before hedging a request of an operation."""
+        if callable(self.delay):
+            delay = self.delay(operation_id)
+        elif self.delay is not None:
+            delay = self.delay
+        else:
+            delay = self.metrics.percentile(operation_id, self.quantile) if self.metrics is not None else None
+            if delay is None:
+                delay = self.default_delay
+        return max(delay, self.min_delay)
+
+    def snapshot(self) -> Dict[str, int]:
+        """
+        Return the counters: `requests` considered for hedging, `hedged`,
+        `hedge_wins` and `primary_wins` among the hedged requests, and
+        `throttled` requests that were not hedged because the budget was spent.
+        """
+        with self._lock:
+            return dict(self._counters)
+
+    def send(self, service: BaseService, request: dict, *, operation_id: str = None, **kwargs) -> DetailedResponse:
+        if not self._hedgeable(request, operation_id, kwargs):
+            return self.transport.send(service, request, operation_id=operation_id, **kwargs)
+        with self._lock:
+            self._counters['requests'] += 1
+            self._budget = min(self._budget + self.max_ratio, float(self.burst))
+
+        def attempt(attempt_request: dict) -> DetailedResponse:
+            return self.transport.send(service, attempt_request, operation_id=operation_id, **kwargs)
+
+        primary = self._submit(attempt, request)
+        delay = self.get_delay(operation_id)
+        timeout = budget_timeout(delay)
+        if wait([primary], timeout=timeout).done:
+            return primary.result()
+        if timeout < delay:
+            return _result(primary)
+        with self._lock:
+            hedge = self._budget >= 1.0
+            if hedge:
+                self._budget -= 1.0
+                self._counters['hedged'] += 1
+            else:
+                self._counters['throttled'] += 1
+        if not hedge:
+            return _result(primary)
+        add_event('hedge', operation_id=operation_id)
+        # The transport may add headers, such as Authorization, to the request.
+        secondary = self._submit(attempt, dict(request, headers=dict(request.get('headers') or {})))
+        pending = {primary, secondary}
+        while True:
+            (done, pending) = wait(pending, timeout=budget_timeout(None), return_when=FIRST_COMPLETED)
+            if not done:
+                raise DeadlineExceeded('The deadline passed while waiting for a hedged request')
+            winner = min(done, key=lambda future: (not _responded(future), future is not primary))
+            if _responded(winner) or not pending:
+                break
+        for future in pending:
+            future.cancel()
+        with self._lock:
+            self._counters['primary_wins' if winner is primary else 'hedge_wins'] += 1
+        return winner.result()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        super().close()
+
+    def _hedgeable(self, request: dict, operation_id: str, kwargs: Dict) -> bool:
+        if str(request.get('method', '')).upper() not in self.methods or kwargs.get('stream'):
+            return False
+        return self.operations is None or operation_id in self.operations
+
+    def _submit(self, func: Callable, *args):
+        # Each copy runs in a copy of the caller's context, so that the request
+        # timeout and tracing state apply to it.
+        return self._executor.submit(contextvars.copy_context().run, func, *args)
+
+
+def _result(future) -> DetailedResponse:
+    # The result of a request running on the pool, waiting at most until the
+    # deadline of the calling thread.
+    try:
+        return future.result(timeout=budget_timeout(None))
+    except FutureTimeoutError:
+        if future.done():
+            raise
+        raise DeadlineExceeded('The deadline passed while waiting for a hedged request') from None
+
+
+def _responded(future) -> bool:
+    # Whether the service answered, successfully or with an error response.
+    error = future.exception()
+    return error is None or isinstance(error, ApiException)
@@ -0,0 +1,402 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Per-operation latency and throughput instrumentation for the service clients.
+
+Every call made through `FindingsApiV1` or `NotificationsApiV1` produces an
+`OperationMetrics` record, keyed by the operation id of the method, which is
+passed to the hooks registered with `add_instrumentation_hook`. When no hook is
+registered the instrumentation is bypassed entirely.
+
+    metrics = InMemoryMetrics()
+    findings_service.add_instrumentation_hook(metrics)
+    findings_service.list_providers(account_id)
+    metrics.percentile('list_providers', 0.95)
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Union
+
+from ibm_cloud_sdk_core import ApiException, BaseService, DetailedResponse
+
+from .tracing import TRANSACTION_ID_HEADER, add_event, current_span, use_span
+from .transport import Transport
+
+logger = logging.getLogger(__name__)
+
+_build_time = ContextVar('security_advisor_build_time', default=None)
+_pool_wait = ContextVar('security_advisor_pool_wait', default=None)
+_retries = ContextVar('security_advisor_retries', default=None)
+
+
+def record_build_time(seconds: float) -> None:
+    """Record how long the request about to be sent took to build."""
+    _build_time.set(seconds)
+
+
+def record_pool_wait(seconds: float) -> None:
+    """Record time the current request spent waiting for a free connection slot."""
+    _pool_wait.set((_pool_wait.get() or 0.0) + seconds)
+
+
+def record_retry() -> None:
+    """Record that the current request was retried by an SDK component."""
+    _retries.set((_retries.get() or 0) + 1)
+    add_event('retry')
+
+
+class OperationMetrics():
+    """
+    Measurements taken for a single call to a service operation.
+
+    :attr str service_name: The service the operation belongs to.
+    :attr str operation_id: The operation id, for example `list_occurrences`.
+    :attr str transaction_id: The `Transaction-Id` the request was sent with.
+    :attr str method: The HTTP method.
+    :attr int status_code: The HTTP status code, or None if no response was
+          received.
+    :attr float build_time: Seconds spent preparing the request.
+    :attr float network_time: Seconds between sending the request and receiving
+          the response headers.
+    :attr float parse_time: Seconds spent reading and decoding the response.
+    :attr float total_time: Seconds spent in the transport.
+    :attr int retries: Number of retries made while sending the request.
+    :attr int bytes_out: Size of the request body in bytes.
+    :attr int bytes_in: Size of the response body in bytes, if known.
+    :attr float pool_wait: Seconds spent waiting for a connection slot.
+    :attr Exception error: The exception raised by the call, if any.
+    """
+
+    __slots__ = ('service_name', 'operation_id', 'transaction_id', 'method', 'status_code', 'build_time', 'network_time',
+                 'parse_time', 'total_time', 'retries', 'bytes_out', 'bytes_in', 'pool_wait', 'error')
+
+    def __init__(self, service_name: str, operation_id: str, method: str) -> None:
+        self.service_name = service_name
+        self.operation_id = operation_id
+        self.transaction_id = None
+        self.method = method
+        self.status_code = None
+        self.build_time = 0.0
+        self.network_time = 0.0
+        self.parse_time = 0.0
+        self.total_time = 0.0
+        self.retries = 0
+        self.bytes_out = 0
+        self.bytes_in = None
+        self.pool_wait = 0.0
+        self.error = None
+
+    def to_dict(self) -> Dict:
+        """Return a dictionary representing these measurements."""
+        _dict = {name: getattr(self, name) for name in self.__slots__ if name != 'error'}
+        _dict['error'] = type(self.error).__name__ if self.error is not None else None
+        return _dict
+
+    def __repr__(self) -> str:
+        return 'OperationMetrics({0})'.format(self.to_dict())
+
+
+class InstrumentationHook():
+    """
+    Receives an `OperationMetrics` record when a service operation completes.
+
+    Hooks are called synchronously on the calling thread, so they should be
+    cheap; exceptions raised by a hook are logged and ignored.
+    """
+
+    def on_operation(self, metrics: OperationMetrics) -> None:
+        """Handle the measurements of a completed operation."""
+        raise NotImplementedError()
+
+
+class _CallableHook(InstrumentationHook):
+
+    def __init__(self, func: Callable[[OperationMetrics], None]) -> None:
+        self.func = func
+
+    def on_operation(self, metrics: OperationMetrics) -> None:
+        self.func(metrics)
+
+
+class Instrumentation():
+    """
+    The set of hooks attached to a service client.
+
+    :attr list hooks: The registered hooks.
+    """
+
+    def __init__(self) -> None:
+        self.hooks = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook: Union[InstrumentationHook, Callable[[OperationMetrics], None]]) -> InstrumentationHook:
+        """
+        Register a hook. Plain callables are wrapped in an `InstrumentationHook`.
+
+        :return: The registered hook, which can be passed to `remove_hook`.
+        """
+        if hook is None:
+            raise ValueError('hook must be provided')
+        if not isinstance(hook, InstrumentationHook):
+            hook = _CallableHook(hook)
+        with self._lock:
+            # Copy on write so send() can iterate without locking.
+            self.hooks = self.hooks + [hook]
+        return hook
+
+    def remove_hook(self, hook: InstrumentationHook) -> None:
+        """Unregister a hook."""
+        with self._lock:
+            self.hooks = [h for h in self.hooks if h is not hook and getattr(h, 'func', None) is not hook]
+
+    def send(self, transport: Transport, service: BaseService, request: dict, *, operation_id: str = None,
+             **kwargs) -> DetailedResponse:
+        """
+        Send a request through `transport`, measuring it if any hooks are
+        registered or a span is being recorded.
+        """
+        hooks = self.hooks
+        parent_span = current_span()
+        if not hooks and parent_span is None:
+            return transport.send(service, request, operation_id=operation_id, **kwargs)
+
+        metrics = OperationMetrics(getattr(service, 'DEFAULT_SERVICE_NAME', None), operation_id, request.get('method'))
+        metrics.transaction_id = (request.get('headers') or {}).get(TRANSACTION_ID_HEADER)
+        metrics.build_time = _build_time.get() or 0.0
+        metrics.bytes_out = _body_size(request.get('data'))
+        _build_time.set(None)
+        pool_wait_token = _pool_wait.set(None)
+        retries_token = _retries.set(None)
+        captured = {}
+
+        def capture_response(response, *args, **kw):
+            captured['elapsed'] = response.elapsed.total_seconds()
+            captured['retries'] = _urllib3_retries(response)
+            captured['response'] = response
+            return response
+
+        kwargs['hooks'] = _merge_response_hook(kwargs.get('hooks'), capture_response)
+        operation_span = None
+        if parent_span is not None:
+            operation_span = parent_span.child(operation_id or request.get('method'))
+        start = time.perf_counter()
+        try:
+            with use_span(operation_span):
+                response = transport.send(service, request, operation_id=operation_id, **kwargs)
+            metrics.status_code = response.get_status_code()
+            return response
+        except ApiException as err:
+            metrics.status_code = err.status_code
+            metrics.error = err
+            if err.http_response is not None:
+                captured.setdefault('response', err.http_response)
+            raise
+        except Exception as err:
+            metrics.error = err
+            raise
+        finally:
+            metrics.total_time = time.perf_counter() - start
+            metrics.network_time = min(captured.get('elapsed', metrics.total_time), metrics.total_time)
+            metrics.parse_time = metrics.total_time - metrics.network_time
+            if 'response' in captured:
+                metrics.bytes_in = _content_length(captured['response'], kwargs.get('stream', False))
+            metrics.retries = captured.get('retries', 0) + (_retries.get() or 0)
+            metrics.pool_wait = _pool_wait.get() or 0.0
+            _pool_wait.reset(pool_wait_token)
+            _retries.reset(retries_token)
+            if operation_span is not None:
+                operation_span.attributes.update(metrics.to_dict())
+                operation_span.finish(metrics.error)
+            self.emit(metrics)
+
+    def emit(self, metrics: OperationMetrics) -> None:
+        """Pass a record to every registered hook."""
+        for hook in self.hooks:
+            try:
+                hook.on_operation(metrics)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('Instrumentation hook %r failed', hook)
+
+
+def _body_size(data) -> int:
+    if isinstance(data, (bytes, bytearray, str)):
+        return len(data)
+    return 0
+
+
+def _content_length(response, stream: bool) -> int:
+    length = response.headers.get('Content-Length')
+    if length is not None:
+        return int(length)
+    if stream:
+        # Reading the body here would consume the stream the caller asked for.
+        return None
+    return len(response.content or b'')
+
+
+def _urllib3_retries(response) -> int:
+    retries = getattr(getattr(response, 'raw', None), 'retries', None)
+    history = getattr(retries, 'history', None)
+    return len(history) if history else 0
+
+
+def _merge_response_hook(hooks: Dict, hook: Callable) -> Dict:
+    hooks = dict(hooks or {})
+    existing = hooks.get('response')
+    if existing is None:
+        hooks['response'] = [hook]
+    elif callable(existing):
+        hooks['response'] = [existing, hook]
+    else:
+        hooks['response'] = list(existing) + [hook]
+    return hooks
+
+
+class InMemoryMetrics(InstrumentationHook):
+    """
+    Keeps per-operation counters and a window of recent latencies in memory.
+
+    :attr int window: The number of most recent latencies kept per operation.
+    """
+
+    def __init__(self, window: int = 1000) -> None:
+        self.window = window
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._counters = {}
+
+    def on_operation(self, metrics: OperationMetrics) -> None:
+        with self._lock:
+            latencies = self._latencies.get(metrics.operation_id)
+            if latencies is None:
+                latencies = self._latencies[metrics.operation_id] = deque(maxlen=self.window)
+            latencies.append(metrics.total_time)
+            counters = self._counters.setdefault(metrics.operation_id, {
+                'count': 0, 'errors': 0, 'retries': 0, 'bytes_in': 0, 'bytes_out': 0, 'total_time': 0.0})
+            counters['count'] += 1
+            counters['errors'] += 1 if metrics.error is not None else 0
+            counters['retries'] += metrics.retries
+            counters['bytes_in'] += metrics.bytes_in or 0
+            counters['bytes_out'] += metrics.bytes_out
+            counters['total_time'] += metrics.total_time
+
+    def percentile(self, operation_id: str, quantile: float) -> float:
+        """
+        Return the given quantile, between 0 and 1, of the recent latencies of
+        an operation, or None if it has not been called.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies.get(operation_id, ()))
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, max(0, int(round(quantile * (len(latencies) - 1)))))
+        return latencies[index]
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Return a copy of the counters of every operation."""
+        with self._lock:
+            return {operation_id: dict(counters) for (operation_id, counters) in self._counters.items()}
+
+    def operations(self) -> List[str]:
+        """Return the operation ids that have been recorded."""
+        with self._lock:
+            return list(self._counters)
+
+
+class OpenTelemetryHook(InstrumentationHook):
+    """
+    Records operation metrics with OpenTelemetry. Requires the
+    `opentelemetry-api` package.
+    """
+
+    def __init__(self, meter=None) -> None:
+        """
+        :param meter: (optional) The OpenTelemetry `Meter` to record with.
+               Defaults to the meter of this module from the global provider.
+        """
+        try:
+            from opentelemetry import metrics as otel_metrics
+        except ImportError:
+            raise ImportError('OpenTelemetryHook requires the opentelemetry-api package')
+        if meter is None:
+            meter = otel_metrics.get_meter(__name__)
+        self._duration = meter.create_histogram('security_advisor.client.duration', unit='s',
+                                                description='Duration of Security Advisor operations by phase')
+        self._bytes = meter.create_counter('security_advisor.client.bytes', unit='By',
+                                           description='Bytes sent and received by Security Advisor operations')
+        self._retries = meter.create_counter('security_advisor.client.retries',
+                                             description='Retries made by Security Advisor operations')
+
+    def on_operation(self, metrics: OperationMetrics) -> None:
+        attributes = {
+            'service': metrics.service_name or '',
+            'operation_id': metrics.operation_id or '',
+            'status_code': metrics.status_code or 0
+        }
+        phases = (('build', metrics.build_time), ('network', metrics.network_time), ('parse', metrics.parse_time),
+                  ('total', metrics.total_time), ('pool_wait', metrics.pool_wait))
+        for (phase, seconds) in phases:
+            self._duration.record(seconds, dict(attributes, phase=phase))
+        self._bytes.add(metrics.bytes_out, dict(attributes, direction='out'))
+        self._bytes.add(metrics.bytes_in or 0, dict(attributes, direction='in'))
+        if metrics.retries:
+            self._retries.add(metrics.retries, attributes)
+
+
+class PrometheusHook(InstrumentationHook):
+    """
+    Records operation metrics with the Prometheus client. Requires the
+    `prometheus_client` package.
+    """
+
+    def __init__(self, registry=None, namespace: str = 'security_advisor') -> None:
+        """
+        :param registry: (optional) The `CollectorRegistry` to register the
+               metrics with. Defaults to the global registry.
+        :param str namespace: (optional) Prefix of the metric names.
+        """
+        try:
+            import prometheus_client
+        except ImportError:
+            raise ImportError('PrometheusHook requires the prometheus_client package')
+        kwargs = {'namespace': namespace}
+        if registry is not None:
+            kwargs['registry'] = registry
+        labels = ['service', 'operation_id', 'status_code']
+        self._duration = prometheus_client.Histogram('client_duration_seconds',
+                                                     'Duration of Security Advisor operations by phase',
+                                                     labels + ['phase'], **kwargs)
+        self._bytes = prometheus_client.Counter('client_bytes', 'Bytes sent and received by Security Advisor operations',
+                                                labels + ['direction'], **kwargs)
+        self._retries = prometheus_client.Counter('client_retries', 'Retries made by Security Advisor operations',
+                                                  labels, **kwargs)
+
+    def on_operation(self, metrics: OperationMetrics) -> None:
+        labels = (metrics.service_name or '', metrics.operation_id or '', str(metrics.status_code or 0))
+        self._duration.labels(*labels, 'build').observe(metrics.build_time)
+        self._duration.labels(*labels, 'network').observe(metrics.network_time)
+        self._duration.labels(*labels, 'parse').observe(metrics.parse_time)
+        self._duration.labels(*labels, 'total').observe(metrics.total_time)
+        self._duration.labels(*labels, 'pool_wait').observe(metrics.pool_wait)
+        self._bytes.labels(*labels, 'out').inc(metrics.bytes_out)
+        self._bytes.labels(*labels, 'in').inc(metrics.bytes_in or 0)
+        if metrics.retries:
+            self._retries.labels(*labels).inc(metrics.retries)
@@ -0,0 +1,353 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Circuit breakers and bulkheads for service endpoints.
+
+`IsolationTransport` keeps a `CircuitBreaker` per service endpoint, or per
+operation, and a `Bulkhead` per endpoint. A breaker opens after consecutive
+failures and rejects requests until a probe succeeds; a bulkhead caps the
+requests in flight to an endpoint. Rejected requests raise `CircuitOpenError`
+or `BulkheadFullError` at once, so a degraded endpoint does not tie up the
+threads working with the others.
+
+    transport = IsolationTransport(max_concurrent=8, failure_threshold=5, reset_timeout=30)
+    findings_service = FindingsApiV1(authenticator, transport=transport)
+    notifications_service = NotificationsApiV1(authenticator, transport=transport)
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Hashable
+
+from ibm_cloud_sdk_core import ApiException, BaseService, DetailedResponse
+
+from .instrumentation import record_pool_wait
+from .sdk_logging import logger
+from .tracing import add_event
+from .transport import DeadlineExceeded, Transport, TransportWrapper, budget_timeout
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+DEFAULT_HALF_OPEN_CALLS = 1
+
+
+class CircuitOpenError(ApiException):
+    """
+    Raised instead of sending a request while a circuit breaker is open. The
+    status code is 503, so callers treat it like an unavailable service.
+    """
+
+    def __init__(self, name: str, retry_after: float) -> None:
+        super().__init__(503, message='Circuit breaker {0} is open; retry in {1:.1f}s'.format(name, retry_after))
+        self.retry_after = retry_after
+
+
+class BulkheadFullError(ApiException):
+    """
+    Raised instead of sending a request when an endpoint already has the
+    maximum number of requests in flight. The status code is 503.
+    """
+
+    def __init__(self, name: str, max_concurrent: int) -> None:
+        super().__init__(503, message='Bulkhead {0} is full ({1} requests in flight)'.format(name, max_concurrent))
+
+
+def is_failure(error: Exception) -> bool:
+    """
+    Whether an error counts against a circuit breaker: a server error, a rate
+    limit or timeout response, or a request that got no response. Requests
+    that were not sent because of a breaker, a bulkhead or a deadline do not
+    count.
+    """
+    if _not_sent(error):
+        return False
+    if isinstance(error, ApiException):
+        return error.status_code >= 500 or error.status_code in (408, 429)
+    return True
+
+
+def _not_sent(error: Exception) -> bool:
+    return isinstance(error, (CircuitOpenError, BulkheadFullError, DeadlineExceeded))
+
+
+class CircuitBreaker():
+    """
+    Rejects calls after `failure_threshold` consecutive failures. Once
+    `reset_timeout` seconds have passed, up to `half_open_calls` probe calls
+    are let through: a successful probe closes the breaker and a failed one
+    opens it again.
+
+    :attr str name: The name used in errors and logs.
+    :attr int failures: The current number of consecutive failures.
+    :attr int rejected: The number of calls rejected.
+    """
+
+    def __init__(self, name: str = None, *, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout: float = DEFAULT_RESET_TIMEOUT, half_open_calls: int = DEFAULT_HALF_OPEN_CALLS,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        if failure_threshold is None or failure_threshold < 1:
+            raise ValueError('failure_threshold must be at least 1')
+        if half_open_calls is None or half_open_calls < 1:
+            raise ValueError('half_open_calls must be at least 1')
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+        self.failures = 0
+        self.rejected = 0
+        self._state = CLOSED
+        self._opened_at = None
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """`closed`, `open` or `half_open`."""
+        with self._lock:
+            if self._state == OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def acquire(self) -> None:
+        """
+        Let a call through, or raise `CircuitOpenError`. Every call let through
+        must be followed by `record_success`, `record_failure` or `release`.
+        """
+        with self._lock:
+            if self._state == OPEN:
+                retry_after = self.reset_timeout - (self.clock() - self._opened_at)
+                if retry_after > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, retry_after)
+                self._transition(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                if self._probes >= self.half_open_calls:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, 0.0)
+                self._probes += 1
+
+    def release(self) -> None:
+        """Give back the probe slot of a call that was let through but not made."""
+        with self._lock:
+            if self._state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record_success(self) -> None:
+        """Record a call that succeeded."""
+        with self._lock:
+            self.failures = 0
+            if self._state != CLOSED:
+                self._transition(CLOSED)
+
+    def record_failure(self) -> None:
+        """Record a call that failed."""
+        with self._lock:
+            self.failures += 1
+            if self._state == HALF_OPEN or (self._state == CLOSED and self.failures >= self.failure_threshold):
+                self._transition(OPEN)
+
+    def _transition(self, state: str) -> None:
+        if state == OPEN:
+            self._opened_at = self.clock()
+            logger.warning('Circuit breaker %s opened after %s failures', self.name, self.failures)
+        elif state == CLOSED:
+            logger.info('Circuit breaker %s closed', self.name)
+        self._probes = 0
+        self._state = state
+        add_event('circuit_breaker', breaker=self.name, state=state)
+
+
+class Bulkhead():
+    """
+    Caps the number of calls in flight. A call waits up to `max_wait` seconds
+    for a slot, recorded as pool wait time, and then raises
+    `BulkheadFullError`.
+
+    :attr str name: The name used in errors.
+    :attr int max_concurrent: The maximum number of calls in flight.
+    :attr float max_wait: The seconds a call waits for a slot.
+    :attr int rejected: The number of calls rejected.
+    """
+
+    def __init__(self, name: str = None, *, max_concurrent: int, max_wait: float = 0.0) -> None:
+        if max_concurrent is None or max_concurrent < 1:
+            raise ValueError('max_concurrent must be at least 1')
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self.rejected = 0
+        self._in_flight = 0
+        self._semaphore = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        """The number of calls in flight."""
+        return self._in_flight
+
+    def acquire(self) -> None:
+        """
+        Take a slot, or raise `BulkheadFullError`. The wait ends early with
+        `DeadlineExceeded` if the deadline of the context passes first.
+        """
+        start = time.perf_counter()
+        if self.max_wait:
+            timeout = budget_timeout(self.max_wait)
+            acquired = self._semaphore.acquire(timeout=timeout)
+            record_pool_wait(time.perf_counter() - start)
+            if not acquired and timeout < self.max_wait:
+                raise DeadlineExceeded('The deadline passed while waiting for bulkhead {0}'.format(self.name))
+        else:
+            acquired = self._semaphore.acquire(blocking=False)
+        with self._lock:
+            if not acquired:
+                self.rejected += 1
+                raise BulkheadFullError(self.name, self.max_concurrent)
+            self._in_flight += 1
+
+    def release(self) -> None:
+        """Give back a slot."""
+        with self._lock:
+            self._in_flight -= 1
+        self._semaphore.release()
+
+
+class IsolationTransport(TransportWrapper):
+    """
+    Sends requests through a circuit breaker and, if `max_concurrent` is set,
+    a bulkhead of their endpoint.
+
+    Endpoints are told apart by the service name and URL of the client, so a
+    transport shared by both clients isolates them from each other.
+
+    Any response of the service, including a client error, counts as a
+    success. A request that was never sent, because its deadline passed or a
+    wrapped transport rejected it, counts neither way.
+
+    :attr bool per_operation: Whether each operation has its own breaker.
+    """
+
+    def __init__(self, transport: Transport = None, *, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout: float = DEFAULT_RESET_TIMEOUT, half_open_calls: int = DEFAULT_HALF_OPEN_CALLS,
+                 per_operation: bool = False, max_concurrent: int = None, max_wait: float = 0.0,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        :param Transport transport: (optional) The transport to wrap. Defaults
+               to a `RequestsTransport`.
+        :param int failure_threshold: (optional) The consecutive failures that
+               open a breaker.
+        :param float reset_timeout: (optional) Seconds an open breaker waits
+               before letting probe requests through.
+        :param int half_open_calls: (optional) The number of concurrent probe
+               requests.
+        :param bool per_operation: (optional) Keep a breaker per operation
+               rather than per endpoint.
+        :param int max_concurrent: (optional) The maximum number of requests in
+               flight per endpoint. Unlimited by default.
+        :param float max_wait: (optional) Seconds a request waits for a
+               bulkhead slot.
+        """
+        super().__init__(transport)
+        if max_concurrent is not None and max_concurrent < 1:
+            raise ValueError('max_concurrent must be at least 1')
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.per_operation = per_operation
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self.clock = clock
+        self._breakers = {}
+        self._bulkheads = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, service: BaseService, operation_id: str = None) -> CircuitBreaker:
+        """Return the circuit breaker of a client's endpoint, or of one of its operations."""
+        endpoint = self._endpoint(service)
+        key = (endpoint, operation_id) if self.per_operation else (endpoint, None)
+        name = '/'.join(str(part) for part in key if part is not None)
+        return self._get(self._breakers, key, lambda: CircuitBreaker(
+            name, failure_threshold=self.failure_threshold, reset_timeout=self.reset_timeout,
+            half_open_calls=self.half_open_calls, clock=self.clock))
+
+    def bulkhead(self, service: BaseService) -> Bulkhead:
+        """Return the bulkhead of a client's endpoint, or None if concurrency is unlimited."""
+        if self.max_concurrent is None:
+            return None
+        endpoint = self._endpoint(service)
+        return self._get(self._bulkheads, endpoint, lambda: Bulkhead(
+            endpoint, max_concurrent=self.max_concurrent, max_wait=self.max_wait))
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Return the state of every breaker and bulkhead, by name."""
+        with self._lock:
+            (breakers, bulkheads) = (list(self._breakers.values()), list(self._bulkheads.values()))
+        states = {}
+        for breaker in breakers:
+            states.setdefault(breaker.name, {}).update(
+                {'state': breaker.state, 'failures': breaker.failures, 'rejected': breaker.rejected})
+        for bulkhead in bulkheads:
+            states.setdefault(bulkhead.name, {}).update(
+                {'in_flight': bulkhead.in_flight, 'bulkhead_rejected': bulkhead.rejected})
+        return states
+
+    def send(self, service: BaseService, request: dict, *, operation_id: str = None, **kwargs) -> DetailedResponse:
+        breaker = self.breaker(service, operation_id)
+        breaker.acquire()
+        bulkhead = self.bulkhead(service)
+        if bulkhead is not None:
+            try:
+                bulkhead.acquire()
+            except (BulkheadFullError, DeadlineExceeded):
+                breaker.release()
+                raise
+        try:
+            response = self.transport.send(service, request, operation_id=operation_id, **kwargs)
+        except Exception as err:
+            if is_failure(err):
+                breaker.record_failure()
+            elif _not_sent(err):
+                breaker.release()
+            else:
+                # The service responded, for example with a client error.
+                breaker.record_success()
+            raise
+        finally:
+            if bulkhead is not None:
+                bulkhead.release()
+        breaker.record_success()
+        return response
+
+    @staticmethod
+    def _endpoint(service: BaseService) -> str:
+        return '{0}@{1}'.format(getattr(service, 'DEFAULT_SERVICE_NAME', type(service).__name__),
+                                service.service_url)
+
+    def _get(self, items: Dict, key: Hashable, create: Callable):
+        item = items.get(key)
+        if item is None:
+            with self._lock:
+                item = items.get(key)
+                if item is None:
+                    item = items[key] = create()
+        return item
@@ -0,0 +1,483 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+An in-process fake of the Findings and Notifications endpoints.
+
+`MockTransport` can be passed to `FindingsApiV1` and `NotificationsApiV1` in
+place of the default HTTP transport. Requests are served from a stateful
+`MockBackend`, which supports pagination, latency injection and simulated
+rate limiting, so pipelines built on the SDK can be load tested without a
+network or an IBM Cloud account.
+
+    backend = MockBackend(latency=0.01, throttle_rate=0.05)
+    findings = FindingsApiV1(NoAuthAuthenticator(), transport=MockTransport(backend))
+    notifications = NotificationsApiV1(NoAuthAuthenticator(), transport=MockTransport(backend))
+"""
+
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Union
+
+import requests
+from ibm_cloud_sdk_core import ApiException, BaseService, DetailedResponse, datetime_to_string
+
+from .transport import Transport, budget_timeout
+
+DEFAULT_PAGE_SIZE = 200
+
+_SEVERITIES = ['critical', 'high', 'medium', 'low']
+
+
+class MockBackend():
+    """
+    Stateful fake of the Security Advisor Findings and Notifications services.
+
+    All state is kept per account. The backend is thread safe and may be shared
+    by any number of clients and transports.
+
+    :attr Counter calls: The number of requests served, by operation.
+    """
+
+    def __init__(self,
+                 *,
+                 latency: Union[float, Dict[str, float], Callable[[str, str], float]] = 0.0,
+                 throttle_rate: float = 0.0,
+                 retry_after: int = 1,
+                 public_key: str = 'mock-public-key',
+                 seed: int = None) -> None:
+        """
+        Initialize a MockBackend.
+
+        :param latency: (optional) The simulated service time of each request in
+               seconds. Either a number, a `dict` keyed by operation id, or a
+               callable taking `(operation_id, path)`.
+        :param float throttle_rate: (optional) The fraction of requests, between
+               0 and 1, that are rejected with `429 Too Many Requests`.
+        :param int retry_after: (optional) The `Retry-After` value, in seconds,
+               sent with simulated 429 responses.
+        :param str public_key: (optional) The key returned by `get_public_key`.
+        :param int seed: (optional) Seed for the random throttling decisions.
+        """
+        if not 0.0 <= throttle_rate <= 1.0:
+            raise ValueError('throttle_rate must be between 0 and 1')
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.public_key = public_key
+        self.calls = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._injected_errors = []
+        self._providers = {}
+        self._notes = {}
+        self._occurrences = {}
+        self._channels = {}
+        self._routes = [
+            ('POST', r'/v1/(?P<account_id>[^/]+)/graph', self._post_graph),
+            ('GET', r'/v1/(?P<account_id>[^/]+)/providers', self._list_providers),
+            ('POST', r'/v1/(?P<account_id>[^/]+)/providers/(?P<provider_id>[^/]+)/notes', self._create_note),
+            ('GET', r'/v1/(?P<account_id>[^/]+)/providers/(?P<provider_id>[^/]+)/notes', self._list_notes),
+            ('GET', r'/v1/(?P<account_id>[^/]+)/providers/(?P<provider_id>[^/]+)/notes/(?P<note_id>[^/]+)', self._get_note),
+            ('PUT', r'/v1/(?P<account_id>[^/]+)/providers/(?P<provider_id>[^/]+)/notes/(?P<note_id>[^/]+)', self._update_note),
+            ('DELETE', r'/v1/(?P<account_id>[^/]+)/providers/(?P<provider_id>[^/]+)/notes/(?P<note_id>[^/]+)', self._delete_note),
+            ('GET', r'/v1/(?P<account_id>[^/]+)/providers/(?P<provider_id>[^/]+)/notes/(?P<note_id>[^/]+)/occurrences',
+             self._list_note_occurrences),
+            ('POST', r'/v1/(?P<account_id>[^/]+)/providers/(?P<provider_id>[^/]+)/occurrences', self._create_occurrence),
+            ('GET', r'/v1/(?P<account_id>[^/]+)/providers/(?P<provider_id>[^/]+)/occurrences', self._list_occurrences),
+            ('GET', r'/v1/(?P<account_id>[^/]+)/providers/(?P<provider_id>[^/]+)/occurrences/(?P<occurrence_id>[^/]+)',
+             self._get_occurrence),
+            ('PUT', r'/v1/(?P<account_id>[^/]+)/providers/(?P<provider_id>[^/]+)/occurrences/(?P<occurrence_id>[^/]+)',
+             self._update_occurrence),
+            ('DELETE', r'/v1/(?P<account_id>[^/]+)/providers/(?P<provider_id>[^/]+)/occurrences/(?P<occurrence_id>[^/]+)',
+             self._delete_occurrence),
+            ('GET', r'/v1/(?P<account_id>[^/]+)/providers/(?P<provider_id>[^/]+)/occurrences/(?P<occurrence_id>[^/]+)/note',
+             self._get_occurrence_note),
+            ('GET', r'/v1/(?P<account_id>[^/]+)/notifications/channels', self._list_channels),
+            ('POST', r'/v1/(?P<account_id>[^/]+)/notifications/channels', self._create_channel),
+            ('DELETE', r'/v1/(?P<account_id>[^/]+)/notifications/channels', self._delete_channels),
+            ('GET', r'/v1/(?P<account_id>[^/]+)/notifications/channels/(?P<channel_id>[^/]+)', self._get_channel),
+            ('PUT', r'/v1/(?P<account_id>[^/]+)/notifications/channels/(?P<channel_id>[^/]+)', self._update_channel),
+            ('DELETE', r'/v1/(?P<account_id>[^/]+)/notifications/channels/(?P<channel_id>[^/]+)', self._delete_channel),
+            ('GET', r'/v1/(?P<account_id>[^/]+)/notifications/channels/(?P<channel_id>[^/]+)/test', self._test_channel),
+            ('GET', r'/v1/(?P<account_id>[^/]+)/notifications/public_key', self._get_public_key),
+        ]
+        self._routes = [(method, re.compile(pattern + '$'), handler) for (method, pattern, handler) in self._routes]
+
+    #########################
+    # Fault injection
+    #########################
+
+    def inject_error(self, status_code: int, *, count: int = 1, operation_id: str = None) -> None:
+        """
+        Fail the next `count` requests (optionally only those for `operation_id`)
+        with the given HTTP status code.
+
+        :param int status_code: The status code to respond with.
+        :param int count: (optional) The number of requests to fail.
+        :param str operation_id: (optional) Only fail requests for this operation.
+        """
+        with self._lock:
+            self._injected_errors.append([status_code, count, operation_id])
+
+    def get_latency(self, operation_id: str, path: str) -> float:
+        """Return the simulated service time of a request in seconds."""
+        if callable(self.latency):
+            return self.latency(operation_id, path)
+        if isinstance(self.latency, dict):
+            return self.latency.get(operation_id, 0.0)
+        return self.latency
+
+    #########################
+    # Seeding
+    #########################
+
+    def add_provider(self, account_id: str, provider_id: str, *, name: str = None) -> None:
+        """Register a provider without creating notes for it."""
+        with self._lock:
+            self._providers.setdefault(account_id, {})[provider_id] = {'id': provider_id, 'name': name or provider_id}
+
+    def add_occurrences(self, account_id: str, provider_id: str, occurrences: List[Dict]) -> None:
+        """Store occurrence dictionaries as if they had been created through the API."""
+        with self._lock:
+            for occurrence in occurrences:
+                self._put_occurrence(account_id, provider_id, dict(occurrence))
+
+    def add_channels(self, account_id: str, channels: List[Dict]) -> List[str]:
+        """Store channel dictionaries as if they had been created through the API."""
+        with self._lock:
+            return [self._put_channel(account_id, None, dict(channel)) for channel in channels]
+
+    #########################
+    # Dispatch
+    #########################
+
+    def handle(self, method: str, path: str, *, params: Dict = None, body=None, headers: Dict = None,
+               operation_id: str = None, timeout: float = None) -> DetailedResponse:
+        """
+        Serve a single request.
+
+        :param str method: The HTTP method.
+        :param str path: The request path relative to the service URL.
+        :param dict params: (optional) The query parameters.
+        :param body: (optional) The decoded JSON request body.
+        :param dict headers: (optional) The request headers.
+        :param str operation_id: (optional) The SDK operation being invoked.
+        :param float timeout: (optional) Raise `requests.exceptions.Timeout` if
+               the simulated service time exceeds this many seconds.
+        :return: A `DetailedResponse` containing the result, headers and HTTP status code.
+        :rtype: DetailedResponse
+        """
+        with self._lock:
+            self.calls[operation_id or '{0} {1}'.format(method, path)] += 1
+        delay = self.get_latency(operation_id, path)
+        if isinstance(timeout, tuple):
+            timeout = timeout[-1]
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise requests.exceptions.Timeout('Mock request timed out after {0}s'.format(timeout))
+        if delay > 0:
+            time.sleep(delay)
+
+        status = self._next_injected_error(operation_id)
+        if status is not None:
+            raise self._error(status, 'Injected error')
+        if self.throttle_rate and self._random_throttle():
+            raise self._error(429, 'Too Many Requests', {'Retry-After': str(self.retry_after)})
+
+        for (route_method, pattern, handler) in self._routes:
+            match = pattern.match(path)
+            if route_method == method and match:
+                with self._lock:
+                    status, result = handler(params=params or {}, body=body, headers=headers or {},
+                                             **match.groupdict())
+                break
+        else:
+            status, result = 404, {'message': 'No route for {0} {1}'.format(method, path)}
+        if status >= 400:
+            raise self._error(status, result.get('message'))
+        # Round trip through JSON so callers never share state with the backend.
+        result = json.loads(json.dumps(result))
+        return DetailedResponse(response=result, headers={'Content-Type': 'application/json'}, status_code=status)
+
+    def _next_injected_error(self, operation_id):
+        with self._lock:
+            for entry in self._injected_errors:
+                (status, count, target) = entry
+                if target is None or target == operation_id:
+                    entry[1] = count - 1
+                    if entry[1] <= 0:
+                        self._injected_errors.remove(entry)
+                    return status
+        return None
+
+    def _random_throttle(self):
+        with self._lock:
+            return self._random.random() < self.throttle_rate
+
+    @staticmethod
+    def _error(status: int, message: str, headers: Dict = None) -> ApiException:
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update({'Content-Type': 'application/json'})
+        response.headers.update(headers or {})
+        response._content = json.dumps({'message': message}).encode('utf-8')
+        return ApiException(status, http_response=response)
+
+    @staticmethod
+    def _now() -> str:
+        return datetime_to_string(datetime.now(timezone.utc))
+
+    @staticmethod
+    def _window(items: List, offset: int, size: int) -> List:
+        return items[offset:offset + size] if size is not None else items[offset:]
+
+    @staticmethod
+    def _page_token_window(items: List, params: Dict):
+        offset = int(params.get('page_token') or 0)
+        size = int(params.get('page_size') or DEFAULT_PAGE_SIZE)
+        page = items[offset:offset + size]
+        next_token = str(offset + size) if offset + size < len(items) else ''
+        return page, next_token
+
+    #########################
+    # findingsGraph
+    #########################
+
+    def _post_graph(self, *, account_id, params, body, headers):
+        occurrences = [o for (key, o) in sorted(self._occurrences.items()) if key[0] == account_id]
+        return 200, {'data': {'occurrences': occurrences}}
+
+    #########################
+    # findingsProviders
+    #########################
+
+    def _list_providers(self, *, account_id, params, body, headers):
+        providers = sorted(self._providers.get(account_id, {}).values(), key=lambda p: p['id'])
+        start = params.get('start_provider_id')
+        end = params.get('end_provider_id')
+        if start is not None:
+            providers = [p for p in providers if p['id'] >= start]
+        if end is not None:
+            providers = [p for p in providers if p['id'] <= end]
+        skip = int(params.get('skip') or 0)
+        limit = int(params['limit']) if params.get('limit') is not None else DEFAULT_PAGE_SIZE
+        return 200, {'providers': self._window(providers, skip, limit)}
+
+    def _touch_provider(self, account_id, provider_id):
+        self._providers.setdefault(account_id, {}).setdefault(provider_id, {'id': provider_id, 'name': provider_id})
+
+    #########################
+    # findingsNotes
+    #########################
+
+    def _create_note(self, *, account_id, provider_id, params, body, headers):
+        key = (account_id, provider_id, body.get('id'))
+        if key in self._notes:
+            return 409, {'message': 'Note {0} already exists'.format(body.get('id'))}
+        note = {k: v for (k, v) in body.items() if v is not None}
+        note['create_time'] = note['update_time'] = self._now()
+        self._notes[key] = note
+        self._touch_provider(account_id, provider_id)
+        return 200, note
+
+    def _list_notes(self, *, account_id, provider_id, params, body, headers):
+        notes = [n for (key, n) in sorted(self._notes.items()) if key[:2] == (account_id, provider_id)]
+        page, next_token = self._page_token_window(notes, params)
+        return 200, {'notes': page, 'next_page_token': next_token}
+
+    def _get_note(self, *, account_id, provider_id, note_id, params, body, headers):
+        note = self._notes.get((account_id, provider_id, note_id))
+        if note is None:
+            return 404, {'message': 'Note {0} not found'.format(note_id)}
+        return 200, note
+
+    def _update_note(self, *, account_id, provider_id, note_id, params, body, headers):
+        existing = self._notes.get((account_id, provider_id, note_id))
+        if existing is None:
+            return 404, {'message': 'Note {0} not found'.format(note_id)}
+        note = {k: v for (k, v) in body.items() if v is not None}
+        note['create_time'] = existing.get('create_time')
+        note['update_time'] = self._now()
+        self._notes[(account_id, provider_id, note_id)] = note
+        return 200, note
+
+    def _delete_note(self, *, account_id, provider_id, note_id, params, body, headers):
+        if self._notes.pop((account_id, provider_id, note_id), None) is None:
+            return 404, {'message': 'Note {0} not found'.format(note_id)}
+        return 200, {}
+
+    def _get_occurrence_note(self, *, account_id, provider_id, occurrence_id, params, body, headers):
+        occurrence = self._occurrences.get((account_id, provider_id, occurrence_id))
+        if occurrence is None:
+            return 404, {'message': 'Occurrence {0} not found'.format(occurrence_id)}
+        parts = occurrence.get('note_name', '').split('/')
+        note = self._notes.get((account_id, parts[-3], parts[-1])) if len(parts) >= 4 else None
+        if note is None:
+            return 404, {'message': 'Note {0} not found'.format(occurrence.get('note_name'))}
+        return 200, note
+
+    #########################
+    # findingsOccurrences
+    #########################
+
+    def _put_occurrence(self, account_id, provider_id, occurrence):
+        key = (account_id, provider_id, occurrence.get('id'))
+        existing = self._occurrences.get(key)
+        occurrence = {k: v for (k, v) in occurrence.items() if v is not None}
+        now = self._now()
+        occurrence['create_time'] = existing['create_time'] if existing else now
+        occurrence['update_time'] = now
+        self._occurrences[key] = occurrence
+        self._touch_provider(account_id, provider_id)
+        return occurrence
+
+    def _create_occurrence(self, *, account_id, provider_id, params, body, headers):
+        replace = str(headers.get('Replace-If-Exists', '')).lower() == 'true'
+        if (account_id, provider_id, body.get('id')) in self._occurrences and not replace:
+            return 409, {'message': 'Occurrence {0} already exists'.format(body.get('id'))}
+        return 200, self._put_occurrence(account_id, provider_id, body)
+
+    def _list_occurrences(self, *, account_id, provider_id, params, body, headers):
+        occurrences = [o for (key, o) in sorted(self._occurrences.items()) if key[:2] == (account_id, provider_id)]
+        page, next_token = self._page_token_window(occurrences, params)
+        return 200, {'occurrences': page, 'next_page_token': next_token}
+
+    def _list_note_occurrences(self, *, account_id, provider_id, note_id, params, body, headers):
+        note_name = '{0}/providers/{1}/notes/{2}'.format(account_id, provider_id, note_id)
+        occurrences = [o for (key, o) in sorted(self._occurrences.items())
+                       if key[0] == account_id and o.get('note_name') == note_name]
+        page, next_token = self._page_token_window(occurrences, params)
+        return 200, {'occurrences': page, 'next_page_token': next_token}
+
+    def _get_occurrence(self, *, account_id, provider_id, occurrence_id, params, body, headers):
+        occurrence = self._occurrences.get((account_id, provider_id, occurrence_id))
+        if occurrence is None:
+            return 404, {'message': 'Occurrence {0} not found'.format(occurrence_id)}
+        return 200, occurrence
+
+    def _update_occurrence(self, *, account_id, provider_id, occurrence_id, params, body, headers):
+        if (account_id, provider_id, occurrence_id) not in self._occurrences:
+            return 404, {'message': 'Occurrence {0} not found'.format(occurrence_id)}
+        return 200, self._put_occurrence(account_id, provider_id, dict(body, id=occurrence_id))
+
+    def _delete_occurrence(self, *, account_id, provider_id, occurrence_id, params, body, headers):
+        if self._occurrences.pop((account_id, provider_id, occurrence_id), None) is None:
+            return 404, {'message': 'Occurrence {0} not found'.format(occurrence_id)}
+        return 200, {}
+
+    #########################
+    # notificationChannel
+    #########################
+
+    def _put_channel(self, account_id, channel_id, body):
+        channels = self._channels.setdefault(account_id, OrderedDict())
+        channel_id = channel_id or body.get('channel_id') or uuid.uuid4().hex
+        severity = body.get('severity')
+        if isinstance(severity, list):
+            severity = {s: s in severity for s in _SEVERITIES}
+        channel = {
+            'channel_id': channel_id,
+            'name': body.get('name'),
+            'description': body.get('description'),
+            'type': body.get('type'),
+            'severity': severity,
+            'endpoint': body.get('endpoint'),
+            'enabled': body.get('enabled', False),
+            'alert_source': body.get('alert_source'),
+            'frequency': body.get('frequency')
+        }
+        channels[channel_id] = {k: v for (k, v) in channel.items() if v is not None}
+        return channel_id
+
+    def _list_channels(self, *, account_id, params, body, headers):
+        channels = list(self._channels.get(account_id, {}).values())
+        skip = int(params.get('skip') or 0)
+        limit = int(params['limit']) if params.get('limit') is not None else None
+        return 200, {'channels': self._window(channels, skip, limit)}
+
+    def _create_channel(self, *, account_id, params, body, headers):
+        return 200, {'channel_id': self._put_channel(account_id, None, body), 'status_code': 200}
+
+    def _delete_channels(self, *, account_id, params, body, headers):
+        channels = self._channels.get(account_id, {})
+        for channel_id in body or []:
+            channels.pop(channel_id, None)
+        return 200, {'message': 'success'}
+
+    def _get_channel(self, *, account_id, channel_id, params, body, headers):
+        channel = self._channels.get(account_id, {}).get(channel_id)
+        if channel is None:
+            return 404, {'message': 'Channel {0} not found'.format(channel_id)}
+        return 200, {'channel': channel}
+
+    def _update_channel(self, *, account_id, channel_id, params, body, headers):
+        if channel_id not in self._channels.get(account_id, {}):
+            return 404, {'message': 'Channel {0} not found'.format(channel_id)}
+        return 200, {'channel_id': self._put_channel(account_id, channel_id, body), 'status_code': 200}
+
+    def _delete_channel(self, *, account_id, channel_id, params, body, headers):
+        if self._channels.get(account_id, {}).pop(channel_id, None) is None:
+            return 404, {'message': 'Channel {0} not found'.format(channel_id)}
+        return 200, {'channel_id': channel_id, 'message': 'success'}
+
+    def _test_channel(self, *, account_id, channel_id, params, body, headers):
+        if channel_id not in self._channels.get(account_id, {}):
+            return 404, {'message': 'Channel {0} not found'.format(channel_id)}
+        return 200, {'test': 'success'}
+
+    def _get_public_key(self, *, account_id, params, body, headers):
+        return 200, {'public_key': self.public_key}
+
+
+class MockTransport(Transport):
+    """
+    A transport that serves requests from a `MockBackend` instead of the network.
+
+    :attr MockBackend backend: The backend serving the requests.
+    """
+
+    def __init__(self, backend: MockBackend = None) -> None:
+        """
+        :param MockBackend backend: (optional) The backend to serve requests
+               from. A new, empty backend is created if not provided.
+        """
+        self.backend = backend if backend is not None else MockBackend()
+
+    def send(self, service: BaseService, request: dict, *, operation_id: str = None, **kwargs) -> DetailedResponse:
+        url = request['url']
+        base_url = service.service_url or ''
+        path = url[len(base_url):] if url.startswith(base_url) else url
+        data = request.get('data')
+        content_type = (request.get('headers') or {}).get('Content-Type') or 'application/json'
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        body = (json.loads(data) if 'json' in content_type else data) if data else None
+        # Like BaseService.send, the client's http_config takes precedence, and
+        # like RequestsTransport, the deadline caps it.
+        options = dict(kwargs, **(service.http_config or {}))
+        return self.backend.handle(request['method'], path.split('?')[0],
+                                   params=request.get('params'),
+                                   body=body,
+                                   headers=request.get('headers'),
+                                   operation_id=operation_id,
+                                   timeout=budget_timeout(options.get('timeout')))
@@ -0,0 +1,301 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Receiver-side decoding and verification of notification payloads.
+
+Notification channels deliver findings as a JSON body `{"data": "<token>"}`,
+where the token is a JWT signed with the notifications public key of the
+account. `NotificationReceiver` verifies batches of payloads with the cached
+public key of `NotificationsApiV1`, across a process pool for large batches,
+and yields `FindingEvent` objects. Requires the `PyJWT` and `cryptography`
+packages.
+
+    with NotificationReceiver(notifications_service, account_id) as receiver:
+        for event in receiver.iter_events(request_bodies):
+            print(event.severity, event.name)
+"""
+
+import itertools
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+from .bulk import batched
+from .public_key import parse_public_key
+
+DEFAULT_ALGORITHMS = ('RS256',)
+DEFAULT_CHUNK_SIZE = 256
+
+_EVENT_FIELDS = ('id', 'name', 'severity', 'provider_name', 'finding_type', 'account_id', 'issuer_url')
+
+
+class NotificationVerificationError(ValueError):
+    """
+    A notification payload that could not be decoded or verified.
+
+    :attr int index: The position of the payload in the batch.
+    :attr str reason: The name of the error raised while decoding.
+    """
+
+    def __init__(self, message: str, *, index: int = None, reason: str = None) -> None:
+        super().__init__(message)
+        self.index = index
+        self.reason = reason
+
+
+class FindingEvent():
+    """
+    A finding delivered by a notification channel.
+
+    :attr str id: (optional) The ID of the finding.
+    :attr str name: (optional) The name of the finding.
+    :attr str severity: (optional) The severity of the finding.
+    :attr str provider_name: (optional) The provider that reported the finding.
+    :attr str finding_type: (optional) The type of the finding.
+    :attr str account_id: (optional) The account the finding belongs to.
+    :attr str issuer_url: (optional) The URL of the finding in the Security
+          Advisor dashboard.
+    :attr dict data: The decoded claims the event was built from.
+    """
+
+    def __init__(self,
+                 *,
+                 id: str = None,
+                 name: str = None,
+                 severity: str = None,
+                 provider_name: str = None,
+                 finding_type: str = None,
+                 account_id: str = None,
+                 issuer_url: str = None,
+                 data: Dict = None) -> None:
+        # pylint: disable=redefined-builtin
+        self.id = id
+        self.name = name
+        self.severity = severity
+        self.provider_name = provider_name
+        self.finding_type = finding_type
+        self.account_id = account_id
+        self.issuer_url = issuer_url
+        self.data = data if data is not None else {}
+
+    @classmethod
+    def from_dict(cls, _dict: Dict) -> 'FindingEvent':
+        """Initialize a FindingEvent object from the decoded claims of a payload."""
+        args = {field: _dict.get(field) for field in _EVENT_FIELDS if _dict.get(field) is not None}
+        if 'issuer_url' not in args and _dict.get('issuer-url') is not None:
+            args['issuer_url'] = _dict.get('issuer-url')
+        return cls(data=_dict, **args)
+
+    def to_dict(self) -> Dict:
+        """Return a json dictionary representing this event."""
+        _dict = {field: getattr(self, field) for field in _EVENT_FIELDS if getattr(self, field) is not None}
+        _dict['data'] = self.data
+        return _dict
+
+    def __str__(self) -> str:
+        """Return a `str` version of this FindingEvent object."""
+        return json.dumps(self.to_dict(), indent=2)
+
+    def __eq__(self, other: 'FindingEvent') -> bool:
+        """Return `true` when self and other are equal, false otherwise."""
+        if not isinstance(other, self.__class__):
+            return False
+        return self.__dict__ == other.__dict__
+
+    def __ne__(self, other: 'FindingEvent') -> bool:
+        """Return `true` when self and other are not equal, false otherwise."""
+        return not self == other
+
+
+def extract_token(payload) -> str:
+    """
+    Return the JWT of a notification payload, given as the request body
+    (`bytes`, `str` or the parsed `dict`) or as the token itself.
+    """
+    if isinstance(payload, (bytes, bytearray)):
+        payload = payload.decode('utf-8')
+    if isinstance(payload, str):
+        payload = payload.strip()
+        if not payload.startswith('{'):
+            return payload
+        payload = json.loads(payload)
+    if isinstance(payload, dict) and isinstance(payload.get('data'), str):
+        return payload['data']
+    raise NotificationVerificationError('payload does not contain a notification token', reason='MalformedPayload')
+
+
+def claims_to_events(claims: Dict) -> List[FindingEvent]:
+    """
+    Return the events of decoded claims. Claims holding a `findings` list
+    produce one event per finding, which inherits the other claims.
+    """
+    findings = claims.get('findings')
+    if not isinstance(findings, list):
+        return [FindingEvent.from_dict(claims)]
+    common = {k: v for (k, v) in claims.items() if k != 'findings'}
+    return [FindingEvent.from_dict(dict(common, **finding)) for finding in findings if isinstance(finding, dict)]
+
+
+def _decode(pem: str, token: str, algorithms: Sequence[str], options: Dict) -> Dict:
+    try:
+        import jwt
+    except ImportError:
+        raise ImportError('NotificationReceiver requires the PyJWT package')
+    return jwt.decode(token, parse_public_key(pem), algorithms=list(algorithms), options=options)
+
+
+def _decode_chunk(pem: str, payloads: List, algorithms: Sequence[str], options: Dict) -> List[Tuple]:
+    # Runs in the worker processes, where parse_public_key memoizes the key.
+    # Exceptions are returned by name so that results always pickle.
+    results = []
+    for payload in payloads:
+        try:
+            results.append((True, _decode(pem, extract_token(payload), algorithms, options)))
+        except ImportError:
+            raise
+        except Exception as err:  # pylint: disable=broad-except
+            results.append((False, (type(err).__name__, str(err))))
+    return results
+
+
+class NotificationReceiver():
+    """
+    Decodes and verifies notification payloads delivered to a webhook.
+
+    :attr NotificationsApiV1 service: The client whose public key cache is
+          used.
+    :attr str account_id: The account the notifications belong to.
+    :attr int processes: The size of the process pool; 0 decodes in the
+          calling process.
+    :attr int chunk_size: The number of payloads sent to a worker at a time.
+          Batches smaller than this are decoded in the calling process.
+    """
+
+    def __init__(self, service, account_id: str, *, processes: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 algorithms: Sequence[str] = DEFAULT_ALGORITHMS, options: Dict = None) -> None:
+        """
+        :param NotificationsApiV1 service: The client used to fetch the public
+               key.
+        :param str account_id: Account ID.
+        :param int processes: (optional) The size of the process pool. Defaults
+               to the number of CPUs; 0 disables the pool.
+        :param int chunk_size: (optional) The number of payloads sent to a
+               worker at a time.
+        :param Sequence[str] algorithms: (optional) The accepted signature
+               algorithms.
+        :param dict options: (optional) Options passed to `jwt.decode`.
+        """
+        if service is None:
+            raise ValueError('service must be provided')
+        if account_id is None:
+            raise ValueError('account_id must be provided')
+        if chunk_size is None or chunk_size < 1:
+            raise ValueError('chunk_size must be at least 1')
+        self.service = service
+        self.account_id = account_id
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self.algorithms = tuple(algorithms)
+        self.options = dict(options or {})
+        self._executor = None
+
+    def __enter__(self) -> 'NotificationReceiver':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Shut down the process pool."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def decode(self, payload) -> List[FindingEvent]:
+        """
+        Decode and verify a single payload.
+
+        :raises NotificationVerificationError: If the payload is not valid.
+        """
+        return list(self.iter_events([payload]))
+
+    def iter_events(self, payloads: Iterable,
+                    on_error: Callable[[NotificationVerificationError], None] = None) -> Iterator[FindingEvent]:
+        """
+        Decode and verify payloads, yielding their events in input order.
+
+        Payloads whose signature does not verify are retried once with a freshly
+        fetched public key, in case the key was rotated. If the fetched key is
+        unchanged, payloads are rejected without fetching again for the
+        `min_refresh_interval` of the key cache, so forged payloads cannot
+        make the receiver call the service for each of them.
+
+        :param Iterable payloads: The payloads, as request bodies or tokens.
+        :param Callable on_error: (optional) Called with a
+               `NotificationVerificationError` for each invalid payload. By
+               default the error is raised.
+        """
+        cache = self.service.get_public_key_cache(self.account_id)
+        refreshed = {}
+        index = 0
+        for (pem, chunk, results) in self._decode_chunks(cache, payloads):
+            for (payload, (ok, value)) in zip(chunk, results):
+                if not ok and value[0] == 'InvalidSignatureError':
+                    # Each key is refreshed at most once per call.
+                    fresh = refreshed.get(pem)
+                    if fresh is None:
+                        fresh = refreshed[pem] = cache.refresh(pem)
+                    if fresh != pem:
+                        (ok, value) = _decode_chunk(fresh, [payload], self.algorithms, self.options)[0]
+                if ok:
+                    yield from claims_to_events(value)
+                else:
+                    error = NotificationVerificationError('invalid notification payload: {0}'.format(value[1]),
+                                                          index=index, reason=value[0])
+                    if on_error is None:
+                        raise error
+                    on_error(error)
+                index += 1
+
+    def _decode_chunks(self, cache, payloads: Iterable) -> Iterator[Tuple[str, List, List[Tuple]]]:
+        chunks = batched(payloads, self.chunk_size)
+        first = next(chunks, None)
+        if first is None:
+            return
+        if len(first) < self.chunk_size or self.processes == 0:
+            for chunk in itertools.chain([first], chunks):
+                pem = cache.get()
+                yield (pem, chunk, _decode_chunk(pem, chunk, self.algorithms, self.options))
+            return
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.processes)
+        # Keep a bounded number of chunks in flight so memory does not grow
+        # with the size of the input.
+        limit = 2 * (self.processes or os.cpu_count() or 1)
+        in_flight = deque()
+        for chunk in itertools.chain([first], chunks):
+            pem = cache.get()
+            in_flight.append((pem, chunk, self._executor.submit(_decode_chunk, pem, chunk, self.algorithms,
+                                                                self.options)))
+            if len(in_flight) >= limit:
+                (pem, done, future) = in_flight.popleft()
+                yield (pem, done, future.result())
+        while in_flight:
+            (pem, done, future) = in_flight.popleft()
+            yield (pem, done, future.result())
@@ -21,15 +21,27 @@ notifications-api
 """
 
 from enum import Enum
-from typing import Dict, List
+from typing import Callable, Dict, Iterator, List, Tuple, Type, Union
 import json
+import logging
+import threading
+import time
 
-from ibm_cloud_sdk_core import BaseService, DetailedResponse
+from ibm_cloud_sdk_core import ApiException, BaseService, DetailedResponse
 from ibm_cloud_sdk_core.authenticators.authenticator import Authenticator
 from ibm_cloud_sdk_core.get_authenticator import get_authenticator_from_environment
 from ibm_cloud_sdk_core.utils import convert_model
 
+from .bulk import DEFAULT_MAX_WORKERS, BulkResult, batched, run_bulk
+from .channel_probe import ChannelProbe, ChannelProbeReport
+from .channel_sync import ChannelSyncResult, channel_arguments, plan_channel_sync
+from .public_key import DEFAULT_PUBLIC_KEY_TTL, PublicKeyCache
+from .pagination import DEFAULT_PREFETCH, iter_offset_windows, iter_unique
 from .common import get_sdk_headers
+from .transport import Transport, RequestsTransport, budget_timeout, get_deadline, get_request_timeout, request_timeout
+from .instrumentation import Instrumentation, InstrumentationHook, record_build_time
+from .sdk_logging import ClientLogger
+from .tracing import apply_transaction_id, span
 
 ##############################################################################
 # Service
@@ -40,6 +52,10 @@ class NotificationsApiV1(BaseService):
 
     DEFAULT_SERVICE_URL = 'https://us-south.secadvisor.cloud.ibm.com/notifications'
     DEFAULT_SERVICE_NAME = 'notifications_api'
+    DEFAULT_DELETE_BATCH_SIZE = 50
+    DEFAULT_LIST_PAGE_SIZE = 100
+    DEFAULT_PROBE_TIMEOUT = 10.0
+    DEFAULT_PROBE_WORKERS = 32
 
     @classmethod
     def new_instance(cls,
@@ -58,6 +74,10 @@ class NotificationsApiV1(BaseService):
 
     def __init__(self,
                  authenticator: Authenticator = None,
+                 *,
+                 enable_error_log: bool = False,
+                 transport: Transport = None,
+                 log_level: int = None
                 ) -> None:
         """
         Construct a new client for the Notifications API service.
@@ -65,10 +85,103 @@ class NotificationsApiV1(BaseService):
         :param Authenticator authenticator: The authenticator specifies the authentication mechanism.
                Get up to date information from https://github.com/IBM/python-sdk-core/blob/master/README.md
                about initializing the authenticator of your choice.
+        :param bool enable_error_log: (optional) Log failed requests at ERROR
+               to the `ibm_cloud_security_advisor` logger.
+        :param Transport transport: (optional) The transport used to send requests.
+               Defaults to a `RequestsTransport` which sends them over HTTP.
+        :param int log_level: (optional) The minimum level of the records this
+               client logs to the `ibm_cloud_security_advisor` logger. Overrides
+               `enable_error_log`.
         """
         BaseService.__init__(self,
                              service_url=self.DEFAULT_SERVICE_URL,
                              authenticator=authenticator)
+        self.transport = transport if transport is not None else RequestsTransport()
+        self.instrumentation = Instrumentation()
+        if log_level is None:
+            # only critical records unless error logging is enabled
+            log_level = logging.NOTSET if enable_error_log else logging.CRITICAL
+        self.log = ClientLogger(self.instrumentation, level=log_level)
+        self.public_key_ttl = DEFAULT_PUBLIC_KEY_TTL
+        self._public_keys = {}
+        self._public_keys_lock = threading.Lock()
+
+    def set_transport(self, transport: Transport) -> None:
+        """
+        Set the transport used to send requests.
+
+        :param Transport transport: The transport to use.
+        """
+        if transport is None:
+            raise ValueError('transport must be provided')
+        self.transport = transport
+
+    def get_transport(self) -> Transport:
+        """Return the transport used to send requests."""
+        return self.transport
+
+    def send(self, request: dict, *, operation_id: str = None, **kwargs) -> DetailedResponse:
+        """
+        Send a prepared request through the configured transport.
+
+        :param dict request: The request built by `prepare_request`.
+        :param str operation_id: (optional) The operation being invoked.
+        :return: A `DetailedResponse` containing the result, headers and HTTP status code.
+        :rtype: DetailedResponse
+        """
+        timeout = get_request_timeout()
+        if timeout is not None:
+            kwargs.setdefault('timeout', timeout)
+        if get_deadline() is not None:
+            kwargs['timeout'] = budget_timeout(kwargs.get('timeout'))
+        try:
+            return self.instrumentation.send(self.transport, self, request, operation_id=operation_id, **kwargs)
+        except ApiException as err:
+            if self.log.is_enabled_for(logging.ERROR):
+                self.log.error('%s failed with status %s: %s', operation_id, err.status_code, err.message)
+            raise
+
+    def prepare_request(self, method: str, url: str, **kwargs) -> dict:
+        """
+        Build a request, recording how long it took for the instrumentation hooks.
+        A `Transaction-Id` header is added when the caller did not supply one.
+        """
+        start = time.perf_counter()
+        request = BaseService.prepare_request(self, method, url, **kwargs)
+        if isinstance(request, dict):
+            apply_transaction_id(request['headers'])
+        record_build_time(time.perf_counter() - start)
+        return request
+
+    def set_log_level(self, level: int, *, sample_rate: float = None) -> None:
+        """
+        Set the minimum level of the records this client logs.
+
+        :param int level: The level, for example `logging.DEBUG`.
+        :param float sample_rate: (optional) The fraction, between 0 and 1, of
+               calls whose request/response timing is logged at DEBUG.
+        """
+        self.log.configure(level=level, sample_rate=sample_rate)
+
+    def add_instrumentation_hook(self, hook: InstrumentationHook) -> InstrumentationHook:
+        """
+        Register a hook that receives an `OperationMetrics` record for every
+        operation call made by this client.
+
+        :param InstrumentationHook hook: The hook, or a callable taking an
+               `OperationMetrics` argument.
+        :return: The registered hook.
+        :rtype: InstrumentationHook
+        """
+        return self.instrumentation.add_hook(hook)
+
+    def remove_instrumentation_hook(self, hook: InstrumentationHook) -> None:
+        """
+        Unregister a hook added with `add_instrumentation_hook`.
+
+        :param InstrumentationHook hook: The hook to remove.
+        """
+        self.instrumentation.remove_hook(hook)
 
 
     #########################
@@ -129,7 +242,7 @@ class NotificationsApiV1(BaseService):
                                        headers=headers,
                                        params=params)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='list_all_channels')
         return response
 
 
@@ -213,7 +326,7 @@ class NotificationsApiV1(BaseService):
                                        headers=headers,
                                        data=data)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='create_notification_channel')
         return response
 
 
@@ -266,7 +379,7 @@ class NotificationsApiV1(BaseService):
                                        headers=headers,
                                        data=data)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='delete_notification_channels')
         return response
 
 
@@ -315,7 +428,7 @@ class NotificationsApiV1(BaseService):
                                        url=url,
                                        headers=headers)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='delete_notification_channel')
         return response
 
 
@@ -364,7 +477,7 @@ class NotificationsApiV1(BaseService):
                                        url=url,
                                        headers=headers)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='get_notification_channel')
         return response
 
 
@@ -452,7 +565,7 @@ class NotificationsApiV1(BaseService):
                                        headers=headers,
                                        data=data)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='update_notification_channel')
         return response
 
 
@@ -501,7 +614,7 @@ class NotificationsApiV1(BaseService):
                                        url=url,
                                        headers=headers)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='test_notification_channel')
         return response
 
 
@@ -546,9 +659,444 @@ class NotificationsApiV1(BaseService):
                                        url=url,
                                        headers=headers)
 
-        response = self.send(request)
+        response = self.send(request, operation_id='get_public_key')
         return response
 
+    #########################
+    # public key cache
+    #########################
+
+
+    def set_public_key_ttl(self, ttl: float) -> None:
+        """
+        Set how long a public key fetched by `get_cached_public_key` is used
+        before it is fetched again.
+
+        :param float ttl: The time to live, in seconds.
+        """
+        if ttl is None or ttl < 0:
+            raise ValueError('ttl must be a non-negative number of seconds')
+        self.public_key_ttl = ttl
+        with self._public_keys_lock:
+            for cache in self._public_keys.values():
+                cache.ttl = ttl
+
+
+    def get_public_key_cache(self, account_id: str) -> PublicKeyCache:
+        """
+        Return the cache of the public key of an account.
+
+        :param str account_id: Account ID.
+        :rtype: PublicKeyCache
+        """
+
+        if account_id is None:
+            raise ValueError('account_id must be provided')
+        cache = self._public_keys.get(account_id)
+        if cache is None:
+            with self._public_keys_lock:
+                cache = self._public_keys.get(account_id)
+                if cache is None:
+                    def fetch() -> str:
+                        return PublicKeyGet.from_dict(self.get_public_key(account_id).get_result()).public_key
+                    cache = self._public_keys[account_id] = PublicKeyCache(fetch, ttl=self.public_key_ttl)
+        return cache
+
+
+    def get_cached_public_key(self,
+        account_id: str,
+        *,
+        refresh: bool = False
+    ) -> str:
+        """
+        fetch notifications public key, from the cache.
+
+        The key is fetched with `get_public_key` on first use and kept for
+        `public_key_ttl` seconds. Concurrent callers share a single fetch.
+
+        :param str account_id: Account ID.
+        :param bool refresh: (optional) Fetch the key again even if it has not
+               expired.
+        :return: The PEM encoded public key.
+        :rtype: str
+        """
+
+        cache = self.get_public_key_cache(account_id)
+        if refresh:
+            return cache.refresh(cache.current, force=True)
+        return cache.get()
+
+
+    def call_with_public_key(self,
+        account_id: str,
+        func: Callable,
+        *,
+        retry_on: Tuple[Type[Exception], ...] = (Exception,),
+        parsed: bool = False
+    ):
+        """
+        call a function with the cached notifications public key.
+
+        If `func` raises one of `retry_on`, for example because the key was
+        rotated and a signature no longer verifies, the key is fetched again
+        and `func` is retried once with the new key.
+
+        :param str account_id: Account ID.
+        :param Callable func: Called with the PEM encoded key, or the parsed key
+               if `parsed` is set.
+        :param tuple retry_on: (optional) The exceptions that indicate a stale
+               key.
+        :param bool parsed: (optional) Pass the key parsed with the
+               `cryptography` package; each key is parsed once.
+        :return: The result of `func`.
+        """
+
+        return self.get_public_key_cache(account_id).call_with_key(func, retry_on=retry_on, parsed=parsed)
+
+
+    #########################
+    # channel iteration
+    #########################
+
+
+    def iter_all_channels(self,
+        account_id: str,
+        *,
+        page_size: int = DEFAULT_LIST_PAGE_SIZE,
+        prefetch: int = DEFAULT_PREFETCH,
+        transaction_id: str = None,
+        **kwargs
+    ) -> Iterator['Channel']:
+        """
+        iterate over all channels.
+
+        Streams the channels of the account, paging `list_all_channels` with
+        `limit`/`skip`. After the first page, up to `prefetch` pages are fetched
+        concurrently ahead of the caller, and channels returned twice because
+        the list changed while it was paged are skipped.
+
+        :param str account_id: Account ID.
+        :param int page_size: (optional) The number of channels listed per
+               request.
+        :param int prefetch: (optional) The number of pages fetched ahead of the
+               caller; 1 fetches sequentially.
+        :param str transaction_id: (optional) The transaction id for the requests in
+               uuid v4 format.
+        :param dict headers: A `dict` containing the request headers
+        :return: An iterator of `Channel` objects.
+        :rtype: Iterator[Channel]
+        """
+
+        if account_id is None:
+            raise ValueError('account_id must be provided')
+
+        def fetch(skip: int, limit: int) -> List[Dict]:
+            response = self.list_all_channels(account_id, limit=limit, skip=skip, transaction_id=transaction_id,
+                                              **kwargs)
+            return response.get_result().get('channels') or []
+
+        windows = iter_offset_windows(fetch, page_size=page_size, prefetch=prefetch)
+        channels = iter_unique((channel for window in windows for channel in window),
+                               key=lambda channel: channel.get('channel_id'))
+        return (Channel.from_dict(channel) for channel in channels)
+
+    #########################
+    # channel health
+    #########################
+
+
+    def probe_channels(self,
+        account_id: str,
+        channel_ids: List[str] = None,
+        *,
+        timeout: float = DEFAULT_PROBE_TIMEOUT,
+        max_workers: int = DEFAULT_PROBE_WORKERS,
+        disable_failing: bool = False,
+        transaction_id: str = None,
+        **kwargs
+    ) -> ChannelProbeReport:
+        """
+        test notification channels concurrently.
+
+        Each channel is tested with `test_notification_channel` on a pool of at
+        most `max_workers` threads, with a request timeout of `timeout` seconds,
+        so a sweep of up to `max_workers` channels takes about as long as the
+        slowest probe.
+
+        :param str account_id: Account ID.
+        :param List[str] channel_ids: (optional) The IDs of the channels to test.
+               Defaults to every channel of the account.
+        :param float timeout: (optional) The timeout of each test, in seconds.
+        :param int max_workers: (optional) The maximum number of concurrent
+               tests.
+        :param bool disable_failing: (optional) Disable the channels whose test
+               failed, with `update_notification_channels`.
+        :param str transaction_id: (optional) The transaction id for the requests in
+               uuid v4 format.
+        :param dict headers: A `dict` containing the request headers
+        :return: The health of every channel tested.
+        :rtype: ChannelProbeReport
+        """
+
+        if account_id is None:
+            raise ValueError('account_id must be provided')
+
+        start = time.perf_counter()
+        with span('probe_channels', account_id=account_id):
+            channels = {}
+            if channel_ids is None or disable_failing:
+                wanted = set(channel_ids) if channel_ids is not None else None
+                for channel in self.iter_all_channels(account_id, transaction_id=transaction_id, **kwargs):
+                    if wanted is None or channel.channel_id in wanted:
+                        channels[channel.channel_id] = channel
+                if channel_ids is None:
+                    channel_ids = list(channels)
+
+            def probe(channel_id: str) -> ChannelProbe:
+                channel = channels.get(channel_id)
+                result = ChannelProbe(channel_id, name=channel.name if channel is not None else None)
+                probe_start = time.perf_counter()
+                try:
+                    with request_timeout(timeout):
+                        response = self.test_notification_channel(account_id, channel_id,
+                                                                  transaction_id=transaction_id, **kwargs)
+                    result.result = TestChannel.from_dict(response.get_result())
+                except Exception as err:  # pylint: disable=broad-except
+                    result.error = err
+                result.latency = time.perf_counter() - probe_start
+                return result
+
+            probes = [result.result for result in run_bulk(probe, channel_ids, max_workers=max_workers,
+                                                             name='test_notification_channels')]
+            disabled = []
+            if disable_failing:
+                updates = []
+                for failed in probes:
+                    channel = channels.get(failed.channel_id)
+                    if not failed.healthy and channel is not None and channel.enabled:
+                        updates.append(dict(channel_arguments(channel), channel_id=channel.channel_id, enabled=False))
+                disabled = self.update_notification_channels(account_id, updates, max_workers=max_workers,
+                                                             transaction_id=transaction_id, **kwargs)
+        return ChannelProbeReport(probes, time.perf_counter() - start, disabled)
+
+    #########################
+    # bulk channel operations
+    #########################
+
+
+    def create_notification_channels(self,
+        account_id: str,
+        channels: List[Dict],
+        *,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        transaction_id: str = None,
+        **kwargs
+    ) -> List[BulkResult]:
+        """
+        create notification channels concurrently.
+
+        Each channel is created with `create_notification_channel` on a pool of
+        at most `max_workers` threads. A failure does not stop the other
+        channels from being created.
+
+        :param str account_id: Account ID.
+        :param List[dict] channels: The channels, each a `dict` of the
+               arguments of `create_notification_channel`: `name`, `type`,
+               `endpoint` and optionally `description`, `severity`, `enabled`
+               and `alert_source`.
+        :param int max_workers: (optional) The maximum number of concurrent
+               requests.
+        :param str transaction_id: (optional) The transaction id for the requests in
+               uuid v4 format.
+        :param dict headers: A `dict` containing the request headers
+        :return: One result per channel, in input order, holding a `ChannelInfo`
+                 or the exception raised for that channel.
+        :rtype: List[BulkResult]
+        """
+
+        if account_id is None:
+            raise ValueError('account_id must be provided')
+        if channels is None:
+            raise ValueError('channels must be provided')
+
+        def create(channel: Dict) -> 'ChannelInfo':
+            response = self.create_notification_channel(account_id, transaction_id=transaction_id, **channel,
+                                                        **kwargs)
+            return ChannelInfo.from_dict(response.get_result())
+
+        return run_bulk(create, channels, max_workers=max_workers, name='create_notification_channels')
+
+
+    def update_notification_channels(self,
+        account_id: str,
+        channels: List[Dict],
+        *,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        transaction_id: str = None,
+        **kwargs
+    ) -> List[BulkResult]:
+        """
+        update notification channels concurrently.
+
+        Each channel is updated with `update_notification_channel` on a pool of
+        at most `max_workers` threads. A failure does not stop the other
+        channels from being updated.
+
+        :param str account_id: Account ID.
+        :param List[dict] channels: The channels, each a `dict` of the
+               arguments of `update_notification_channel`, including
+               `channel_id`.
+        :param int max_workers: (optional) The maximum number of concurrent
+               requests.
+        :param str transaction_id: (optional) The transaction id for the requests in
+               uuid v4 format.
+        :param dict headers: A `dict` containing the request headers
+        :return: One result per channel, in input order, holding a `ChannelInfo`
+                 or the exception raised for that channel.
+        :rtype: List[BulkResult]
+        """
+
+        if account_id is None:
+            raise ValueError('account_id must be provided')
+        if channels is None:
+            raise ValueError('channels must be provided')
+
+        def update(channel: Dict) -> 'ChannelInfo':
+            response = self.update_notification_channel(account_id, transaction_id=transaction_id, **channel,
+                                                        **kwargs)
+            return ChannelInfo.from_dict(response.get_result())
+
+        return run_bulk(update, channels, max_workers=max_workers, name='update_notification_channels')
+
+
+    def delete_notification_channels_in_batches(self,
+        account_id: str,
+        channel_ids: List[str],
+        *,
+        batch_size: int = DEFAULT_DELETE_BATCH_SIZE,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        transaction_id: str = None,
+        **kwargs
+    ) -> List[BulkResult]:
+        """
+        delete notification channels in batches.
+
+        The channel ids are split into batches of at most `batch_size`, each
+        deleted with one `delete_notification_channels` request, on a pool of at
+        most `max_workers` threads.
+
+        :param str account_id: Account ID.
+        :param List[str] channel_ids: The IDs of the channels to delete.
+        :param int batch_size: (optional) The maximum number of channels deleted
+               per request.
+        :param int max_workers: (optional) The maximum number of concurrent
+               requests.
+        :param str transaction_id: (optional) The transaction id for the requests in
+               uuid v4 format.
+        :param dict headers: A `dict` containing the request headers
+        :return: One result per batch, whose `item` is the list of channel ids,
+                 holding a `ChannelsDelete` or the exception raised for that batch.
+        :rtype: List[BulkResult]
+        """
+
+        if account_id is None:
+            raise ValueError('account_id must be provided')
+        if channel_ids is None:
+            raise ValueError('channel_ids must be provided')
+
+        def delete(batch: List[str]) -> 'ChannelsDelete':
+            response = self.delete_notification_channels(account_id, batch, transaction_id=transaction_id, **kwargs)
+            return ChannelsDelete.from_dict(response.get_result())
+
+        return run_bulk(delete, batched(channel_ids, batch_size), max_workers=max_workers,
+                        name='delete_notification_channels_in_batches')
+
+
+    def sync_channels(self,
+        account_id: str,
+        desired: List[Union['Channel', Dict]],
+        *,
+        prune: bool = True,
+        dry_run: bool = False,
+        page_size: int = DEFAULT_LIST_PAGE_SIZE,
+        batch_size: int = DEFAULT_DELETE_BATCH_SIZE,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        transaction_id: str = None,
+        **kwargs
+    ) -> ChannelSyncResult:
+        """
+        reconcile the channels of an account with a desired state.
+
+        The channels of the account are listed once, matched to the desired
+        channels by name, and only the creates, updates and deletes needed are
+        applied, concurrently on a pool of at most `max_workers` threads. Deletes
+        are sent in batches through `delete_notification_channels`.
+
+        :param str account_id: Account ID.
+        :param List[Channel] desired: The desired channels, as `Channel` models or
+               dictionaries in the format of `notification.json`. Names must be
+               unique.
+        :param bool prune: (optional) Delete channels that are not desired.
+        :param bool dry_run: (optional) Only compute the plan.
+        :param int page_size: (optional) The number of channels listed per
+               request.
+        :param int batch_size: (optional) The maximum number of channels deleted
+               per request.
+        :param int max_workers: (optional) The maximum number of concurrent
+               requests.
+        :param str transaction_id: (optional) The transaction id for the requests in
+               uuid v4 format.
+        :param dict headers: A `dict` containing the request headers
+        :return: The plan and the result of every change applied.
+        :rtype: ChannelSyncResult
+        """
+
+        if account_id is None:
+            raise ValueError('account_id must be provided')
+        if desired is None:
+            raise ValueError('desired must be provided')
+        if page_size is None or page_size < 1:
+            raise ValueError('page_size must be at least 1')
+
+        with span('sync_channels', account_id=account_id):
+            current = []
+            skip = 0
+            while True:
+                response = self.list_all_channels(account_id, limit=page_size, skip=skip,
+                                                  transaction_id=transaction_id, **kwargs)
+                page = response.get_result().get('channels') or []
+                current.extend(page)
+                if len(page) < page_size:
+                    break
+                skip += len(page)
+
+            plan = plan_channel_sync(current, desired, prune=prune)
+            if dry_run or plan.empty:
+                return ChannelSyncResult(plan)
+
+            def apply(change: tuple):
+                (action, item) = change
+                if action == 'create':
+                    response = self.create_notification_channel(account_id, transaction_id=transaction_id, **item,
+                                                                **kwargs)
+                    return ChannelInfo.from_dict(response.get_result())
+                if action == 'update':
+                    response = self.update_notification_channel(account_id, transaction_id=transaction_id, **item,
+                                                                **kwargs)
+                    return ChannelInfo.from_dict(response.get_result())
+                response = self.delete_notification_channels(account_id, item, transaction_id=transaction_id,
+                                                             **kwargs)
+                return ChannelsDelete.from_dict(response.get_result())
+
+            changes = ([('create', item) for item in plan.creates] +
+                       [('update', item) for item in plan.updates] +
+                       [('delete', batch) for batch in batched(plan.deletes, batch_size)])
+            results = {'create': [], 'update': [], 'delete': []}
+            for result in run_bulk(apply, changes, max_workers=max_workers, name='apply_channel_sync'):
+                (action, result.item) = result.item
+                results[action].append(result)
+            return ChannelSyncResult(plan, results['create'], results['update'], results['delete'])
+
 
 ##############################################################################
 # Models
@@ -0,0 +1,166 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Account-wide scanning of occurrences across providers.
+"""
+
+import contextvars
+import json
+import queue
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+from .tracing import span
+
+DEFAULT_SCAN_WORKERS = 8
+DEFAULT_SCAN_BUFFER = 16
+
+_DONE = object()
+
+
+class ScannedOccurrence():
+    """
+    An occurrence returned by an account-wide scan.
+
+    :attr str provider_id: The provider the occurrence belongs to.
+    :attr dict occurrence: The occurrence, as returned by `list_occurrences`.
+    """
+
+    __slots__ = ('provider_id', 'occurrence')
+
+    def __init__(self, provider_id: str, occurrence: Dict) -> None:
+        self.provider_id = provider_id
+        self.occurrence = occurrence
+
+    def to_dict(self) -> Dict:
+        """Return a json dictionary representing this occurrence."""
+        return {'provider_id': self.provider_id, 'occurrence': self.occurrence}
+
+    def __str__(self) -> str:
+        """Return a `str` version of this ScannedOccurrence object."""
+        return json.dumps(self.to_dict(), indent=2)
+
+    def __repr__(self) -> str:
+        return 'ScannedOccurrence({0!r}, {1!r})'.format(self.provider_id, self.occurrence.get('id'))
+
+
+def iter_token_pages(fetch: Callable[[str], Tuple[List, str]]) -> Iterator[List]:
+    """
+    Yield the pages of a list paginated with `page_token`, in order.
+
+    :param Callable fetch: Called as `fetch(page_token)` to return the items
+           of a page and the token of the next one; the first call is made with
+           None. Iteration stops when the next token is empty.
+    """
+    token = None
+    while True:
+        (items, token) = fetch(token)
+        yield items
+        if not token:
+            return
+
+
+def scan_partitions(partitions: Iterable[str], stream: Callable[[str], Iterable[List]], *,
+                    max_workers: int = DEFAULT_SCAN_WORKERS, buffer_size: int = DEFAULT_SCAN_BUFFER,
+                    on_error: Callable[[str, Exception], None] = None) -> Iterator[Tuple[str, List]]:
+    """
+    Stream the pages of many partitions concurrently, merged into one
+    iterator of `(partition, page)` tuples.
+
+    Each of at most `max_workers` threads takes the next partition when it
+    finishes the previous one, so slow partitions do not hold up the others
+    and at most `max_workers` requests are in flight. Pages of a partition
+    are yielded in order; pages of different partitions interleave. At most
+    `buffer_size` pages wait for the consumer, and workers stop when the
+    iterator is closed.
+
+    :param Iterable partitions: The partition keys, consumed lazily.
+    :param Callable stream: Called as `stream(partition)` to return the pages
+           of a partition.
+    :param int max_workers: (optional) The number of worker threads.
+    :param int buffer_size: (optional) The number of pages buffered ahead of
+           the consumer.
+    :param Callable on_error: (optional) Called with the partition and the
+           exception when a partition fails; the scan then continues with the
+           other partitions. By default the error is raised.
+    """
+    if max_workers is None or max_workers < 1:
+        raise ValueError('max_workers must be at least 1')
+    if buffer_size is None or buffer_size < 1:
+        raise ValueError('buffer_size must be at least 1')
+    partitions = iter(partitions)
+    partitions_lock = threading.Lock()
+    pages = queue.Queue(maxsize=buffer_size)
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        while not stopped.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def next_partition():
+        with partitions_lock:
+            return next(partitions, _DONE)
+
+    def work() -> None:
+        try:
+            while not stopped.is_set():
+                partition = next_partition()
+                if partition is _DONE:
+                    return
+                try:
+                    with span('scan_partition', partition=partition):
+                        for page in stream(partition):
+                            if not put((partition, page, None)):
+                                return
+                except Exception as err:  # pylint: disable=broad-except
+                    if not put((partition, None, err)):
+                        return
+        except Exception as err:  # pylint: disable=broad-except
+            # The partitions iterable itself failed.
+            put((None, None, err))
+        finally:
+            put(_DONE)
+
+    # A context can only be entered by one thread at a time, so every worker
+    # runs in its own copy of the caller's context.
+    workers = [threading.Thread(target=contextvars.copy_context().run, args=(work,), daemon=True)
+               for _ in range(max_workers)]
+    for worker in workers:
+        worker.start()
+    running = len(workers)
+    try:
+        while running:
+            item = pages.get()
+            if item is _DONE:
+                running -= 1
+                continue
+            (partition, page, error) = item
+            if error is not None:
+                if on_error is None or partition is None:
+                    raise error
+                on_error(partition, error)
+                continue
+            yield (partition, page)
+    finally:
+        stopped.set()
+        for worker in workers:
+            worker.join()
@@ -0,0 +1,225 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Iteration over the offset-paginated (`limit`/`skip`) and key-range
+(`start_*_id`/`end_*_id`) list operations.
+"""
+
+import bisect
+import contextvars
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_PREFETCH = 4
+DEFAULT_RANGE_WORKERS = 8
+DEFAULT_RANGE_FANOUT = 4
+
+# Split points are computed on the first _KEY_DEPTH characters of the keys.
+_KEY_DEPTH = 12
+
+
+def iter_offset_windows(fetch: Callable[[int, int], List], *, page_size: int = DEFAULT_PAGE_SIZE,
+                        prefetch: int = DEFAULT_PREFETCH) -> Iterator[List]:
+    """
+    Yield the windows of an offset-paginated list, in order.
+
+    The list operations do not report a total, so the first window is fetched
+    alone; if it is full, up to `prefetch` of the following windows are
+    fetched concurrently ahead of the consumer. Iteration stops at the first
+    window that is not full. At most `prefetch` windows are held in memory.
+
+    :param Callable fetch: Called as `fetch(skip, limit)` to return a window.
+    :param int page_size: (optional) The number of items per window.
+    :param int prefetch: (optional) The number of windows fetched ahead; 1
+           fetches sequentially.
+    """
+    if page_size is None or page_size < 1:
+        raise ValueError('page_size must be at least 1')
+    if prefetch is None or prefetch < 1:
+        raise ValueError('prefetch must be at least 1')
+    window = fetch(0, page_size)
+    yield window
+    skip = page_size
+    if prefetch == 1:
+        while len(window) >= page_size:
+            window = fetch(skip, page_size)
+            yield window
+            skip += page_size
+        return
+    if len(window) < page_size:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=prefetch)
+    pending = deque()
+    try:
+        while True:
+            while len(pending) < prefetch:
+                pending.append(executor.submit(contextvars.copy_context().run, fetch, skip, page_size))
+                skip += page_size
+            window = pending.popleft().result()
+            yield window
+            if len(window) < page_size:
+                return
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def iter_unique(items: Iterator, key: Callable) -> Iterator:
+    """
+    Yield the items whose `key` has not been seen before. Items shift between
+    offset windows when the list is modified during iteration, which can
+    return an item twice.
+    """
+    seen = set()
+    for item in items:
+        item_key = key(item)
+        if item_key is not None:
+            if item_key in seen:
+                continue
+            seen.add(item_key)
+        yield item
+
+
+def _key_to_int(key: str, alphabet: str) -> int:
+    # Digit 0 marks the end of the key, so that a key sorts before its
+    # extensions; characters outside the alphabet take the digit of the next
+    # larger character.
+    value = 0
+    for index in range(_KEY_DEPTH):
+        digit = bisect.bisect_left(alphabet, key[index]) + 1 if index < len(key) else 0
+        value = value * (len(alphabet) + 1) + digit
+    return value
+
+
+def _int_to_key(value: int, alphabet: str) -> str:
+    digits = []
+    for _ in range(_KEY_DEPTH):
+        (value, digit) = divmod(value, len(alphabet) + 1)
+        digits.append(digit)
+    chars = []
+    for digit in reversed(digits):
+        if digit == 0:
+            break
+        chars.append(alphabet[min(digit, len(alphabet)) - 1])
+    return ''.join(chars)
+
+
+def split_key_range(sample: List[str], end: Optional[str], parts: int) -> List[str]:
+    """
+    Return up to `parts - 1` ascending split points strictly between the last
+    key of a full, sorted page `sample` and `end`, for the part of a key range
+    that follows the page.
+
+    Split points are built from the characters seen in the sample, so that
+    they fall where keys are likely to be. A bounded remainder is split
+    evenly. An unbounded remainder (`end` is None) is split at geometrically
+    growing distances, starting at the width of the sample, so that dense key
+    spaces get narrow ranges and sparse tails are covered in a few requests.
+    """
+    last = sample[-1]
+    alphabet = ''.join(sorted(set(''.join(sample) + (end or ''))))
+    low = _key_to_int(last, alphabet)
+    limit = (len(alphabet) + 1) ** _KEY_DEPTH - 1
+    if end is not None:
+        high = _key_to_int(end, alphabet)
+        candidates = [low + (high - low) * k // parts for k in range(1, parts)]
+    else:
+        width = max(low - _key_to_int(sample[0], alphabet), 1)
+        candidates = [low + width * (2 ** k - 1) for k in range(1, parts)]
+    points = []
+    for candidate in candidates:
+        point = _int_to_key(min(candidate, limit), alphabet)
+        if point > (points[-1] if points else last) and (end is None or point < end):
+            points.append(point)
+    return points
+
+
+def iter_key_ranges(fetch: Callable[[Optional[str], Optional[str], int], List], key: Callable, *,
+                    start: str = None, end: str = None, page_size: int = DEFAULT_PAGE_SIZE,
+                    max_workers: int = DEFAULT_RANGE_WORKERS,
+                    fanout: int = DEFAULT_RANGE_FANOUT) -> Iterator[List]:
+    """
+    Yield the pages of a list that supports inclusive key ranges, in key
+    order, listing disjoint ranges concurrently.
+
+    Every request reads the first page of a range, so no request uses an
+    offset. When a page is full, the rest of its range is split into up to
+    `fanout` narrower ranges, using the keys of the page to choose the split
+    points, and those ranges are listed concurrently on at most
+    `max_workers` threads. Dense parts of the key space are split further as
+    they are found. Pages are buffered until the consumer reaches them.
+
+    :param Callable fetch: Called as `fetch(start, end, limit)` to return the
+           first `limit` items with `start <= key <= end`, sorted by key. Either
+           bound may be None.
+    :param Callable key: Returns the key of an item.
+    :param str start: (optional) The first key to include.
+    :param str end: (optional) The last key to include.
+    :param int page_size: (optional) The number of items per request.
+    :param int max_workers: (optional) The maximum number of concurrent
+           requests.
+    :param int fanout: (optional) The number of ranges the rest of a range is
+           split into.
+    """
+    if page_size is None or page_size < 2:
+        raise ValueError('page_size must be at least 2')
+    if max_workers is None or max_workers < 1:
+        raise ValueError('max_workers must be at least 1')
+    if fanout is None or fanout < 1:
+        raise ValueError('fanout must be at least 1')
+    stopped = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def submit(*args) -> Future:
+        return executor.submit(contextvars.copy_context().run, list_range, *args)
+
+    def list_range(low: Optional[str], after: bool, high: Optional[str]) -> Tuple[List, List[Future]]:
+        # A range holds the keys in [low, high), or (low, high) when `after`
+        # is set; high None means up to `end`, inclusive.
+        request_end = high if end is None or (high is not None and high < end) else end
+        page = fetch(low, request_end, page_size)
+        items = [item for item in page if (not after or key(item) > low) and (high is None or key(item) < high)]
+        children = []
+        last = key(page[-1]) if page else None
+        if len(page) >= page_size and (high is None or last < high) and not stopped.is_set():
+            bound = high if high is not None else end
+            points = split_key_range([key(item) for item in page], bound, fanout) if fanout > 1 else []
+            lows = [(last, True)] + [(point, False) for point in points]
+            highs = points + [high]
+            children = [submit(child_low, child_after, child_high)
+                        for ((child_low, child_after), child_high) in zip(lows, highs)]
+        return (items, children)
+
+    pending = deque([submit(start, False, None)])
+    try:
+        while pending:
+            (items, children) = pending.popleft().result()
+            # Children cover consecutive key ranges, which all precede the
+            # ranges already pending.
+            pending.extendleft(reversed(children))
+            if items:
+                yield items
+    finally:
+        stopped.set()
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
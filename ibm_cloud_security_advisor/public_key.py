@@ -0,0 +1,177 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Caching of the notifications public key used to verify notification payloads.
+"""
+
+import functools
+import threading
+import time
+from typing import Callable, Tuple, Type
+
+DEFAULT_PUBLIC_KEY_TTL = 3600.0
+DEFAULT_MIN_REFRESH_INTERVAL = 60.0
+
+
+@functools.lru_cache(maxsize=32)
+def parse_public_key(pem: str):
+    """
+    Parse a PEM encoded public key, memoized so each key is parsed once.
+    Requires the `cryptography` package.
+    """
+    try:
+        from cryptography.hazmat.primitives.serialization import load_pem_public_key
+    except ImportError:
+        raise ImportError('parse_public_key requires the cryptography package')
+    return load_pem_public_key(pem.encode('utf-8') if isinstance(pem, str) else pem)
+
+
+class _Refresh():
+
+    __slots__ = ('done', 'key', 'error')
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.key = None
+        self.error = None
+
+
+class PublicKeyCache():
+    """
+    A public key fetched on demand and kept for `ttl` seconds.
+
+    Concurrent callers that find the key missing or expired share a single
+    fetch. A caller that finds the key stale, for example because a signature
+    did not verify, refreshes it with `refresh(stale_key)`; callers that saw the
+    same stale key share that refresh too. When a refresh fetches the same key
+    again, further refreshes of that key are answered from the cache for
+    `min_refresh_interval` seconds, so payloads with bad signatures cannot
+    make the cache call the service for each of them.
+
+    :attr float ttl: Seconds a fetched key is used before it is refetched.
+    :attr float min_refresh_interval: Seconds after a refresh that fetched
+          an unchanged key during which that key is not fetched again.
+    """
+
+    def __init__(self, fetch: Callable[[], str], *, ttl: float = DEFAULT_PUBLIC_KEY_TTL,
+                 min_refresh_interval: float = DEFAULT_MIN_REFRESH_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        """
+        :param Callable fetch: Called with no arguments to fetch the PEM key.
+        :param float ttl: (optional) Seconds a fetched key is used.
+        :param float min_refresh_interval: (optional) Seconds after a refresh
+               that fetched an unchanged key during which that key is not
+               fetched again.
+        :param Callable clock: (optional) The monotonic clock measuring the ttl.
+        """
+        if ttl is None or ttl < 0:
+            raise ValueError('ttl must be a non-negative number of seconds')
+        if min_refresh_interval is None or min_refresh_interval < 0:
+            raise ValueError('min_refresh_interval must be a non-negative number of seconds')
+        self.fetch = fetch
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.clock = clock
+        self._entry = None
+        self._lock = threading.Lock()
+        self._refresh = None
+
+    def get(self) -> str:
+        """Return the key, fetching it if it is missing or expired."""
+        entry = self._entry
+        if entry is not None and self.clock() < entry[1]:
+            return entry[0]
+        return self.refresh()
+
+    @property
+    def current(self) -> str:
+        """The cached key, even if expired, or None. Never fetches."""
+        entry = self._entry
+        return entry[0] if entry is not None else None
+
+    def get_parsed(self):
+        """Return the key parsed by `parse_public_key`."""
+        return parse_public_key(self.get())
+
+    def refresh(self, stale_key: str = None, *, force: bool = False) -> str:
+        """
+        Fetch the key again, unless it has already been replaced since
+        `stale_key` was read, or a refresh less than `min_refresh_interval`
+        seconds ago found it unchanged.
+
+        :param str stale_key: (optional) The key the caller found stale.
+        :param bool force: (optional) Fetch even within `min_refresh_interval`.
+        :return: The current key.
+        """
+        with self._lock:
+            entry = self._entry
+            now = self.clock()
+            if entry is not None and now < entry[1] and (
+                    entry[0] != stale_key or (not force and now < entry[2])):
+                return entry[0]
+            flight = self._refresh
+            leader = flight is None
+            if leader:
+                flight = self._refresh = _Refresh()
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.key
+        try:
+            flight.key = self.fetch()
+            with self._lock:
+                now = self.clock()
+                # Refreshing an unchanged key again is pointless for a while.
+                quiet_until = now + self.min_refresh_interval if flight.key == stale_key else now
+                self._entry = (flight.key, now + self.ttl, quiet_until)
+            return flight.key
+        except Exception as err:
+            flight.error = err
+            raise
+        finally:
+            with self._lock:
+                self._refresh = None
+            flight.done.set()
+
+    def invalidate(self) -> None:
+        """Discard the cached key."""
+        with self._lock:
+            self._entry = None
+
+    def call_with_key(self, func: Callable, *, retry_on: Tuple[Type[Exception], ...] = (Exception,),
+                      parsed: bool = False):
+        """
+        Call `func(key)`. If it raises one of `retry_on`, the key is assumed
+        stale, refreshed and `func` is called once more with the new key. The
+        error is raised again if the key was refreshed too recently or did not
+        change.
+
+        :param Callable func: Called with the PEM key, or the parsed key if
+               `parsed` is set.
+        :param tuple retry_on: (optional) The exceptions that indicate a stale
+               key.
+        :param bool parsed: (optional) Pass the parsed key instead of the PEM.
+        """
+        key = self.get()
+        try:
+            return func(parse_public_key(key) if parsed else key)
+        except retry_on:
+            fresh = self.refresh(key)
+            if fresh == key:
+                raise
+        return func(parse_public_key(fresh) if parsed else fresh)
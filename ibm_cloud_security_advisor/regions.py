@@ -0,0 +1,271 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Routing of service calls across regions.
+
+`RegionalRouter` holds one client per region and sends each call to the home
+region of its account. It keeps the latency and error rate of every region;
+reads of accounts without a home region go to the fastest healthy region, and
+reads that fail with a server error, a timeout or a connection error are
+retried in the next region. An account without a home region is assigned a
+region on its first write, and its writes always go there. The regional clients share the authenticator, and so the
+token, as well as the HTTP session and the transport.
+
+    router = RegionalRouter(FindingsApiV1, authenticator, home_regions={account_id: 'eu-de'})
+    occurrence = router.get_occurrence(account_id, provider_id, occurrence_id).get_result()
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Union
+
+from ibm_cloud_sdk_core.authenticators.authenticator import Authenticator
+
+from .isolation import BulkheadFullError, CircuitOpenError, is_failure
+from .sdk_logging import logger
+from .transport import Transport
+
+REGIONS = ('us-south', 'eu-gb', 'eu-de')
+
+DEFAULT_SMOOTHING = 0.2
+DEFAULT_MAX_ERROR_RATE = 0.5
+
+_DEFAULT_REGION = 'us-south'
+
+
+def region_url(client_class: type, region: str) -> str:
+    """Return the URL of a service client class in a region."""
+    return client_class.DEFAULT_SERVICE_URL.replace('://{0}.'.format(_DEFAULT_REGION), '://{0}.'.format(region), 1)
+
+
+def is_read_operation(name: str) -> bool:
+    """Whether a client method is an idempotent read that can be retried in another region."""
+    return name.startswith(('get_', 'list_'))
+
+
+class RegionStats():
+    """
+    Exponentially weighted latency and error rate of a region.
+
+    :attr str region: The region.
+    :attr int requests: The number of calls made.
+    :attr int errors: The number of calls that failed.
+    :attr float latency: The smoothed latency in seconds, or None before the
+          first call.
+    :attr float error_rate: The smoothed fraction of calls that failed.
+    """
+
+    def __init__(self, region: str, *, smoothing: float = DEFAULT_SMOOTHING) -> None:
+        self.region = region
+        self.smoothing = smoothing
+        self.requests = 0
+        self.errors = 0
+        self.latency = None
+        self.error_rate = 0.0
+
+    def record(self, seconds: float, failed: bool) -> None:
+        """Record a call."""
+        self.requests += 1
+        self.errors += 1 if failed else 0
+        self.error_rate += self.smoothing * ((1.0 if failed else 0.0) - self.error_rate)
+        if not failed:
+            self.latency = seconds if self.latency is None else self.latency + self.smoothing * (seconds - self.latency)
+
+    def to_dict(self) -> Dict:
+        """Return a json dictionary representing these statistics."""
+        return {'requests': self.requests, 'errors': self.errors, 'latency': self.latency,
+                'error_rate': self.error_rate}
+
+
+class RegionalRouter():
+    """
+    Routes the calls of a service client across regions.
+
+    Client methods called on the router are sent to the region of their
+    `account_id`, the first argument. `get_` and `list_` calls fail over to
+    the other regions, healthiest and fastest first; other calls only go to
+    the home region. The first write of an account without a home region
+    assigns it `default_region`, or the fastest healthy region if there is no
+    default, and the router remembers it as the account's home region, so
+    the data of an account is not spread across regions.
+
+    :attr dict clients: The client of each region.
+    :attr float max_error_rate: The error rate above which a region is not
+          chosen for accounts without a home region or as a failover target
+          while healthier regions remain.
+    :attr str default_region: The region assigned to accounts without a home
+          region.
+    :attr int failovers: The number of calls retried in another region.
+    """
+
+    def __init__(self, client_class: type, authenticator: Authenticator, *,
+                 regions: Union[Iterable[str], Dict[str, str]] = REGIONS,
+                 home_regions: Union[Dict[str, str], Callable[[str], str]] = None, default_region: str = None,
+                 transport: Transport = None,
+                 smoothing: float = DEFAULT_SMOOTHING, max_error_rate: float = DEFAULT_MAX_ERROR_RATE,
+                 clock: Callable[[], float] = time.perf_counter, **client_options) -> None:
+        """
+        :param type client_class: `FindingsApiV1` or `NotificationsApiV1`.
+        :param Authenticator authenticator: The authenticator shared by the
+               regional clients.
+        :param regions: (optional) Region names, or a `dict` of service URLs by
+               region name.
+        :param home_regions: (optional) The home region of each account, as a
+               `dict` or a function of the account id returning a region or
+               None.
+        :param str default_region: (optional) The region assigned to accounts
+               without a home region on their first write.
+        :param Transport transport: (optional) The transport shared by the
+               regional clients.
+        :param float smoothing: (optional) The weight of the latest call in the
+               latency and error rate of a region.
+        :param float max_error_rate: (optional) The error rate above which a
+               region is considered unhealthy.
+        """
+        if client_class is None:
+            raise ValueError('client_class must be provided')
+        if not isinstance(regions, dict):
+            regions = {region: region_url(client_class, region) for region in regions}
+        if not regions:
+            raise ValueError('regions must not be empty')
+        if default_region is not None and default_region not in regions:
+            raise ValueError('unknown region {0}'.format(default_region))
+        self.client_class = client_class
+        self.home_regions = home_regions if home_regions is not None else {}
+        self.default_region = default_region
+        self.max_error_rate = max_error_rate
+        self.clock = clock
+        self.failovers = 0
+        self.clients = {}
+        self._stats = {}
+        self._assigned = {}
+        self._lock = threading.Lock()
+        session = None
+        for (region, url) in regions.items():
+            client = client_class(authenticator, transport=transport, **client_options)
+            client.set_service_url(url)
+            if session is None:
+                session = client.get_http_client()
+            else:
+                # One session keeps a connection pool per host for every region.
+                client.set_http_client(session)
+            self.clients[region] = client
+            self._stats[region] = RegionStats(region, smoothing=smoothing)
+
+    def __getattr__(self, name: str):
+        if name.startswith('_') or not callable(getattr(self.client_class, name, None)):
+            raise AttributeError('{0!r} object has no attribute {1!r}'.format(type(self).__name__, name))
+
+        def routed(*args, **kwargs):
+            return self.call(name, *args, **kwargs)
+
+        routed.__name__ = name
+        routed.__doc__ = getattr(self.client_class, name).__doc__
+        return routed
+
+    def client(self, region: str):
+        """Return the client of a region."""
+        client = self.clients.get(region)
+        if client is None:
+            raise ValueError('unknown region {0}'.format(region))
+        return client
+
+    def home_region(self, account_id: str) -> str:
+        """
+        Return the configured home region of an account, else the region
+        assigned on its first write, or None.
+        """
+        if callable(self.home_regions):
+            home = self.home_regions(account_id)
+        else:
+            home = self.home_regions.get(account_id)
+        if home is None:
+            with self._lock:
+                home = self._assigned.get(account_id)
+        return home
+
+    def route(self, account_id: str) -> List[str]:
+        """
+        Return the regions to try for an account in order: its home region,
+        then the healthy regions from the fastest, then the unhealthy ones.
+        Regions without any calls yet count as the fastest, so they get
+        measured.
+        """
+        with self._lock:
+            ranked = sorted(self._stats.values(), key=lambda stats: (
+                stats.error_rate > self.max_error_rate, stats.latency if stats.latency is not None else 0.0))
+        regions = [stats.region for stats in ranked]
+        home = self.home_region(account_id)
+        if home is not None:
+            if home not in self.clients:
+                raise ValueError('unknown region {0} for account {1}'.format(home, account_id))
+            regions.remove(home)
+            regions.insert(0, home)
+        return regions
+
+    def call(self, operation: str, *args, **kwargs):
+        """
+        Call a client method in the region of its `account_id`, failing over
+        to other regions if it is a read.
+
+        :param str operation: The client method, for example `get_occurrence`.
+        """
+        account_id = kwargs.get('account_id', args[0] if args else None)
+        if account_id is None:
+            raise ValueError('account_id must be provided')
+        regions = self.route(account_id)
+        if not is_read_operation(operation):
+            regions = [self._write_region(account_id, regions[0])]
+        for (attempt, region) in enumerate(regions):
+            start = self.clock()
+            try:
+                result = getattr(self.clients[region], operation)(*args, **kwargs)
+            except Exception as err:
+                failed = is_failure(err) or isinstance(err, (CircuitOpenError, BulkheadFullError))
+                self._record(region, self.clock() - start, failed)
+                if not failed or attempt == len(regions) - 1:
+                    raise
+                logger.warning('%s failed in %s, failing over to %s: %s', operation, region, regions[attempt + 1],
+                               err)
+                with self._lock:
+                    self.failovers += 1
+                continue
+            self._record(region, self.clock() - start, False)
+            return result
+
+    def stats(self) -> Dict[str, Dict]:
+        """Return the statistics of every region."""
+        with self._lock:
+            return {region: stats.to_dict() for (region, stats) in self._stats.items()}
+
+    def add_instrumentation_hook(self, hook):
+        """Register an instrumentation hook on every regional client."""
+        for client in self.clients.values():
+            hook = client.add_instrumentation_hook(hook)
+        return hook
+
+    def _write_region(self, account_id: str, fastest: str) -> str:
+        home = self.home_region(account_id)
+        if home is not None:
+            return home
+        with self._lock:
+            return self._assigned.setdefault(account_id, self.default_region or fastest)
+
+    def _record(self, region: str, seconds: float, failed: bool) -> None:
+        with self._lock:
+            self._stats[region].record(seconds, failed)
@@ -0,0 +1,200 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Priority scheduling of the requests of a shared client.
+
+`PriorityTransport` lets at most `max_concurrent` requests be in flight, the
+size of the connection pool they share, and queues the others by priority
+class. Freed slots go to the queued classes by weighted fair queuing, so bulk
+traffic keeps a share of the pool without holding up interactive calls.
+The class of a request is set for a block of code with `request_priority`:
+
+    findings_service.set_transport(PriorityTransport(max_concurrent=10, reserved=2))
+
+    with request_priority(BULK):
+        findings_service.create_occurrences(account_id, occurrences)
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator
+
+from ibm_cloud_sdk_core import BaseService, DetailedResponse
+
+from .instrumentation import record_pool_wait
+from .transport import DeadlineExceeded, Transport, TransportWrapper, remaining_time
+
+INTERACTIVE = 'interactive'
+NORMAL = 'normal'
+BULK = 'bulk'
+
+DEFAULT_WEIGHTS = {INTERACTIVE: 16, NORMAL: 4, BULK: 1}
+# The default size of the connection pool of a requests session.
+DEFAULT_MAX_CONCURRENT = 10
+
+_request_priority = ContextVar('security_advisor_request_priority', default=NORMAL)
+
+
+@contextmanager
+def request_priority(priority: str) -> Iterator[str]:
+    """Send every request made in the block with the given priority class."""
+    if priority not in DEFAULT_WEIGHTS:
+        raise ValueError('priority must be one of interactive, normal or bulk')
+    token = _request_priority.set(priority)
+    try:
+        yield priority
+    finally:
+        _request_priority.reset(token)
+
+
+def get_request_priority() -> str:
+    """Return the priority class of the current context."""
+    return _request_priority.get()
+
+
+class _Ticket():
+    __slots__ = ('granted',)
+
+    def __init__(self) -> None:
+        self.granted = False
+
+
+class PriorityTransport(TransportWrapper):
+    """
+    Queues requests by priority class once `max_concurrent` are in flight.
+
+    Each class has a weight; while several classes are waiting, each gets
+    freed slots in proportion to its weight (stride scheduling), and a class
+    that was idle does not build up credit. `reserved` slots are only used by
+    interactive requests, so they never wait behind a pool full of other
+    traffic. Time spent queued is recorded as pool wait time, and queued
+    requests give up with `DeadlineExceeded` when their deadline passes.
+
+    :attr int max_concurrent: The maximum number of requests in flight.
+    :attr int reserved: The slots only interactive requests can use.
+    :attr dict weights: The weight of each priority class.
+    """
+
+    def __init__(self, transport: Transport = None, *, max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+                 reserved: int = 0, weights: Dict[str, int] = None) -> None:
+        """
+        :param Transport transport: (optional) The transport to wrap. Defaults
+               to a `RequestsTransport`.
+        :param int max_concurrent: (optional) The maximum number of requests in
+               flight, usually the size of the connection pool.
+        :param int reserved: (optional) The slots only interactive requests can
+               use.
+        :param dict weights: (optional) The weight of each priority class:
+               interactive, normal or bulk.
+        """
+        super().__init__(transport)
+        if max_concurrent is None or max_concurrent < 1:
+            raise ValueError('max_concurrent must be at least 1')
+        if reserved is None or not 0 <= reserved < max_concurrent:
+            raise ValueError('reserved must be at least 0 and less than max_concurrent')
+        self.max_concurrent = max_concurrent
+        self.reserved = reserved
+        if set(weights or {}) - set(DEFAULT_WEIGHTS):
+            raise ValueError('weights must only have the classes interactive, normal or bulk')
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        if any(weight <= 0 for weight in self.weights.values()):
+            raise ValueError('weights must be positive')
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._queues = {priority: deque() for priority in self.weights}
+        self._pass = {priority: 0.0 for priority in self.weights}
+        self._virtual_time = 0.0
+        self._counters = {priority: {'sent': 0, 'queued': 0, 'wait_time': 0.0} for priority in self.weights}
+
+    def send(self, service: BaseService, request: dict, *, operation_id: str = None, **kwargs) -> DetailedResponse:
+        priority = get_request_priority()
+        self.acquire(priority)
+        try:
+            return self.transport.send(service, request, operation_id=operation_id, **kwargs)
+        finally:
+            self.release()
+
+    def acquire(self, priority: str) -> None:
+        """Wait for a slot for a request of a priority class."""
+        if priority not in self._queues:
+            raise ValueError('unknown priority {0}'.format(priority))
+        with self._condition:
+            counters = self._counters[priority]
+            counters['sent'] += 1
+            ticket = _Ticket()
+            queue = self._queues[priority]
+            if not queue:
+                # A class that was idle starts at the current virtual time
+                # rather than with the credit of its idle period.
+                self._pass[priority] = max(self._pass[priority], self._virtual_time)
+            queue.append(ticket)
+            self._dispatch()
+            if ticket.granted:
+                return
+            counters['queued'] += 1
+            start = time.perf_counter()
+            try:
+                while not ticket.granted:
+                    remaining = remaining_time()
+                    if remaining is not None and remaining <= 0:
+                        queue.remove(ticket)
+                        self._dispatch()
+                        raise DeadlineExceeded('The deadline passed while waiting for a connection')
+                    self._condition.wait(remaining)
+            finally:
+                waited = time.perf_counter() - start
+                counters['wait_time'] += waited
+        record_pool_wait(waited)
+
+    def release(self) -> None:
+        """Give back the slot of a finished request."""
+        with self._condition:
+            self._in_flight -= 1
+            self._dispatch()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Return the counters of each priority class: requests `sent`, requests
+        that were `queued`, total `wait_time` in seconds and the number
+        `waiting` now.
+        """
+        with self._condition:
+            return {priority: dict(counters, waiting=len(self._queues[priority]))
+                    for (priority, counters) in self._counters.items()}
+
+    def _limit(self, priority: str) -> int:
+        return self.max_concurrent if priority == INTERACTIVE else self.max_concurrent - self.reserved
+
+    def _dispatch(self) -> None:
+        granted = False
+        while True:
+            eligible = [priority for (priority, queue) in self._queues.items()
+                        if queue and self._in_flight < self._limit(priority)]
+            if not eligible:
+                break
+            priority = min(eligible, key=lambda name: (self._pass[name], -self.weights[name]))
+            self._virtual_time = self._pass[priority]
+            self._pass[priority] += 1.0 / self.weights[priority]
+            self._queues[priority].popleft().granted = True
+            self._in_flight += 1
+            granted = True
+        if granted:
+            self._condition.notify_all()
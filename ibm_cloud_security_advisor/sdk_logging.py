@@ -0,0 +1,123 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Scoped logging for the service clients.
+
+All SDK records go to the `ibm_cloud_security_advisor` logger; the SDK never
+changes the logging configuration of the application. Each client has its own
+level on top of the logger's, and every call site is guarded by
+`is_enabled_for` so a disabled level costs a comparison. Messages use lazy
+%-style arguments and are only formatted when emitted.
+"""
+
+import logging
+import random
+
+from .instrumentation import Instrumentation, InstrumentationHook, OperationMetrics
+
+LOGGER_NAME = 'ibm_cloud_security_advisor'
+
+logger = logging.getLogger(LOGGER_NAME)
+logger.addHandler(logging.NullHandler())
+
+
+def _check_level(level) -> int:
+    # Accepts the numeric levels and the registered level names.
+    if isinstance(level, int):
+        return level
+    if isinstance(level, str):
+        value = logging.getLevelName(level)
+        if isinstance(value, int):
+            return value
+        raise ValueError('unknown log level {0}'.format(level))
+    raise TypeError('level must be an int or a str')
+
+
+class ClientLogger(InstrumentationHook):
+    """
+    The logger of a single service client.
+
+    Request/response timing is logged at DEBUG for a random sample of the
+    calls. While the sample rate is zero or DEBUG is disabled for the client,
+    the timing logger is not registered with the client's instrumentation, so
+    calls take the unmeasured path.
+
+    :attr int level: The minimum level of the records this client emits.
+    :attr float sample_rate: The fraction, between 0 and 1, of calls whose
+          timing is logged at DEBUG.
+    """
+
+    def __init__(self, instrumentation: Instrumentation, *, level: int = logging.NOTSET,
+                 sample_rate: float = 0.0, seed: int = None) -> None:
+        """
+        :param Instrumentation instrumentation: The instrumentation of the
+               client, used to receive timings.
+        :param int level: (optional) The minimum level of the records emitted.
+        :param float sample_rate: (optional) The fraction of calls whose timing
+               is logged.
+        :param int seed: (optional) Seed of the sampling, for reproducible runs.
+        """
+        self.instrumentation = instrumentation
+        self.level = logging.NOTSET
+        self.sample_rate = 0.0
+        self._random = random.Random(seed)
+        self.configure(level=level, sample_rate=sample_rate)
+
+    def configure(self, *, level: int = None, sample_rate: float = None) -> None:
+        """
+        Change the level or timing sample rate of the client.
+
+        :param int level: (optional) The minimum level of the records emitted.
+        :param float sample_rate: (optional) The fraction of calls whose timing
+               is logged.
+        """
+        if level is not None:
+            self.level = _check_level(level)
+        if sample_rate is not None:
+            if not 0.0 <= sample_rate <= 1.0:
+                raise ValueError('sample_rate must be between 0 and 1')
+            self.sample_rate = sample_rate
+        self.instrumentation.remove_hook(self)
+        if self.sample_rate > 0.0 and self.level <= logging.DEBUG:
+            self.instrumentation.add_hook(self)
+
+    def is_enabled_for(self, level: int) -> bool:
+        """Return whether a record of `level` would be emitted by this client."""
+        return level >= self.level and logger.isEnabledFor(level)
+
+    def log(self, level: int, msg: str, *args, **kwargs) -> None:
+        """Log `msg % args` at `level` if it is enabled for this client."""
+        if self.is_enabled_for(level):
+            logger.log(level, msg, *args, **kwargs)
+
+    def debug(self, msg: str, *args, **kwargs) -> None:
+        """Log `msg % args` at DEBUG if it is enabled for this client."""
+        self.log(logging.DEBUG, msg, *args, **kwargs)
+
+    def error(self, msg: str, *args, **kwargs) -> None:
+        """Log `msg % args` at ERROR if it is enabled for this client."""
+        self.log(logging.ERROR, msg, *args, **kwargs)
+
+    def on_operation(self, metrics: OperationMetrics) -> None:
+        if self._random.random() >= self.sample_rate or not self.is_enabled_for(logging.DEBUG):
+            return
+        logger.debug('%s.%s %s -> %s in %.2f ms (build %.2f ms, network %.2f ms, parse %.2f ms, '
+                     'pool wait %.2f ms, %s bytes out, %s bytes in, %d retries, transaction id %s)',
+                     metrics.service_name, metrics.operation_id, metrics.method, metrics.status_code,
+                     metrics.total_time * 1000, metrics.build_time * 1000, metrics.network_time * 1000,
+                     metrics.parse_time * 1000, metrics.pool_wait * 1000, metrics.bytes_out, metrics.bytes_in,
+                     metrics.retries, metrics.transaction_id)
@@ -0,0 +1,204 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Coalescing of identical concurrent reads.
+
+`SingleFlightTransport` wraps another transport and lets one of the identical
+GET requests in flight at the same time go to the network; the other callers
+wait for it and receive a copy of its response, or the same exception.
+Requests are identical when they come from the same client and share their
+operation id, URL, query parameters and headers other than `Transaction-Id`.
+
+    transport = SingleFlightTransport()
+    findings_service = FindingsApiV1(authenticator, transport=transport)
+
+Coroutines that call the clients through `run_in_executor` are coalesced by
+the transport as well; `SingleFlight.call_async` coalesces coroutine
+functions directly. Waiting callers give up with `DeadlineExceeded` when the
+deadline of their own context passes.
+"""
+
+import asyncio
+import copy
+import threading
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, Tuple
+
+from ibm_cloud_sdk_core import BaseService, DetailedResponse
+
+from .tracing import TRANSACTION_ID_HEADER
+from .transport import DeadlineExceeded, Transport, TransportWrapper, budget_timeout, remaining_time
+
+DEFAULT_METHODS = ('GET', 'HEAD')
+
+
+class SingleFlight():
+    """
+    Runs at most one call per key at a time; callers that arrive while a call
+    for their key is running wait for its outcome instead of running their own,
+    at most until their deadline.
+
+    :attr int calls: The number of calls that ran.
+    :attr int coalesced: The number of callers that waited for another call.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._tasks = {}
+
+    def call(self, key: Hashable, func: Callable[[], object]) -> Tuple[object, bool]:
+        """
+        Return the result of `func`, or of the call already running for `key`.
+
+        :param Hashable key: Identifies calls that can share a result.
+        :param Callable func: The call.
+        :return: The result, and whether it is shared with another caller.
+        :rtype: tuple
+        :raises DeadlineExceeded: If the deadline passes while waiting for
+                another caller's call.
+        """
+        with self._lock:
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                future = self._futures[key] = Future()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            try:
+                return (future.result(timeout=budget_timeout(None)), True)
+            except FutureTimeoutError:
+                if future.done():
+                    raise
+                raise DeadlineExceeded('The deadline passed while waiting for a shared call') from None
+        try:
+            result = func()
+        except BaseException as err:
+            self._forget(self._futures, key)
+            future.set_exception(err)
+            raise
+        self._forget(self._futures, key)
+        future.set_result(result)
+        return (result, False)
+
+    async def call_async(self, key: Hashable, func: Callable[[], Awaitable]) -> Tuple[object, bool]:
+        """
+        Await `func()`, or the call already running for `key` on the same event
+        loop. The call runs in its own task, so a cancelled caller does not
+        cancel it for the others.
+
+        :param Hashable key: Identifies calls that can share a result.
+        :param Callable func: Returns the awaitable to run.
+        :return: The result, and whether it is shared with another caller.
+        :rtype: tuple
+        """
+        loop = asyncio.get_event_loop()
+        task_key = (id(loop), key)
+        with self._lock:
+            task = self._tasks.get(task_key)
+            leader = task is None
+            if leader:
+                task = self._tasks[task_key] = asyncio.ensure_future(func())
+                task.add_done_callback(lambda _: self._forget(self._tasks, task_key, task))
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        if leader:
+            return (await asyncio.shield(task), False)
+        remaining = remaining_time()
+        try:
+            return (await asyncio.wait_for(asyncio.shield(task), max(remaining, 0.0) if remaining is not None
+                                           else None), True)
+        except asyncio.TimeoutError:
+            if task.done():
+                raise
+            raise DeadlineExceeded('The deadline passed while waiting for a shared call') from None
+
+    def _forget(self, calls: Dict, key: Hashable, call=None) -> None:
+        with self._lock:
+            if call is None or calls.get(key) is call:
+                calls.pop(key, None)
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _freeze(v)) for (k, v) in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return str(value)
+
+
+def _copy_response(response: DetailedResponse) -> DetailedResponse:
+    # Each caller gets its own result, so that one caller modifying it does not
+    # affect the others. Raw `requests` responses are shared.
+    result = response.get_result()
+    if isinstance(result, (dict, list)):
+        result = copy.deepcopy(result)
+    headers = response.get_headers()
+    return DetailedResponse(response=result, headers=headers.copy() if headers is not None else None,
+                            status_code=response.get_status_code())
+
+
+class SingleFlightTransport(TransportWrapper):
+    """
+    Coalesces identical in-flight idempotent requests into one.
+
+    :attr SingleFlight flight: The call group, with the `calls` and
+          `coalesced` counters.
+    :attr tuple methods: The HTTP methods that are coalesced.
+    :attr frozenset operations: The operations that are coalesced, or None for
+          every operation sent with one of `methods`.
+    """
+
+    def __init__(self, transport: Transport = None, *, methods: Iterable[str] = DEFAULT_METHODS,
+                 operations: Iterable[str] = None) -> None:
+        """
+        :param Transport transport: (optional) The transport to wrap. Defaults
+               to a `RequestsTransport`.
+        :param Iterable[str] methods: (optional) The HTTP methods to coalesce.
+        :param Iterable[str] operations: (optional) Only coalesce these
+               operations, for example `get_note`.
+        """
+        super().__init__(transport)
+        self.flight = SingleFlight()
+        self.methods = tuple(method.upper() for method in methods)
+        self.operations = frozenset(operations) if operations is not None else None
+
+    def send(self, service: BaseService, request: dict, *, operation_id: str = None, **kwargs) -> DetailedResponse:
+        key = self.request_key(service, request, operation_id, kwargs)
+        if key is None:
+            return self.transport.send(service, request, operation_id=operation_id, **kwargs)
+        (response, shared) = self.flight.call(
+            key, lambda: self.transport.send(service, request, operation_id=operation_id, **kwargs))
+        return _copy_response(response) if shared else response
+
+    def request_key(self, service: BaseService, request: dict, operation_id: str, kwargs: Dict) -> Hashable:
+        """Return the key identical requests share, or None if a request is not coalesced."""
+        if str(request.get('method', '')).upper() not in self.methods or kwargs.get('stream'):
+            return None
+        if self.operations is not None and operation_id not in self.operations:
+            return None
+        headers = {name: value for (name, value) in (request.get('headers') or {}).items()
+                   if name.lower() != TRANSACTION_ID_HEADER.lower()}
+        return (id(service), operation_id, request.get('url'), _freeze(request.get('params') or {}),
+                _freeze(headers))
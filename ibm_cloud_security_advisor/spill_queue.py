@@ -0,0 +1,444 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A durable, append-only queue on local disk.
+
+Items are appended as checksummed JSON lines to segment files in a
+directory. A consumer reads a batch from the committed cursor, processes it
+and commits the position after it; a crash before the commit delivers the
+batch again, so delivery is at least once. Segments behind the cursor are
+deleted. Items that fail permanently are moved to a dead-letter file, from
+which they can be replayed:
+
+    python -m ibm_cloud_security_advisor.spill_queue replay /var/spool/findings
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+import requests
+from ibm_cloud_sdk_core import ApiException
+
+from .bulk import DEFAULT_MAX_WORKERS, BulkResult
+from .sdk_logging import logger
+
+FSYNC_ALWAYS = 'always'
+FSYNC_INTERVAL = 'interval'
+FSYNC_NEVER = 'never'
+
+DEFAULT_SEGMENT_BYTES = 16 * 1024 * 1024
+DEFAULT_FSYNC_INTERVAL = 1.0
+DEFAULT_DRAIN_BATCH_SIZE = 100
+
+CURSOR_FILE = 'cursor.json'
+DEAD_LETTER_FILE = 'dead-letter.log'
+
+_SEGMENT_PATTERN = re.compile(r'^segment-(\d{12})\.log$')
+
+# The status codes of failures that are worth retrying.
+_TRANSIENT_STATUS_CODES = (408, 409, 425, 429)
+
+
+def _encode(item) -> bytes:
+    payload = json.dumps(item, separators=(',', ':'), default=str).encode('utf-8')
+    return b'%08x %s\n' % (zlib.crc32(payload), payload)
+
+
+def _decode(line: bytes):
+    # Returns None for a damaged record.
+    (checksum, _, payload) = line.rstrip(b'\n').partition(b' ')
+    try:
+        if int(checksum, 16) != zlib.crc32(payload):
+            return None
+        return (json.loads(payload.decode('utf-8')),)
+    except ValueError:
+        return None
+
+
+def is_permanent_failure(error: Exception) -> bool:
+    """
+    Whether a write failed in a way that retrying cannot fix: a client error
+    response other than a timeout, conflict or rate limit, or an invalid
+    item.
+    """
+    if isinstance(error, ApiException):
+        return 400 <= error.status_code < 500 and error.status_code not in _TRANSIENT_STATUS_CODES
+    if isinstance(error, requests.exceptions.RequestException):
+        return False
+    return isinstance(error, (ValueError, TypeError))
+
+
+class SpillQueue():
+    """
+    A durable queue of JSON-serializable items with a single consumer.
+
+    :attr str directory: The directory holding the segments, the cursor and
+          the dead-letter file.
+    :attr int segment_bytes: The size after which a new segment is started.
+    :attr str fsync: When appended items are flushed to stable storage:
+          `always`, at most every `fsync_interval` seconds (`interval`), or
+          `never`, which leaves it to the operating system.
+    """
+
+    def __init__(self, directory: str, *, segment_bytes: int = DEFAULT_SEGMENT_BYTES, fsync: str = FSYNC_INTERVAL,
+                 fsync_interval: float = DEFAULT_FSYNC_INTERVAL) -> None:
+        if directory is None:
+            raise ValueError('directory must be provided')
+        if segment_bytes is None or segment_bytes < 1:
+            raise ValueError('segment_bytes must be at least 1')
+        if fsync not in (FSYNC_ALWAYS, FSYNC_INTERVAL, FSYNC_NEVER):
+            raise ValueError('fsync must be one of always, interval or never')
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._lock = threading.RLock()
+        self._last_sync = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        self._cursor = self._load_cursor()
+        segments = self._segments()
+        self._segment = segments[-1] if segments else self._cursor[0]
+        self._truncate_torn_tail(self._segment_path(self._segment))
+        self._file = open(self._segment_path(self._segment), 'ab')
+
+    def __enter__(self) -> 'SpillQueue':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        """The number of items after the committed cursor. Reads the segments."""
+        with self._lock:
+            return sum(1 for _ in self._records(self._cursor))
+
+    def put(self, item) -> None:
+        """Append an item."""
+        self.put_many([item])
+
+    def put_many(self, items: Iterable) -> None:
+        """Append items with a single write."""
+        data = b''.join(_encode(item) for item in items)
+        if not data:
+            return
+        with self._lock:
+            self._file.write(data)
+            self._file.flush()
+            if self._file.tell() >= self.segment_bytes:
+                self._sync(force=True)
+                self._file.close()
+                self._segment += 1
+                self._file = open(self._segment_path(self._segment), 'ab')
+            else:
+                self._sync()
+
+    def peek(self, max_items: int) -> Tuple[List, Tuple[int, int]]:
+        """
+        Return up to `max_items` items after the committed cursor and the
+        position to commit once they have been processed.
+        """
+        if max_items is None or max_items < 1:
+            raise ValueError('max_items must be at least 1')
+        with self._lock:
+            items = []
+            position = self._cursor
+            for (item, end) in self._records(self._cursor):
+                items.append(item)
+                position = end
+                if len(items) >= max_items:
+                    break
+            return (items, position)
+
+    def keys(self, key: Callable[[object], Hashable], position: Tuple[int, int] = None) -> Set:
+        """
+        Return the keys of the items after `position`, by default the committed
+        cursor. Reads the segments.
+        """
+        with self._lock:
+            return {key(item) for (item, _) in self._records(tuple(position) if position else self._cursor)}
+
+    def commit(self, position: Tuple[int, int]) -> None:
+        """
+        Mark the items before `position` as processed, and delete the segments
+        that only hold processed items.
+        """
+        with self._lock:
+            if tuple(position) < self._cursor:
+                raise ValueError('position is behind the committed cursor')
+            self._cursor = tuple(position)
+            self._write_json(os.path.join(self.directory, CURSOR_FILE),
+                             {'segment': position[0], 'offset': position[1]})
+            for segment in self._segments():
+                if segment < position[0]:
+                    os.unlink(self._segment_path(segment))
+
+    def dead_letter(self, items: Iterable) -> None:
+        """Append items to the dead-letter file."""
+        data = b''.join(_encode(item) for item in items)
+        if not data:
+            return
+        with self._lock:
+            with open(os.path.join(self.directory, DEAD_LETTER_FILE), 'ab') as dead_letter_file:
+                dead_letter_file.write(data)
+                dead_letter_file.flush()
+                if self.fsync != FSYNC_NEVER:
+                    os.fsync(dead_letter_file.fileno())
+
+    def dead_letters(self) -> List:
+        """Return the items in the dead-letter file."""
+        with self._lock:
+            return [item for (item, _) in self._file_records(os.path.join(self.directory, DEAD_LETTER_FILE), 0)]
+
+    def replay_dead_letters(self) -> int:
+        """
+        Move the items of the dead-letter file back to the queue.
+
+        :return: The number of items replayed.
+        :rtype: int
+        """
+        with self._lock:
+            items = self.dead_letters()
+            self.put_many(items)
+            self._sync(force=True)
+            path = os.path.join(self.directory, DEAD_LETTER_FILE)
+            if os.path.exists(path):
+                os.unlink(path)
+            return len(items)
+
+    def sync(self) -> None:
+        """Flush the appended items to stable storage."""
+        with self._lock:
+            self._sync(force=True)
+
+    def close(self) -> None:
+        """Flush and close the current segment."""
+        with self._lock:
+            if not self._file.closed:
+                if self.fsync != FSYNC_NEVER:
+                    os.fsync(self._file.fileno())
+                self._file.close()
+
+    def _sync(self, force: bool = False) -> None:
+        if self.fsync == FSYNC_NEVER:
+            return
+        now = time.monotonic()
+        if force or self.fsync == FSYNC_ALWAYS or now - self._last_sync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_sync = now
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, 'segment-{0:012d}.log'.format(segment))
+
+    def _segments(self) -> List[int]:
+        return sorted(int(match.group(1)) for match in map(_SEGMENT_PATTERN.match, os.listdir(self.directory))
+                      if match)
+
+    def _load_cursor(self) -> Tuple[int, int]:
+        try:
+            with open(os.path.join(self.directory, CURSOR_FILE), 'r', encoding='utf-8') as cursor_file:
+                cursor = json.load(cursor_file)
+            return (int(cursor['segment']), int(cursor['offset']))
+        except FileNotFoundError:
+            segments = self._segments()
+            return (segments[0] if segments else 0, 0)
+
+    def _records(self, start: Tuple[int, int]):
+        (segment, offset) = start
+        segments = [s for s in self._segments() if s >= segment]
+        for current in segments:
+            yield from ((item, (current, end)) for (item, end) in
+                        self._file_records(self._segment_path(current), offset if current == segment else 0))
+
+    @staticmethod
+    def _file_records(path: str, offset: int):
+        try:
+            record_file = open(path, 'rb')
+        except FileNotFoundError:
+            return
+        with record_file:
+            record_file.seek(offset)
+            while True:
+                line = record_file.readline()
+                if not line.endswith(b'\n'):
+                    # The end of the file, or a record still being written.
+                    return
+                decoded = _decode(line)
+                if decoded is None:
+                    logger.warning('Skipping a damaged record in %s', path)
+                    continue
+                yield (decoded[0], record_file.tell())
+
+    @staticmethod
+    def _truncate_torn_tail(path: str) -> None:
+        # A crash while appending can leave a partial last record, which must
+        # not be merged with the next one.
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb+') as segment_file:
+            data = segment_file.read()
+            end = data.rfind(b'\n') + 1
+            if end != len(data):
+                segment_file.truncate(end)
+
+    def _write_json(self, path: str, value: Dict) -> None:
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as temp_file:
+            json.dump(value, temp_file)
+            temp_file.flush()
+            if self.fsync != FSYNC_NEVER:
+                os.fsync(temp_file.fileno())
+        os.replace(temp_path, path)
+
+
+class DrainResult():
+    """
+    The outcome of draining a queue.
+
+    :attr int written: The number of items written.
+    :attr int dead_lettered: The number of items moved to the dead-letter file.
+    :attr int retried: The number of items appended again after a transient
+          failure.
+    :attr int coalesced: The number of items skipped because a newer version
+          of the same item followed them in the queue.
+    """
+
+    __slots__ = ('written', 'dead_lettered', 'retried', 'coalesced')
+
+    def __init__(self) -> None:
+        self.written = 0
+        self.dead_lettered = 0
+        self.retried = 0
+        self.coalesced = 0
+
+    def __repr__(self) -> str:
+        return 'DrainResult(written={0}, dead_lettered={1}, retried={2}, coalesced={3})'.format(
+            self.written, self.dead_lettered, self.retried, self.coalesced)
+
+
+def drain(queue: SpillQueue, write: Callable[[List], List[BulkResult]], *,
+          batch_size: int = DEFAULT_DRAIN_BATCH_SIZE, max_batches: int = None,
+          is_permanent: Callable[[Exception], bool] = is_permanent_failure,
+          key: Callable[[object], Hashable] = None) -> DrainResult:
+    """
+    Write the items of a queue in batches until it is empty.
+
+    Items that fail permanently are moved to the dead-letter file. Items that
+    fail transiently are appended to the queue again and draining stops, so
+    the caller can retry later. The cursor is committed after each batch.
+
+    With a `key`, only the last version of an item in a batch is written, and
+    a transient failure is not retried when a newer version of the item is
+    still queued, so a retry never overwrites a later version.
+
+    :param SpillQueue queue: The queue.
+    :param Callable write: Writes a batch and returns one `BulkResult` per
+           item.
+    :param int batch_size: (optional) The number of items per batch.
+    :param int max_batches: (optional) Stop after this many batches.
+    :param Callable is_permanent: (optional) Whether an error is permanent.
+    :param Callable key: (optional) Returns the identity of an item, shared by
+           its versions.
+    """
+    result = DrainResult()
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        (items, position) = queue.peek(batch_size)
+        if not items:
+            break
+        if key is not None:
+            latest = OrderedDict()
+            for item in items:
+                latest.pop(key(item), None)
+                latest[key(item)] = item
+            result.coalesced += len(items) - len(latest)
+            items = list(latest.values())
+        results = write(items)
+        failed = [r for r in results if not r.ok]
+        permanent = [r.item for r in failed if is_permanent(r.error)]
+        transient = [r.item for r in failed if not is_permanent(r.error)]
+        if transient and key is not None:
+            queued = queue.keys(key, position)
+            superseded = [item for item in transient if key(item) in queued]
+            result.coalesced += len(superseded)
+            transient = [item for item in transient if key(item) not in queued]
+        queue.dead_letter(permanent)
+        queue.put_many(transient)
+        queue.commit(position)
+        result.written += len(results) - len(failed)
+        result.dead_lettered += len(permanent)
+        result.retried += len(transient)
+        batches += 1
+        if transient:
+            break
+    return result
+
+
+def occurrence_key(occurrence: Dict) -> Tuple[str, str]:
+    """The `(provider_id, id)` identity of a queued occurrence."""
+    return (occurrence.get('provider_id'), occurrence.get('id'))
+
+
+def drain_occurrences(service, account_id: str, queue: SpillQueue, *, batch_size: int = DEFAULT_DRAIN_BATCH_SIZE,
+                      max_batches: int = None, max_workers: int = DEFAULT_MAX_WORKERS) -> DrainResult:
+    """
+    Write the occurrences of a queue with `FindingsApiV1.create_occurrences`,
+    replacing existing ones so that a redelivered occurrence is harmless.
+    Versions of an occurrence are identified by provider_id and id, and only
+    the last one is written.
+
+    :param FindingsApiV1 service: The client used to write.
+    :param str account_id: Account ID.
+    :param SpillQueue queue: A queue of occurrences, each a `dict` of the
+           arguments of `create_occurrence` including `provider_id`.
+    :param int batch_size: (optional) The number of occurrences per batch.
+    :param int max_batches: (optional) Stop after this many batches.
+    :param int max_workers: (optional) The maximum number of concurrent
+           requests.
+    """
+
+    def write(occurrences: List[Dict]) -> List[BulkResult]:
+        return service.create_occurrences(account_id, occurrences, replace_if_exists=True, max_workers=max_workers)
+
+    return drain(queue, write, batch_size=batch_size, max_batches=max_batches, key=occurrence_key)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Inspect a queue directory or replay its dead letters."""
+    parser = argparse.ArgumentParser(prog='python -m ibm_cloud_security_advisor.spill_queue',
+                                     description='Inspect a spill queue or replay its dead letters.')
+    parser.add_argument('command', choices=('stats', 'replay'))
+    parser.add_argument('directory')
+    args = parser.parse_args(argv)
+    with SpillQueue(args.directory) as queue:
+        if args.command == 'replay':
+            print('replayed {0} items'.format(queue.replay_dead_letters()))
+        else:
+            print(json.dumps({'pending': len(queue), 'dead_letters': len(queue.dead_letters()),
+                              'segments': len(queue._segments())}))  # pylint: disable=protected-access
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
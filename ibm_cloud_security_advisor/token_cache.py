@@ -0,0 +1,323 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+An IAM token cache shared by the processes of a host.
+
+`SharedTokenAuthenticator` wraps an authenticator with a token manager, such
+as `IAMAuthenticator`. Tokens are kept in a file that every process using the
+same credentials reads, so a fleet of workers fetches one token instead of one
+each. A background thread refreshes the token before it expires, so requests
+only wait for a fetch when there is no valid token at all.
+
+    authenticator = SharedTokenAuthenticator(IAMAuthenticator(apikey))
+    findings_service = FindingsApiV1(authenticator=authenticator)
+"""
+
+import base64
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from ibm_cloud_sdk_core.authenticators.authenticator import Authenticator
+
+from .sdk_logging import logger
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # Without fcntl, refreshes are only single-flight within a process.
+    fcntl = None
+
+DEFAULT_REFRESH_FRACTION = 0.8
+DEFAULT_EXPIRY_SKEW = 10.0
+DEFAULT_RETRY_DELAY = 5.0
+DEFAULT_TOKEN_LIFETIME = 3600.0
+
+
+def token_expiration(token_response: Dict, now: float) -> Tuple[float, float]:
+    """
+    Return the time a token response was issued and the time it expires, as
+    epoch seconds, from the `expiration`/`expires_in` fields of an IAM
+    response or the claims of the token.
+    """
+    expiration = token_response.get('expiration')
+    if expiration is None and token_response.get('expires_in') is not None:
+        expiration = now + token_response['expires_in']
+    issued = now
+    if expiration is None:
+        claims = _jwt_claims(token_response.get('access_token') or '')
+        expiration = claims.get('exp', now + DEFAULT_TOKEN_LIFETIME)
+        issued = claims.get('iat', now)
+    return (float(min(issued, expiration)), float(expiration))
+
+
+def _jwt_claims(token: str) -> Dict:
+    # The claims are only read to schedule refreshes, so the signature is not
+    # verified.
+    try:
+        payload = token.split('.')[1]
+        return json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    except (IndexError, ValueError):
+        return {}
+
+
+class SharedTokenCache():
+    """
+    A token cached in memory and, optionally, in a file shared between
+    processes.
+
+    Refreshes are single-flight: within a process a lock lets one thread fetch
+    while the others wait for its result, and across processes an exclusive
+    lock on `<path>.lock` lets one process fetch while the others read the
+    token it writes.
+
+    :attr str path: The cache file, or None to cache in memory only.
+    :attr float refresh_fraction: The fraction of a token's lifetime after
+          which it is refreshed.
+    """
+
+    def __init__(self, fetch: Callable[[], Dict], *, path: str = None,
+                 refresh_fraction: float = DEFAULT_REFRESH_FRACTION, expiry_skew: float = DEFAULT_EXPIRY_SKEW,
+                 background: bool = True, retry_delay: float = DEFAULT_RETRY_DELAY,
+                 clock: Callable[[], float] = time.time) -> None:
+        """
+        :param Callable fetch: Returns a token response with `access_token` and
+               `expiration` or `expires_in`.
+        :param str path: (optional) The cache file.
+        :param float refresh_fraction: (optional) The fraction of a token's
+               lifetime after which it is refreshed.
+        :param float expiry_skew: (optional) Seconds before expiry from which a
+               token is no longer used.
+        :param bool background: (optional) Refresh on a background thread
+               rather than in the request path.
+        :param float retry_delay: (optional) Seconds before a failed background
+               refresh is retried.
+        """
+        if fetch is None:
+            raise ValueError('fetch must be provided')
+        if refresh_fraction is None or not 0 < refresh_fraction <= 1:
+            raise ValueError('refresh_fraction must be between 0 and 1')
+        self.fetch = fetch
+        self.path = path
+        self.refresh_fraction = refresh_fraction
+        self.expiry_skew = expiry_skew
+        self.background = background
+        self.retry_delay = retry_delay
+        self.clock = clock
+        self.fetches = 0
+        self._token = None
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._pid = os.getpid()
+
+    @property
+    def token(self) -> Optional[Dict]:
+        """The cached token entry, with `access_token`, `refresh_time` and `expiration`."""
+        return self._token
+
+    def get_token(self) -> str:
+        """
+        Return a valid access token. Only blocks when no valid token is cached
+        in memory or in the file, or when the token is due for refresh and
+        background refreshing is disabled.
+        """
+        self._after_fork()
+        token = self._token
+        now = self.clock()
+        if token is None or not self._usable(token, now) or (not self.background and now >= token['refresh_time']):
+            token = self.refresh(force=False)
+        if self.background:
+            self._start()
+        return token['access_token']
+
+    def refresh(self, *, force: bool = True) -> Dict:
+        """
+        Fetch a new token, unless another thread or process already refreshed
+        it, and return the cache entry.
+
+        :param bool force: (optional) Fetch even if the cached token is not due
+               for refresh yet.
+        """
+        stale = self._token
+        with self._lock:
+            if self._token is not stale and self._token is not None:
+                # Another thread refreshed while this one waited.
+                return self._token
+            if not force:
+                token = self._read()
+                if token is not None and self.clock() < token['refresh_time']:
+                    self._token = token
+                    return token
+            with self._file_lock():
+                shared = self._read()
+                now = self.clock()
+                if shared is not None and now < shared['refresh_time'] and (
+                        not force or stale is None or shared['access_token'] != stale['access_token']):
+                    token = shared
+                else:
+                    response = self.fetch()
+                    self.fetches += 1
+                    now = self.clock()
+                    (issued, expiration) = token_expiration(response, now)
+                    token = {'access_token': response['access_token'], 'expiration': expiration,
+                             'refresh_time': issued + (expiration - issued) * self.refresh_fraction}
+                    self._write(token)
+            self._token = token
+            return token
+
+    def close(self) -> None:
+        """Stop the background refresh thread."""
+        self._stopped.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _usable(self, token: Dict, now: float) -> bool:
+        return now < token['expiration'] - self.expiry_skew
+
+    def _after_fork(self) -> None:
+        if self._pid != os.getpid():
+            # Only the forking thread survives a fork, so the child needs its
+            # own refresh thread and a lock another thread may have held. This
+            # runs before anything in the child takes the lock.
+            self._lock = threading.Lock()
+            self._thread = None
+            self._pid = os.getpid()
+
+    def _start(self) -> None:
+        if self._thread is None and not self._stopped.is_set():
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='token-refresh', daemon=True)
+                    self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            token = self._token
+            delay = max(token['refresh_time'] - self.clock(), 0.0) if token is not None else 0.0
+            if self._stopped.wait(delay):
+                return
+            try:
+                self.refresh(force=False)
+            except Exception:  # pylint: disable=broad-except
+                logger.warning('Background token refresh failed; retrying in %s seconds', self.retry_delay,
+                               exc_info=True)
+                if self._stopped.wait(self.retry_delay):
+                    return
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        if self.path is None or fcntl is None:
+            yield
+            return
+        with open(self.path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _read(self) -> Optional[Dict]:
+        if self.path is None:
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as cache_file:
+                token = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(token, dict) or not {'access_token', 'expiration', 'refresh_time'} <= set(token):
+            return None
+        return token if self._usable(token, self.clock()) else None
+
+    def _write(self, token: Dict) -> None:
+        if self.path is None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        # mkstemp creates the file readable by the owner only.
+        (handle, temp_path) = tempfile.mkstemp(dir=directory, prefix='.token-')
+        try:
+            with os.fdopen(handle, 'w', encoding='utf-8') as cache_file:
+                json.dump(token, cache_file)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+def default_cache_path(authenticator: Authenticator) -> str:
+    """
+    Return a cache file in the temporary directory that is specific to the
+    credentials and token endpoint of an authenticator.
+    """
+    token_manager = authenticator.token_manager
+    key = '\0'.join(str(getattr(token_manager, name, None)) for name in ('url', 'apikey', 'client_id', 'scope'))
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:24]
+    return os.path.join(tempfile.gettempdir(), 'ibm-security-advisor-token-{0}.json'.format(digest))
+
+
+class SharedTokenAuthenticator(Authenticator):
+    """
+    Authenticates requests with a token from a `SharedTokenCache`, fetched
+    with the token manager of the wrapped authenticator.
+
+    :attr Authenticator authenticator: The wrapped authenticator.
+    :attr SharedTokenCache cache: The token cache.
+    """
+
+    def __init__(self, authenticator: Authenticator, *, path: str = None, shared: bool = True,
+                 background: bool = True, refresh_fraction: float = DEFAULT_REFRESH_FRACTION) -> None:
+        """
+        :param Authenticator authenticator: An authenticator with a
+               `token_manager`, such as `IAMAuthenticator`.
+        :param str path: (optional) The cache file. Defaults to a file in the
+               temporary directory named after a hash of the credentials.
+        :param bool shared: (optional) Share tokens with other processes through
+               the cache file.
+        :param bool background: (optional) Refresh tokens on a background thread.
+        :param float refresh_fraction: (optional) The fraction of a token's
+               lifetime after which it is refreshed.
+        """
+        if authenticator is None:
+            raise ValueError('authenticator must be provided')
+        if getattr(authenticator, 'token_manager', None) is None:
+            raise ValueError('authenticator must have a token_manager')
+        self.authenticator = authenticator
+        if shared and path is None:
+            path = default_cache_path(authenticator)
+        self.cache = SharedTokenCache(authenticator.token_manager.request_token, path=path if shared else None,
+                                      background=background, refresh_fraction=refresh_fraction)
+
+    def authentication_type(self) -> str:
+        return self.authenticator.authentication_type()
+
+    def validate(self) -> None:
+        self.authenticator.validate()
+
+    def authenticate(self, req: dict) -> None:
+        """Add the bearer token to the `Authorization` header of a request."""
+        headers = req.get('headers')
+        headers['Authorization'] = 'Bearer {0}'.format(self.cache.get_token())
+
+    def close(self) -> None:
+        """Stop the background refresh thread."""
+        self.cache.close()
@@ -0,0 +1,268 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Transaction-Id propagation and a lightweight span recorder.
+
+Every request sent by `FindingsApiV1` or `NotificationsApiV1` carries a
+`Transaction-Id` header. An explicit `transaction_id` argument wins; otherwise
+the id of the enclosing `transaction()` block is used, and outside of one a
+fresh uuid4 is generated per request.
+
+`SpanRecorder` captures the call tree of a multi-call workflow. Each service
+call made inside a recorded span becomes a child span carrying the operation
+metrics, so the pages fetched, retries and fan-out of a bulk operation can be
+inspected afterwards:
+
+    recorder = SpanRecorder()
+    with recorder.span('export', account_id=account_id):
+        for page in pages:
+            findings_service.list_occurrences(account_id, provider_id, page_token=page)
+    print(recorder.spans[0].to_dict())
+
+Spans and transaction ids live in context variables, so they follow
+`contextvars.copy_context()` into worker threads.
+"""
+
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List
+
+TRANSACTION_ID_HEADER = 'Transaction-Id'
+
+_transaction_id = ContextVar('security_advisor_transaction_id', default=None)
+_current_span = ContextVar('security_advisor_span', default=None)
+
+
+def new_transaction_id() -> str:
+    """Return a new uuid4 transaction id."""
+    return str(uuid.uuid4())
+
+
+def get_transaction_id() -> str:
+    """Return the transaction id of the current context, or None."""
+    return _transaction_id.get()
+
+
+@contextmanager
+def transaction(transaction_id: str = None) -> Iterator[str]:
+    """
+    Send every request made in the block, by either client, with the same
+    `Transaction-Id`.
+
+    :param str transaction_id: (optional) The id to use. Defaults to the id of
+           the enclosing transaction, or a new uuid4.
+    """
+    if transaction_id is None:
+        transaction_id = _transaction_id.get() or new_transaction_id()
+    token = _transaction_id.set(transaction_id)
+    try:
+        yield transaction_id
+    finally:
+        _transaction_id.reset(token)
+
+
+def apply_transaction_id(headers) -> str:
+    """
+    Set the `Transaction-Id` header of a prepared request if the caller did not
+    supply one, and return the id the request will be sent with.
+    """
+    transaction_id = headers.get(TRANSACTION_ID_HEADER)
+    if not transaction_id:
+        transaction_id = _transaction_id.get() or new_transaction_id()
+        headers[TRANSACTION_ID_HEADER] = transaction_id
+    return transaction_id
+
+
+class Span():
+    """
+    A timed unit of work in a traced workflow.
+
+    :attr str name: The name of the span; the operation id for service calls.
+    :attr str transaction_id: The transaction id the span ran under.
+    :attr dict attributes: Key/value annotations.
+    :attr list events: `(offset, name, attributes)` tuples, where offset is
+          seconds since the span started.
+    :attr list children: The spans started while this one was current.
+    :attr float start_time: `time.perf_counter()` when the span started.
+    :attr float end_time: `time.perf_counter()` when the span ended, or None.
+    :attr Exception error: The exception that ended the span, if any.
+    """
+
+    __slots__ = ('name', 'transaction_id', 'attributes', 'events', 'children', 'start_time', 'end_time', 'error',
+                 '_lock')
+
+    def __init__(self, name: str, transaction_id: str = None, attributes: Dict = None) -> None:
+        self.name = name
+        self.transaction_id = transaction_id
+        self.attributes = dict(attributes or {})
+        self.events = []
+        self.children = []
+        self.start_time = time.perf_counter()
+        self.end_time = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    @property
+    def duration(self) -> float:
+        """Seconds the span ran for, or has been running for."""
+        end = self.end_time if self.end_time is not None else time.perf_counter()
+        return end - self.start_time
+
+    def child(self, name: str, attributes: Dict = None) -> 'Span':
+        """Start a span nested under this one."""
+        span = Span(name, _transaction_id.get() or self.transaction_id, attributes)
+        with self._lock:
+            self.children.append(span)
+        return span
+
+    def set_attribute(self, key: str, value) -> None:
+        """Annotate the span."""
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes) -> None:
+        """Record a point-in-time event, such as a retry, on the span."""
+        with self._lock:
+            self.events.append((time.perf_counter() - self.start_time, name, attributes))
+
+    def finish(self, error: Exception = None) -> None:
+        """End the span."""
+        self.end_time = time.perf_counter()
+        self.error = error
+
+    def walk(self) -> Iterator['Span']:
+        """Yield this span and all its descendants, depth first."""
+        yield self
+        for child in list(self.children):
+            yield from child.walk()
+
+    def find(self, name: str) -> List['Span']:
+        """Return this span and the descendants with the given name."""
+        return [span for span in self.walk() if span.name == name]
+
+    def to_dict(self) -> Dict:
+        """Return a dictionary representing the span tree."""
+        return {
+            'name': self.name,
+            'transaction_id': self.transaction_id,
+            'start_time': self.start_time,
+            'duration': self.duration,
+            'attributes': dict(self.attributes),
+            'events': [{'offset': offset, 'name': name, 'attributes': attributes}
+                       for (offset, name, attributes) in list(self.events)],
+            'error': type(self.error).__name__ if self.error is not None else None,
+            'children': [child.to_dict() for child in list(self.children)]
+        }
+
+    def __repr__(self) -> str:
+        return 'Span({0!r}, duration={1:.6f}, children={2})'.format(self.name, self.duration, len(self.children))
+
+
+def current_span() -> Span:
+    """Return the span of the current context, or None."""
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """
+    Start a child of the current span for the duration of the block. Outside
+    of a recorded span nothing is recorded and None is yielded.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    with _activate(parent.child(name, attributes)) as child:
+        yield child
+
+
+def add_event(name: str, **attributes) -> None:
+    """Record an event on the current span, if there is one."""
+    parent = _current_span.get()
+    if parent is not None:
+        parent.add_event(name, **attributes)
+
+
+@contextmanager
+def use_span(active: Span) -> Iterator[Span]:
+    """
+    Make `active` the current span for the block, without finishing it at the
+    end. Passing None clears the current span.
+    """
+    token = _current_span.set(active)
+    try:
+        yield active
+    finally:
+        _current_span.reset(token)
+
+
+@contextmanager
+def _activate(active: Span) -> Iterator[Span]:
+    with use_span(active):
+        try:
+            yield active
+        except BaseException as err:
+            active.finish(err)
+            raise
+        else:
+            active.finish()
+
+
+class SpanRecorder():
+    """
+    Records the span trees of traced workflows.
+
+    :attr list spans: The root spans recorded, in the order they started.
+    :attr int max_spans: The number of most recent root spans kept.
+    """
+
+    def __init__(self, max_spans: int = 100) -> None:
+        self.max_spans = max_spans
+        self.spans = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, *, transaction_id: str = None, **attributes) -> Iterator[Span]:
+        """
+        Trace the block. A root span runs under its own transaction, so every
+        request made in the block shares one `Transaction-Id`; inside another
+        span a child span is started instead.
+
+        :param str name: The name of the span.
+        :param str transaction_id: (optional) The transaction id of a root span.
+               Defaults to the id of the enclosing transaction, or a new uuid4.
+        """
+        parent = _current_span.get()
+        if parent is not None:
+            with _activate(parent.child(name, attributes)) as child:
+                yield child
+            return
+        with transaction(transaction_id) as root_transaction_id:
+            root = Span(name, root_transaction_id, attributes)
+            with self._lock:
+                self.spans.append(root)
+                del self.spans[:-self.max_spans]
+            with _activate(root):
+                yield root
+
+    def clear(self) -> None:
+        """Discard the recorded spans."""
+        with self._lock:
+            self.spans = []
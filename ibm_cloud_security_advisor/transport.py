@@ -0,0 +1,207 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module defines the transport interface used by the service clients to
+send prepared requests, and the request timeout and deadline of the current
+context.
+"""
+
+import asyncio
+import contextvars
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional
+
+import requests
+from ibm_cloud_sdk_core import BaseService, DetailedResponse
+
+_request_timeout = ContextVar('security_advisor_request_timeout', default=None)
+_deadline = ContextVar('security_advisor_deadline', default=None)
+
+
+@contextmanager
+def request_timeout(seconds: float) -> Iterator[float]:
+    """
+    Send every request made in the block with the given `timeout`, in seconds.
+    A timeout set on the client with `set_http_config` takes precedence; both
+    are capped by a `deadline`.
+    """
+    if seconds is not None and seconds <= 0:
+        raise ValueError('seconds must be positive')
+    token = _request_timeout.set(seconds)
+    try:
+        yield seconds
+    finally:
+        _request_timeout.reset(token)
+
+
+def get_request_timeout() -> float:
+    """Return the request timeout of the current context, or None."""
+    return _request_timeout.get()
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """Raised instead of sending a request once the deadline of the context has passed."""
+
+
+@contextmanager
+def deadline(seconds: float) -> Iterator[float]:
+    """
+    Give the requests made in the block, including those the SDK makes on
+    worker threads, a budget of `seconds` in total. Each request is sent with
+    the time left as its timeout, even if a longer one is set with
+    `request_timeout` or `set_http_config`, and requests made once it has run
+    out raise `DeadlineExceeded`. A nested deadline can only shorten the
+    enclosing one.
+
+    :return: The deadline, on the `time.monotonic` clock.
+    """
+    if seconds is None:
+        raise ValueError('seconds must be provided')
+    expires = time.monotonic() + seconds
+    enclosing = _deadline.get()
+    if enclosing is not None:
+        expires = min(expires, enclosing)
+    token = _deadline.set(expires)
+    try:
+        yield expires
+    finally:
+        _deadline.reset(token)
+
+
+def get_deadline() -> Optional[float]:
+    """Return the deadline of the current context on the `time.monotonic` clock, or None."""
+    return _deadline.get()
+
+
+def remaining_time() -> Optional[float]:
+    """Return the seconds left before the deadline of the current context, or None."""
+    expires = _deadline.get()
+    return expires - time.monotonic() if expires is not None else None
+
+
+def budget_timeout(timeout):
+    """
+    Return `timeout`, a number of seconds or a `(connect, read)` tuple, capped
+    by the time left before the deadline of the current context.
+
+    :raises DeadlineExceeded: If the deadline has passed.
+    """
+    remaining = remaining_time()
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise DeadlineExceeded('The deadline passed {0:.3f}s ago'.format(-remaining))
+    if timeout is None:
+        return remaining
+    if isinstance(timeout, tuple):
+        return tuple(min(part, remaining) if part is not None else remaining for part in timeout)
+    return min(timeout, remaining)
+
+
+async def run_in_executor(func: Callable, *args, executor=None, **kwargs):
+    """
+    Run a blocking call, such as a client method, on an executor in a copy of
+    the current context, so that the request timeout and deadline of the
+    calling coroutine apply to it. The coroutine stops waiting with
+    `DeadlineExceeded` when the deadline passes.
+    """
+    loop = asyncio.get_event_loop()
+    future = loop.run_in_executor(executor, functools.partial(contextvars.copy_context().run, func, *args, **kwargs))
+    remaining = remaining_time()
+    if remaining is None:
+        return await future
+    try:
+        return await asyncio.wait_for(future, max(remaining, 0.0))
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded('The deadline passed while waiting for {0}'.format(
+            getattr(func, '__name__', func))) from None
+
+
+class _HttpConfigView():
+    # Lets BaseService.send, which gives the client's http_config precedence
+    # over its arguments, run with a different http_config.
+
+    def __init__(self, service: BaseService, http_config: dict) -> None:
+        self._service = service
+        self.http_config = http_config
+
+    def __getattr__(self, name: str):
+        return getattr(self._service, name)
+
+
+class Transport():
+    """
+    Sends a prepared request on behalf of a service client.
+
+    The service clients build a request dictionary with `prepare_request` and
+    hand it to their transport together with the `operation_id` of the calling
+    method. A transport returns a `DetailedResponse` for 2xx responses and
+    raises `ApiException` otherwise, exactly like `BaseService.send`.
+    """
+
+    def send(self, service: BaseService, request: dict, *, operation_id: str = None, **kwargs) -> DetailedResponse:
+        """
+        Send a request and return the response.
+
+        :param BaseService service: The client the request was prepared by.
+        :param dict request: The request built by `prepare_request`.
+        :param str operation_id: (optional) The operation being invoked, for
+               example `list_occurrences`.
+        :return: A `DetailedResponse` containing the result, headers and HTTP status code.
+        :rtype: DetailedResponse
+        """
+        raise NotImplementedError()
+
+    def close(self) -> None:
+        """Release any resources held by this transport."""
+
+
+class RequestsTransport(Transport):
+    """
+    The default transport, which sends requests over HTTP through the client's
+    `requests` session.
+    """
+
+    def send(self, service: BaseService, request: dict, *, operation_id: str = None, **kwargs) -> DetailedResponse:
+        configured = (getattr(service, 'http_config', None) or {}).get('timeout')
+        if configured is not None and _deadline.get() is not None:
+            service = _HttpConfigView(service, dict(service.http_config, timeout=budget_timeout(configured)))
+        return BaseService.send(service, request, **kwargs)
+
+
+class TransportWrapper(Transport):
+    """
+    Base class for transports that add behaviour around another transport.
+
+    :attr Transport transport: The wrapped transport.
+    """
+
+    def __init__(self, transport: Transport = None) -> None:
+        """
+        :param Transport transport: (optional) The transport to wrap. Defaults
+               to a `RequestsTransport`.
+        """
+        self.transport = transport if transport is not None else RequestsTransport()
+
+    def send(self, service: BaseService, request: dict, *, operation_id: str = None, **kwargs) -> DetailedResponse:
+        return self.transport.send(service, request, operation_id=operation_id, **kwargs)
+
+    def close(self) -> None:
+        self.transport.close()
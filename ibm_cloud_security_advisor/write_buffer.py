@@ -0,0 +1,267 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+A write-behind buffer for occurrences.
+
+`OccurrenceBuffer` collects occurrences in memory and writes them with
+`FindingsApiV1.create_occurrences`. Occurrences with the same provider_id and
+id replace each other until they are written, so an occurrence reported many
+times between two flushes costs one request. The number of pending
+occurrences is capped, so a stalled service cannot exhaust memory.
+
+    with OccurrenceBuffer(findings_service, account_id) as buffer:
+        for detection in detections:
+            buffer.add(provider_id, detection)
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List
+
+from .bulk import DEFAULT_MAX_WORKERS, BulkResult
+from .sdk_logging import logger
+from .spill_queue import is_permanent_failure, occurrence_key
+
+DEFAULT_BUFFER_SIZE = 500
+DEFAULT_FLUSH_INTERVAL = 5.0
+DEFAULT_MAX_WAIT = 30.0
+
+
+class BufferFullError(RuntimeError):
+    """
+    Raised by `OccurrenceBuffer.add` when `max_pending` occurrences are waiting
+    to be written and none was written within `max_wait` seconds.
+    """
+
+
+class OccurrenceBuffer():
+    """
+    Coalesces occurrences by `(provider_id, id)`, last write wins, and writes
+    them when `max_size` distinct occurrences are pending or every
+    `flush_interval` seconds.
+
+    Flushes are serialized, so the writes of an occurrence reach the service in
+    the order they were added. Occurrences are written with
+    `replace_if_exists`, so a later flush updates an occurrence written by an
+    earlier one.
+
+    At most `max_pending` occurrences are held, counting those being written.
+    Beyond that, `add` appends new occurrences to the spill queue if there is
+    one, and otherwise blocks until a flush makes room. Once an occurrence has
+    been appended to the spill queue, its later versions are appended there
+    too, so they are not written ahead of it. This includes occurrences
+    already in the queue when the buffer is created, for example by a previous
+    process.
+
+    :attr int added: The number of occurrences added.
+    :attr int coalesced: The number of occurrences replaced by a later one
+          before they were written.
+    :attr int written: The number of occurrences written.
+    :attr int failed: The number of occurrences whose write failed.
+    :attr int spilled: The number of occurrences appended to the spill
+          queue.
+    """
+
+    def __init__(self, service, account_id: str, *, max_size: int = DEFAULT_BUFFER_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL, max_workers: int = DEFAULT_MAX_WORKERS,
+                 on_error: Callable[[BulkResult], None] = None, spill=None, max_pending: int = None,
+                 max_wait: float = DEFAULT_MAX_WAIT) -> None:
+        """
+        :param FindingsApiV1 service: The client used to write.
+        :param str account_id: Account ID.
+        :param int max_size: (optional) The number of distinct pending
+               occurrences that triggers a flush.
+        :param float flush_interval: (optional) Seconds between timed flushes;
+               None flushes only on size or when asked.
+        :param int max_workers: (optional) The maximum number of concurrent
+               requests of a flush.
+        :param Callable on_error: (optional) Called with the `BulkResult` of
+               each failed write. By default failures are logged.
+        :param SpillQueue spill: (optional) A durable queue to which occurrences
+               whose write failed transiently are appended, to be written later
+               with `spill_queue.drain_occurrences`. Occurrences added while
+               the buffer is full are appended to it as well.
+        :param int max_pending: (optional) The maximum number of occurrences
+               pending or being written. Defaults to ten times `max_size`.
+        :param float max_wait: (optional) Seconds `add` waits for room when the
+               buffer is full and there is no spill queue, before raising
+               `BufferFullError`; None waits indefinitely.
+        """
+        if service is None:
+            raise ValueError('service must be provided')
+        if account_id is None:
+            raise ValueError('account_id must be provided')
+        if max_size is None or max_size < 1:
+            raise ValueError('max_size must be at least 1')
+        if max_pending is None:
+            max_pending = max_size * 10
+        if max_pending < max_size:
+            raise ValueError('max_pending must be at least max_size')
+        if flush_interval is not None and flush_interval <= 0:
+            raise ValueError('flush_interval must be positive')
+        self.service = service
+        self.account_id = account_id
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.max_workers = max_workers
+        self.on_error = on_error
+        self.spill = spill
+        self.max_pending = max_pending
+        self.max_wait = max_wait
+        self.added = 0
+        self.coalesced = 0
+        self.written = 0
+        self.failed = 0
+        self.spilled = 0
+        self._pending = OrderedDict()
+        # Reads the segments of the queue.
+        self._spilled_keys = spill.keys(occurrence_key) if spill is not None else set()
+        self._writing = 0
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='occurrence-buffer', daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> 'OccurrenceBuffer':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        """The number of distinct occurrences waiting to be written."""
+        with self._condition:
+            return len(self._pending)
+
+    def add(self, provider_id: str, occurrence: Dict) -> None:
+        """
+        Add an occurrence, replacing a pending one with the same provider_id
+        and id. When the buffer is full or an earlier version was spilled,
+        the occurrence is appended to the spill queue; without one, `add` waits
+        up to `max_wait` seconds for room.
+
+        :param str provider_id: The provider of the occurrence.
+        :param dict occurrence: The arguments of `create_occurrence`, without
+               `account_id` and `provider_id`.
+        :raises BufferFullError: The buffer stayed full for `max_wait` seconds.
+        """
+        if provider_id is None:
+            raise ValueError('provider_id must be provided')
+        if occurrence is None or occurrence.get('id') is None:
+            raise ValueError('occurrence id must be provided')
+        key = (provider_id, occurrence['id'])
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('the buffer is closed')
+            overflow = key in self._spilled_keys or (key not in self._pending and not self._has_room())
+            if overflow and self.spill is None:
+                if not self._condition.wait_for(lambda: self._closed or self._has_room(), timeout=self.max_wait):
+                    raise BufferFullError('{0} occurrences are waiting to be written'.format(self.max_pending))
+                if self._closed:
+                    raise RuntimeError('the buffer is closed')
+                overflow = False
+            self.added += 1
+            if not overflow:
+                if self._pending.pop(key, None) is not None:
+                    self.coalesced += 1
+                self._pending[key] = dict(occurrence)
+                if len(self._pending) >= self.max_size:
+                    self._condition.notify_all()
+                return
+            # Appended under the lock, so versions of an occurrence are queued
+            # in the order they were added.
+            self.spill.put(dict(occurrence, provider_id=provider_id))
+            self._spilled_keys.add(key)
+            self.spilled += 1
+
+    def flush(self) -> List[BulkResult]:
+        """
+        Write the pending occurrences now and wait for the writes.
+
+        :return: One result per occurrence written.
+        :rtype: List[BulkResult]
+        """
+        with self._flush_lock:
+            with self._condition:
+                (batch, self._pending) = (self._pending, OrderedDict())
+                self._writing = len(batch)
+            if not batch:
+                return []
+            occurrences = [dict(occurrence, provider_id=provider_id)
+                           for ((provider_id, _), occurrence) in batch.items()]
+            try:
+                results = self.service.create_occurrences(self.account_id, occurrences, replace_if_exists=True,
+                                                          max_workers=self.max_workers)
+            finally:
+                with self._condition:
+                    self._writing = 0
+                    self._condition.notify_all()
+            spilled = []
+            for result in results:
+                if result.ok:
+                    self.written += 1
+                    continue
+                self.failed += 1
+                if self.spill is not None and not is_permanent_failure(result.error):
+                    spilled.append(result.item)
+                elif self.on_error is not None:
+                    self.on_error(result)
+                else:
+                    logger.warning('Failed to write occurrence %s: %s', result.item.get('id'), result.error)
+            if spilled:
+                with self._condition:
+                    # Versions added during the write follow the failed ones
+                    # into the queue.
+                    keys = {(item['provider_id'], item['id']) for item in spilled}
+                    spilled += [dict(self._pending.pop(key), provider_id=key[0])
+                                for key in list(self._pending) if key in keys]
+                    self.spill.put_many(spilled)
+                    self._spilled_keys |= keys
+                    self.spilled += len(spilled)
+                    self._condition.notify_all()
+            return results
+
+    def close(self) -> List[BulkResult]:
+        """
+        Stop the timed flushes and write the pending occurrences. Occurrences
+        can no longer be added.
+
+        :return: The results of the final flush.
+        :rtype: List[BulkResult]
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        return self.flush()
+
+    def _has_room(self) -> bool:
+        return len(self._pending) + self._writing < self.max_pending
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._closed or len(self._pending) >= self.max_size,
+                                         timeout=self.flush_interval)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception:  # pylint: disable=broad-except
+                logger.warning('Occurrence buffer flush failed', exc_info=True)
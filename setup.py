@@ -47,6 +47,7 @@ setup(
     url="https://github.com/ibm-cloud-security/security-advisor-sdk-python/",
     keywords=["Swagger", "Findings API", "Notifications API"],
     install_requires=REQUIRES,
+    python_requires='>=3.7',
     packages=find_packages(),
     include_package_data=True,
     long_description_content_type='text/markdown',
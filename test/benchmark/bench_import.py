@@ -0,0 +1,44 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark the cold import of the package in a fresh interpreter
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+
+def run_python(code):
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_import_package(benchmark):
+    benchmark.pedantic(run_python, args=('import ibm_cloud_security_advisor',), rounds=10, iterations=1)
+
+
+def test_import_findings_client(benchmark):
+    benchmark.pedantic(run_python, args=('from ibm_cloud_security_advisor import FindingsApiV1',), rounds=10,
+                       iterations=1)
+
+
+def test_interpreter_startup(benchmark):
+    """The baseline the import benchmarks include."""
+    benchmark.pedantic(run_python, args=('pass',), rounds=10, iterations=1)
@@ -0,0 +1,53 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark model deserialization and serialization
+"""
+
+import inspect
+
+import pytest
+
+from ibm_cloud_security_advisor import findings_api_v1, notifications_api_v1
+
+from samples import FINDINGS_MODELS, NOTIFICATIONS_MODELS
+
+pytest.importorskip('pytest_benchmark')
+
+MODELS = [(findings_api_v1, name, payload) for (name, payload) in sorted(FINDINGS_MODELS.items())] + \
+         [(notifications_api_v1, name, payload) for (name, payload) in sorted(NOTIFICATIONS_MODELS.items())]
+MODEL_IDS = ['{0}.{1}'.format(module.__name__.split('.')[-1], name) for (module, name, _) in MODELS]
+
+
+def test_every_model_has_a_sample():
+    for (module, samples) in ((findings_api_v1, FINDINGS_MODELS), (notifications_api_v1, NOTIFICATIONS_MODELS)):
+        models = {name for (name, cls) in inspect.getmembers(module, inspect.isclass)
+                  if cls.__module__ == module.__name__ and hasattr(cls, 'from_dict')}
+        assert models == set(samples)
+
+
+@pytest.mark.parametrize('module,name,payload', MODELS, ids=MODEL_IDS)
+def test_from_dict(benchmark, module, name, payload):
+    benchmark.group = 'from_dict'
+    benchmark(getattr(module, name).from_dict, payload)
+
+
+@pytest.mark.parametrize('module,name,payload', MODELS, ids=MODEL_IDS)
+def test_to_dict(benchmark, module, name, payload):
+    benchmark.group = 'to_dict'
+    model = getattr(module, name).from_dict(payload)
+    benchmark(model.to_dict)
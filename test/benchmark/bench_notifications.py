@@ -0,0 +1,61 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark decoding and verification of notification payloads, in messages per
+second on a single node
+"""
+
+import json
+import os
+
+import pytest
+
+from ibm_cloud_security_advisor.notification_receiver import NotificationReceiver
+
+from samples import ACCOUNT_ID
+
+pytest.importorskip('pytest_benchmark')
+jwt = pytest.importorskip('jwt')
+rsa = pytest.importorskip('cryptography.hazmat.primitives.asymmetric.rsa')
+serialization = pytest.importorskip('cryptography.hazmat.primitives.serialization')
+
+MESSAGES = 2000
+
+
+@pytest.fixture(scope='module')
+def signed_payloads():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.public_key().public_bytes(serialization.Encoding.PEM,
+                                                serialization.PublicFormat.SubjectPublicKeyInfo).decode('utf-8')
+    payloads = [json.dumps({'data': jwt.encode({'id': 'finding{0}'.format(i), 'severity': 'HIGH',
+                                                'provider_name': 'VA', 'account_id': ACCOUNT_ID},
+                                               private_key, algorithm='RS256')}) for i in range(MESSAGES)]
+    return (pem, payloads)
+
+
+@pytest.mark.parametrize('processes', [0, os.cpu_count() or 1])
+def test_decode_throughput(benchmark, backend, notifications, signed_payloads, processes):
+    benchmark.group = 'notification_decode'
+    (pem, payloads) = signed_payloads
+    backend.public_key = pem
+    with NotificationReceiver(notifications, ACCOUNT_ID, processes=processes) as receiver:
+        # start the pool outside of the measurement
+        list(receiver.iter_events(payloads[:receiver.chunk_size]))
+        events = benchmark.pedantic(lambda: list(receiver.iter_events(payloads)), rounds=3)
+    assert len(events) == MESSAGES
+    if benchmark.stats:
+        benchmark.extra_info['messages_per_second'] = MESSAGES / benchmark.stats.stats.mean
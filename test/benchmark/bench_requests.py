@@ -0,0 +1,77 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark building the request for every operation, without sending it
+"""
+
+import pytest
+
+from samples import ACCOUNT_ID, API_NOTE, API_OCCURRENCE, CHANNEL, PROVIDER_ID
+
+pytest.importorskip('pytest_benchmark')
+
+NOTE_ARGS = dict((k, v) for (k, v) in API_NOTE.items() if k not in ('create_time', 'update_time'))
+OCCURRENCE_ARGS = dict((k, v) for (k, v) in API_OCCURRENCE.items() if k not in ('create_time', 'update_time'))
+CHANNEL_ARGS = {
+    'name': CHANNEL['name'],
+    'type': CHANNEL['type'],
+    'endpoint': CHANNEL['endpoint'],
+    'description': CHANNEL['description'],
+    'severity': ['critical', 'high'],
+    'enabled': True,
+    'alert_source': CHANNEL['alert_source']
+}
+
+FINDINGS_OPERATIONS = {
+    'post_graph': lambda s: s.post_graph(ACCOUNT_ID, '{occurrences {id}}', content_type='application/graphql'),
+    'create_note': lambda s: s.create_note(ACCOUNT_ID, PROVIDER_ID, **NOTE_ARGS),
+    'list_notes': lambda s: s.list_notes(ACCOUNT_ID, PROVIDER_ID, page_size=100),
+    'get_note': lambda s: s.get_note(ACCOUNT_ID, PROVIDER_ID, 'note1'),
+    'update_note': lambda s: s.update_note(ACCOUNT_ID, PROVIDER_ID, 'note1', **NOTE_ARGS),
+    'delete_note': lambda s: s.delete_note(ACCOUNT_ID, PROVIDER_ID, 'note1'),
+    'get_occurrence_note': lambda s: s.get_occurrence_note(ACCOUNT_ID, PROVIDER_ID, 'occurrence1'),
+    'create_occurrence': lambda s: s.create_occurrence(ACCOUNT_ID, PROVIDER_ID, **OCCURRENCE_ARGS),
+    'list_occurrences': lambda s: s.list_occurrences(ACCOUNT_ID, PROVIDER_ID, page_size=100),
+    'list_note_occurrences': lambda s: s.list_note_occurrences(ACCOUNT_ID, PROVIDER_ID, 'note1', page_size=100),
+    'get_occurrence': lambda s: s.get_occurrence(ACCOUNT_ID, PROVIDER_ID, 'occurrence1'),
+    'update_occurrence': lambda s: s.update_occurrence(ACCOUNT_ID, PROVIDER_ID, 'occurrence1', **OCCURRENCE_ARGS),
+    'delete_occurrence': lambda s: s.delete_occurrence(ACCOUNT_ID, PROVIDER_ID, 'occurrence1'),
+    'list_providers': lambda s: s.list_providers(ACCOUNT_ID, limit=100, skip=0),
+}
+
+NOTIFICATIONS_OPERATIONS = {
+    'list_all_channels': lambda s: s.list_all_channels(ACCOUNT_ID, limit=100, skip=0),
+    'create_notification_channel': lambda s: s.create_notification_channel(ACCOUNT_ID, **CHANNEL_ARGS),
+    'delete_notification_channels': lambda s: s.delete_notification_channels(ACCOUNT_ID, ['channel1', 'channel2']),
+    'delete_notification_channel': lambda s: s.delete_notification_channel(ACCOUNT_ID, 'channel1'),
+    'get_notification_channel': lambda s: s.get_notification_channel(ACCOUNT_ID, 'channel1'),
+    'update_notification_channel': lambda s: s.update_notification_channel(ACCOUNT_ID, 'channel1', **CHANNEL_ARGS),
+    'test_notification_channel': lambda s: s.test_notification_channel(ACCOUNT_ID, 'channel1'),
+    'get_public_key': lambda s: s.get_public_key(ACCOUNT_ID),
+}
+
+
+@pytest.mark.parametrize('operation', sorted(FINDINGS_OPERATIONS))
+def test_findings_prepare_request(benchmark, null_findings, operation):
+    benchmark.group = 'prepare_request'
+    benchmark(FINDINGS_OPERATIONS[operation], null_findings)
+
+
+@pytest.mark.parametrize('operation', sorted(NOTIFICATIONS_OPERATIONS))
+def test_notifications_prepare_request(benchmark, null_notifications, operation):
+    benchmark.group = 'prepare_request'
+    benchmark(NOTIFICATIONS_OPERATIONS[operation], null_notifications)
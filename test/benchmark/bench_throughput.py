@@ -0,0 +1,104 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark paginated listing and bulk creation against the in-process mock backend
+"""
+
+import itertools
+
+import pytest
+
+from ibm_cloud_security_advisor.findings_api_v1 import ApiListOccurrencesResponse
+from ibm_cloud_security_advisor.notifications_api_v1 import ChannelsList
+
+from samples import ACCOUNT_ID, API_OCCURRENCE, CHANNEL, PROVIDER_ID
+
+pytest.importorskip('pytest_benchmark')
+
+TOTAL = 1000
+PAGE_SIZE = 100
+BULK_SIZE = 100
+
+
+def list_all_occurrences(findings):
+    occurrences = []
+    page_token = None
+    while True:
+        result = findings.list_occurrences(ACCOUNT_ID, PROVIDER_ID, page_size=PAGE_SIZE, page_token=page_token).get_result()
+        page = ApiListOccurrencesResponse.from_dict(result)
+        occurrences.extend(page.occurrences)
+        page_token = page.next_page_token
+        if not page_token:
+            return occurrences
+
+
+def list_all_channels(notifications):
+    channels = []
+    for skip in itertools.count(0, PAGE_SIZE):
+        page = ChannelsList.from_dict(notifications.list_all_channels(ACCOUNT_ID, limit=PAGE_SIZE, skip=skip).get_result())
+        channels.extend(page.channels)
+        if len(page.channels) < PAGE_SIZE:
+            return channels
+
+
+def test_list_occurrences_throughput(benchmark, backend, findings):
+    benchmark.group = 'pagination'
+    backend.add_occurrences(ACCOUNT_ID, PROVIDER_ID,
+                            [dict(API_OCCURRENCE, id='occurrence{0}'.format(i)) for i in range(TOTAL)])
+    occurrences = benchmark(list_all_occurrences, findings)
+    assert len(occurrences) == TOTAL
+
+
+def test_list_all_channels_throughput(benchmark, backend, notifications):
+    benchmark.group = 'pagination'
+    backend.add_channels(ACCOUNT_ID, [dict(CHANNEL, channel_id='channel{0}'.format(i)) for i in range(TOTAL)])
+    channels = benchmark(list_all_channels, notifications)
+    assert len(channels) == TOTAL
+
+
+def test_create_occurrences_throughput(benchmark, findings):
+    benchmark.group = 'bulk_create'
+    args = dict((k, v) for (k, v) in API_OCCURRENCE.items() if k not in ('id', 'create_time', 'update_time'))
+    counter = itertools.count()
+
+    def create_batch():
+        for _ in range(BULK_SIZE):
+            findings.create_occurrence(ACCOUNT_ID, PROVIDER_ID, id='occurrence{0}'.format(next(counter)), **args)
+
+    benchmark(create_batch)
+
+
+def test_create_channels_throughput(benchmark, notifications):
+    benchmark.group = 'bulk_create'
+
+    def create_batch():
+        for i in range(BULK_SIZE):
+            notifications.create_notification_channel(ACCOUNT_ID, 'channel{0}'.format(i), 'Webhook', CHANNEL['endpoint'],
+                                                      severity=['high'], alert_source=CHANNEL['alert_source'])
+
+    benchmark(create_batch)
+
+
+@pytest.mark.parametrize('max_workers', [1, 8])
+def test_create_notification_channels_with_latency(benchmark, backend, notifications, max_workers):
+    benchmark.group = 'bulk_create_latency'
+    backend.latency = {'create_notification_channel': 0.002}
+    channels = [{'name': 'channel{0}'.format(i), 'type': 'Webhook', 'endpoint': CHANNEL['endpoint'],
+                 'severity': ['high']} for i in range(BULK_SIZE)]
+    results = benchmark.pedantic(notifications.create_notification_channels, args=(ACCOUNT_ID, channels),
+                                 kwargs={'max_workers': max_workers}, rounds=3)
+    assert all(result.ok for result in results)
@@ -0,0 +1,67 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Fixtures shared by the benchmark suite.
+
+The benchmarks live in `bench_*.py` files so they are not collected by a plain
+`pytest` run. Run them with:
+
+    python -m pytest test/benchmark -o python_files='bench_*.py' --benchmark-autosave --benchmark-compare
+
+Results are saved under `.benchmarks/`, and each run is compared with the last
+saved one so regressions are visible over time.
+"""
+
+import pytest
+from ibm_cloud_sdk_core import DetailedResponse
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import FindingsApiV1, NotificationsApiV1
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+from ibm_cloud_security_advisor.transport import Transport
+
+
+class NullTransport(Transport):
+    """Transport that drops every request, so only request building is measured."""
+
+    def send(self, service, request, *, operation_id=None, **kwargs):
+        return DetailedResponse(response={}, status_code=200)
+
+
+@pytest.fixture
+def backend():
+    return MockBackend()
+
+
+@pytest.fixture
+def findings(backend):
+    return FindingsApiV1(NoAuthAuthenticator(), transport=MockTransport(backend))
+
+
+@pytest.fixture
+def notifications(backend):
+    return NotificationsApiV1(NoAuthAuthenticator(), transport=MockTransport(backend))
+
+
+@pytest.fixture
+def null_findings():
+    return FindingsApiV1(NoAuthAuthenticator(), transport=NullTransport())
+
+
+@pytest.fixture
+def null_notifications():
+    return NotificationsApiV1(NoAuthAuthenticator(), transport=NullTransport())
@@ -0,0 +1,159 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Representative JSON payloads for every model in the service modules
+"""
+
+ACCOUNT_ID = 'bench-account'
+PROVIDER_ID = 'bench-provider'
+NOTE_NAME = '{0}/providers/{1}/notes/note1'.format(ACCOUNT_ID, PROVIDER_ID)
+
+REPORTER = {'id': 'reporter1', 'title': 'Bench reporter', 'url': 'https://example.com'}
+REMEDIATION_STEP = {'title': 'Rotate the key', 'url': 'https://example.com/fix'}
+SOCKET_ADDRESS = {'address': '10.0.0.1', 'port': 443}
+NETWORK_CONNECTION = {'direction': 'INBOUND', 'protocol': 'TCP', 'client': SOCKET_ADDRESS, 'server': SOCKET_ADDRESS}
+DATA_TRANSFERRED = {'client_bytes': 1024, 'server_bytes': 2048, 'client_packets': 10, 'server_packets': 20}
+CONTEXT = {
+    'region': 'us-south',
+    'resource_crn': 'crn:v1:bluemix:public:containers-kubernetes:us-south:a/abc::cluster:c1',
+    'resource_id': 'c1',
+    'resource_name': 'cluster-1',
+    'resource_type': 'Cluster',
+    'service_crn': 'crn:v1:bluemix:public:containers-kubernetes:us-south:a/abc::',
+    'service_name': 'Kubernetes Cluster',
+    'environment_name': 'production',
+    'component_name': 'ingress',
+    'toolchain_id': 'toolchain1'
+}
+FINDING = {
+    'severity': 'HIGH',
+    'certainty': 'MEDIUM',
+    'next_steps': [REMEDIATION_STEP, REMEDIATION_STEP],
+    'network_connection': NETWORK_CONNECTION,
+    'data_transferred': DATA_TRANSFERRED
+}
+FINDING_TYPE = {'severity': 'HIGH', 'next_steps': [REMEDIATION_STEP]}
+KPI = {'value': 42.0, 'total': 100.0}
+KPI_TYPE = {'aggregation_type': 'SUM'}
+VALUE_TYPE = {'kind': 'KPI', 'text': 'Scanned'}
+FINDING_COUNT_VALUE_TYPE = {'kind': 'FINDING_COUNT', 'finding_note_names': [NOTE_NAME], 'text': 'Findings'}
+NUMERIC_CARD_ELEMENT = {'kind': 'NUMERIC', 'default_time_range': '1d', 'text': 'Findings', 'value_type': FINDING_COUNT_VALUE_TYPE}
+BREAKDOWN_CARD_ELEMENT = {'kind': 'BREAKDOWN', 'default_time_range': '1d', 'text': 'By kind', 'value_types': [VALUE_TYPE]}
+TIME_SERIES_CARD_ELEMENT = {'kind': 'TIME_SERIES', 'default_time_range': '4d', 'text': 'Over time',
+                            'default_interval': 'd', 'value_types': [FINDING_COUNT_VALUE_TYPE]}
+# CardElement does not dispatch on `kind`, so cards carry only the base fields.
+CARD_ELEMENT = {'kind': 'NUMERIC', 'default_time_range': '1d'}
+CARD = {
+    'section': 'My Security Tools',
+    'title': 'My Security Tool Findings',
+    'subtitle': 'My Security Tool',
+    'order': 1,
+    'finding_note_names': [NOTE_NAME],
+    'requires_configuration': False,
+    'badge_text': 'badge',
+    'badge_image': 'image',
+    'elements': [CARD_ELEMENT]
+}
+SECTION = {'title': 'Section', 'image': 'image'}
+RELATED_URL = {'label': 'docs', 'url': 'https://example.com/docs'}
+API_NOTE = {
+    'short_description': 'Bench note',
+    'long_description': 'A note used by the benchmark suite',
+    'kind': 'FINDING',
+    'related_url': [RELATED_URL],
+    'create_time': '2021-01-01T00:00:00Z',
+    'update_time': '2021-01-02T00:00:00Z',
+    'id': 'note1',
+    'shared': True,
+    'reported_by': REPORTER,
+    'finding': FINDING_TYPE
+}
+API_OCCURRENCE = {
+    'resource_url': 'https://example.com/resource',
+    'note_name': NOTE_NAME,
+    'kind': 'FINDING',
+    'remediation': 'Rotate the key',
+    'create_time': '2021-01-01T00:00:00Z',
+    'update_time': '2021-01-02T00:00:00Z',
+    'id': 'occurrence1',
+    'context': CONTEXT,
+    'finding': FINDING
+}
+API_PROVIDER = {'name': PROVIDER_ID, 'id': PROVIDER_ID}
+
+CHANNEL_SEVERITY = {'critical': True, 'high': True, 'medium': False, 'low': False}
+CHANNEL_ALERT_SOURCE_ITEM = {'provider_name': 'VA', 'finding_types': ['ALL']}
+CHANNEL = {
+    'channel_id': 'channel1',
+    'name': 'bench channel',
+    'description': 'A channel used by the benchmark suite',
+    'type': 'Webhook',
+    'severity': CHANNEL_SEVERITY,
+    'endpoint': 'https://example.com/hook',
+    'enabled': True,
+    'alert_source': [CHANNEL_ALERT_SOURCE_ITEM, {'provider_name': 'CERT', 'finding_types': ['expired_cert']}],
+    'frequency': 'daily'
+}
+
+FINDINGS_MODELS = {
+    'ApiListNoteOccurrencesResponse': {'occurrences': [API_OCCURRENCE] * 10, 'next_page_token': '10'},
+    'ApiListNotesResponse': {'notes': [API_NOTE] * 10, 'next_page_token': '10'},
+    'ApiListOccurrencesResponse': {'occurrences': [API_OCCURRENCE] * 10, 'next_page_token': '10'},
+    'ApiListProvidersResponse': {'providers': [API_PROVIDER] * 10},
+    'ApiNote': dict(API_NOTE, kpi=KPI_TYPE, card=CARD, section=SECTION),
+    'ApiNoteKind': {},
+    'ApiNoteRelatedUrl': RELATED_URL,
+    'ApiOccurrence': dict(API_OCCURRENCE, kpi=KPI),
+    'ApiProvider': API_PROVIDER,
+    'BreakdownCardElement': BREAKDOWN_CARD_ELEMENT,
+    'Card': CARD,
+    'CardElement': CARD_ELEMENT,
+    'Certainty': {},
+    'Context': CONTEXT,
+    'DataTransferred': DATA_TRANSFERRED,
+    'Finding': FINDING,
+    'FindingCountValueType': FINDING_COUNT_VALUE_TYPE,
+    'FindingType': FINDING_TYPE,
+    'Kpi': KPI,
+    'KpiType': KPI_TYPE,
+    'NetworkConnection': NETWORK_CONNECTION,
+    'NumericCardElement': NUMERIC_CARD_ELEMENT,
+    'RemediationStep': REMEDIATION_STEP,
+    'Reporter': REPORTER,
+    'Section': SECTION,
+    'Severity': {},
+    'SocketAddress': SOCKET_ADDRESS,
+    'TimeSeriesCardElement': TIME_SERIES_CARD_ELEMENT,
+    'ValueType': VALUE_TYPE,
+}
+
+NOTIFICATIONS_MODELS = {
+    'Channel': CHANNEL,
+    'ChannelAlertSourceItem': CHANNEL_ALERT_SOURCE_ITEM,
+    'ChannelDelete': {'channel_id': 'channel1', 'message': 'success'},
+    'ChannelGet': {'channel': CHANNEL},
+    'ChannelGetChannel': CHANNEL,
+    'ChannelGetChannelAlertSourceItem': CHANNEL_ALERT_SOURCE_ITEM,
+    'ChannelGetChannelSeverity': CHANNEL_SEVERITY,
+    'ChannelInfo': {'channel_id': 'channel1', 'status_code': 200},
+    'ChannelSeverity': CHANNEL_SEVERITY,
+    'ChannelsDelete': {'message': 'success'},
+    'ChannelsList': {'channels': [CHANNEL] * 10},
+    'NotificationChannelAlertSourceItem': CHANNEL_ALERT_SOURCE_ITEM,
+    'PublicKeyGet': {'public_key': '-----BEGIN PUBLIC KEY-----\nMIIB\n-----END PUBLIC KEY-----\n'},
+    'TestChannel': {'test': 'success'},
+}
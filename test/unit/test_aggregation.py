@@ -0,0 +1,123 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the occurrence aggregates
+"""
+
+import json
+import unittest
+
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import FindingsApiV1
+from ibm_cloud_security_advisor.aggregation import FindingAggregate, HyperLogLog
+from ibm_cloud_security_advisor.bulk import run_bulk
+from ibm_cloud_security_advisor.findings_api_v1 import ApiOccurrence
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+
+ACCOUNT_ID = 'account1'
+SEVERITIES = ('LOW', 'MEDIUM', 'HIGH', 'CRITICAL')
+
+
+def finding(i):
+    return {'id': 'f{0}'.format(i), 'note_name': '{0}/providers/p/notes/n{1}'.format(ACCOUNT_ID, i % 2),
+            'kind': 'FINDING', 'finding': {'severity': SEVERITIES[i % 4]},
+            'context': {'region': 'us-south' if i % 3 else 'eu-de', 'resource_type': 'cluster',
+                        'resource_crn': 'crn:v1:resource:{0}'.format(i % 10)}}
+
+
+def kpi(i):
+    return {'id': 'k{0}'.format(i), 'note_name': '{0}/providers/p/notes/kpi'.format(ACCOUNT_ID), 'kind': 'KPI',
+            'kpi': {'value': i, 'total': 10}}
+
+
+class TestHyperLogLog(unittest.TestCase):
+    """
+    Test the distinct count sketch
+    """
+
+    def test_estimate(self):
+        sketch = HyperLogLog()
+        for i in range(50000):
+            sketch.add('crn:{0}'.format(i % 20000))
+        self.assertAlmostEqual(sketch.count(), 20000, delta=20000 * 0.03)
+
+    def test_small_counts_are_exact(self):
+        sketch = HyperLogLog()
+        for value in ('a', 'b', 'c', 'a'):
+            sketch.add(value)
+        self.assertEqual(sketch.count(), 3)
+
+    def test_merge_and_serialize(self):
+        (left, right) = (HyperLogLog(10), HyperLogLog(10))
+        for i in range(3000):
+            (left if i % 2 else right).add(str(i))
+        restored = HyperLogLog.from_dict(json.loads(json.dumps(left.to_dict())))
+        self.assertEqual(restored, left)
+        self.assertAlmostEqual(restored.merge(right).count(), 3000, delta=3000 * 0.1)
+        self.assertRaises(ValueError, left.merge, HyperLogLog(11))
+        self.assertRaises(ValueError, HyperLogLog, 3)
+
+
+class TestFindingAggregate(unittest.TestCase):
+    """
+    Test counting, merging and serializing aggregates
+    """
+
+    def test_rollups(self):
+        aggregate = FindingAggregate.from_occurrences([finding(i) for i in range(12)] + [kpi(i) for i in range(4)])
+        self.assertEqual((aggregate.occurrences, aggregate.findings, aggregate.kpis), (16, 12, 4))
+        self.assertEqual(aggregate.by_severity, {'LOW': 3, 'MEDIUM': 3, 'HIGH': 3, 'CRITICAL': 3})
+        self.assertEqual(aggregate.by_region, {'us-south': 8, 'eu-de': 4})
+        self.assertEqual(aggregate.by_note_name['{0}/providers/p/notes/n0'.format(ACCOUNT_ID)], 6)
+        self.assertEqual((aggregate.kpi_value, aggregate.kpi_total), (6, 40))
+        self.assertEqual(aggregate.distinct_resources, 10)
+
+    def test_merged_partials_equal_whole(self):
+        occurrences = [finding(i) for i in range(100)] + [kpi(i) for i in range(10)]
+        whole = FindingAggregate.from_occurrences(occurrences)
+        partials = [FindingAggregate.from_occurrences(occurrences[i::3]) for i in range(3)]
+        merged = FindingAggregate()
+        for partial in partials:
+            merged.merge(FindingAggregate.from_dict(json.loads(json.dumps(partial.to_dict()))))
+        self.assertEqual(merged, whole)
+        self.assertEqual(partials[0] + partials[1] + partials[2], whole)
+        self.assertEqual(partials[0].occurrences, 37)
+
+    def test_models_are_rejected(self):
+        occurrence = ApiOccurrence.from_dict(finding(1))
+        self.assertRaises(TypeError, FindingAggregate.from_occurrences, [occurrence])
+        aggregate = FindingAggregate.from_occurrences([finding(1)])
+        self.assertEqual(aggregate.by_region, {'us-south': 1})
+
+    def test_parallel_aggregation_of_scan(self):
+        backend = MockBackend()
+        service = FindingsApiV1(NoAuthAuthenticator(), transport=MockTransport(backend))
+        for provider in ('p1', 'p2', 'p3'):
+            backend.add_occurrences(ACCOUNT_ID, provider, [dict(finding(i), id='{0}-{1}'.format(provider, i))
+                                                           for i in range(20)])
+
+        def aggregate_provider(provider_id):
+            pages = service.iter_occurrence_pages(ACCOUNT_ID, provider_id, page_size=7)
+            return FindingAggregate.from_occurrences(o for page in pages for o in page)
+
+        results = run_bulk(aggregate_provider, ['p1', 'p2', 'p3'], max_workers=3)
+        total = FindingAggregate()
+        for result in results:
+            total.merge(result.result)
+        self.assertEqual(total.findings, 60)
+        self.assertEqual(total, FindingAggregate.from_occurrences(service.scan_occurrences(ACCOUNT_ID)))
@@ -0,0 +1,129 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the bulk channel operations
+"""
+
+import threading
+import unittest
+
+from ibm_cloud_sdk_core import ApiException
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import NotificationsApiV1
+from ibm_cloud_security_advisor.bulk import batched, run_bulk
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+from ibm_cloud_security_advisor.notifications_api_v1 import ChannelInfo, ChannelsDelete
+from ibm_cloud_security_advisor.tracing import SpanRecorder
+
+ACCOUNT_ID = 'account1'
+
+
+def make_channel(index):
+    return {'name': 'channel{0}'.format(index), 'type': 'Webhook', 'endpoint': 'https://example.com/{0}'.format(index)}
+
+
+class TestRunBulk(unittest.TestCase):
+    """
+    Test the bounded worker pool
+    """
+
+    def test_results_in_order_with_errors(self):
+        def func(item):
+            if item == 3:
+                raise ValueError('bad item')
+            return item * 2
+
+        results = run_bulk(func, range(6), max_workers=3)
+        self.assertEqual([r.result for r in results], [0, 2, 4, None, 8, 10])
+        self.assertIsInstance(results[3].error, ValueError)
+        self.assertEqual([r.ok for r in results].count(False), 1)
+
+    def test_concurrency_is_bounded(self):
+        lock = threading.Lock()
+        state = {'active': 0, 'peak': 0}
+        barrier = threading.Barrier(2, timeout=5)
+
+        def func(item):
+            with lock:
+                state['active'] += 1
+                state['peak'] = max(state['peak'], state['active'])
+            barrier.wait()
+            with lock:
+                state['active'] -= 1
+
+        run_bulk(func, range(8), max_workers=2)
+        self.assertEqual(state['peak'], 2)
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, run_bulk, len, [], max_workers=0)
+        self.assertRaises(ValueError, list, batched([1], 0))
+        self.assertEqual(list(batched(range(5), 2)), [[0, 1], [2, 3], [4]])
+        self.assertEqual(run_bulk(len, []), [])
+
+
+class TestBulkChannels(unittest.TestCase):
+    """
+    Test bulk create, update and delete of notification channels
+    """
+
+    def setUp(self):
+        self.backend = MockBackend()
+        self.service = NotificationsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend))
+
+    def test_create_update_delete(self):
+        created = self.service.create_notification_channels(ACCOUNT_ID, [make_channel(i) for i in range(20)],
+                                                            max_workers=4)
+        self.assertTrue(all(r.ok for r in created))
+        self.assertIsInstance(created[0].result, ChannelInfo)
+        channel_ids = [r.result.channel_id for r in created]
+        self.assertEqual(len(set(channel_ids)), 20)
+
+        updates = [dict(make_channel(i), channel_id=channel_id, name='renamed{0}'.format(i))
+                   for (i, channel_id) in enumerate(channel_ids)]
+        updated = self.service.update_notification_channels(ACCOUNT_ID, updates, max_workers=4)
+        self.assertEqual([r.result.channel_id for r in updated], channel_ids)
+        names = {c['name'] for c in self.service.list_all_channels(ACCOUNT_ID).get_result()['channels']}
+        self.assertEqual(names, {'renamed{0}'.format(i) for i in range(20)})
+
+        deleted = self.service.delete_notification_channels_in_batches(ACCOUNT_ID, channel_ids, batch_size=8)
+        self.assertEqual([len(r.item) for r in deleted], [8, 8, 4])
+        self.assertIsInstance(deleted[0].result, ChannelsDelete)
+        self.assertEqual(self.backend.calls['delete_notification_channels'], 3)
+        self.assertEqual(self.service.list_all_channels(ACCOUNT_ID).get_result(), {'channels': []})
+
+    def test_per_channel_errors(self):
+        self.backend.inject_error(500, operation_id='create_notification_channel')
+        results = self.service.create_notification_channels(ACCOUNT_ID, [make_channel(0), {'name': 'incomplete'}],
+                                                            max_workers=1)
+        self.assertIsInstance(results[0].error, ApiException)
+        self.assertIsInstance(results[1].error, TypeError)
+        updated = self.service.update_notification_channels(ACCOUNT_ID, [dict(make_channel(0), channel_id='nope')])
+        self.assertEqual(updated[0].error.status_code, 404)
+
+    def test_fan_out_is_traced(self):
+        recorder = SpanRecorder()
+        with recorder.span('provision') as root:
+            self.service.create_notification_channels(ACCOUNT_ID, [make_channel(i) for i in range(5)])
+        bulk = root.children[0]
+        self.assertEqual(bulk.name, 'create_notification_channels')
+        self.assertEqual(len(bulk.find('create_notification_channel')), 5)
+
+    def test_missing_arguments(self):
+        self.assertRaises(ValueError, self.service.create_notification_channels, None, [])
+        self.assertRaises(ValueError, self.service.update_notification_channels, ACCOUNT_ID, None)
+        self.assertRaises(ValueError, self.service.delete_notification_channels_in_batches, ACCOUNT_ID, None)
@@ -0,0 +1,151 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the occurrence change feed
+"""
+
+import asyncio
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import FindingsApiV1
+from ibm_cloud_security_advisor.change_feed import ChangeFeed, FileCheckpoint, MemoryCheckpoint
+from ibm_cloud_security_advisor.findings_api_v1 import ApiOccurrence
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+
+ACCOUNT_ID = 'account1'
+
+
+def occurrence(provider_id, occurrence_id):
+    return {'id': occurrence_id, 'note_name': '{0}/providers/{1}/notes/n1'.format(ACCOUNT_ID, provider_id),
+            'kind': 'FINDING'}
+
+
+def stamp(second):
+    return '2021-01-01T00:00:{0:02d}Z'.format(second)
+
+
+class TestChangeFeed(unittest.TestCase):
+    """
+    Test watermarking, deduplication and checkpoints
+    """
+
+    def setUp(self):
+        self.items = []
+        self.requests = []
+
+    def fetch(self, since):
+        self.requests.append(since)
+        return list(self.items)
+
+    def test_only_changes_are_yielded(self):
+        self.items = [{'id': 'a', 'update_time': stamp(1)}, {'id': 'b', 'update_time': stamp(2)}]
+        feed = ChangeFeed(self.fetch, overlap=0)
+        self.assertEqual([i['id'] for i in feed.poll()], ['a', 'b'])
+        self.assertEqual(feed.poll(), [])
+        self.items.append({'id': 'a', 'update_time': stamp(3)})
+        self.assertEqual(feed.poll(), [{'id': 'a', 'update_time': stamp(3)}])
+        self.assertEqual(self.requests, [None, stamp(2), stamp(2)])
+
+    def test_late_write_inside_overlap(self):
+        self.items = [{'id': 'a', 'update_time': stamp(10)}]
+        feed = ChangeFeed(self.fetch, overlap=5)
+        feed.poll()
+        # committed late with an earlier timestamp
+        self.items.append({'id': 'b', 'update_time': stamp(8)})
+        self.items.append({'id': 'c', 'update_time': stamp(2)})
+        self.assertEqual([i['id'] for i in feed.poll()], ['b'])
+        self.assertEqual(feed.poll(), [])
+
+    def test_checkpoint_resumes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'feed.json')
+            self.items = [{'id': 'a', 'update_time': stamp(1)}, {'id': 'b', 'update_time': stamp(1)}]
+            ChangeFeed(self.fetch, checkpoint=FileCheckpoint(path)).poll()
+            self.items.append({'id': 'c', 'update_time': stamp(1)})
+            resumed = ChangeFeed(self.fetch, checkpoint=FileCheckpoint(path))
+            self.assertEqual(resumed.watermark.second, 1)
+            self.assertEqual([i['id'] for i in resumed.poll()], ['c'])
+            self.assertEqual(os.listdir(directory), ['feed.json'])
+
+    def test_follow_commits_after_batch(self):
+        self.items = [{'id': 'a', 'update_time': stamp(1)}, {'id': 'b', 'update_time': stamp(2)}]
+        checkpoint = MemoryCheckpoint()
+        feed = ChangeFeed(self.fetch, checkpoint=checkpoint)
+        follow = feed.follow(interval=0, max_polls=2)
+        next(follow)
+        follow.close()
+        self.assertIsNone(checkpoint.load())
+        self.assertEqual([i['id'] for i in feed.follow(interval=0, max_polls=2)], ['a', 'b'])
+        self.assertEqual(checkpoint.load()['watermark'], stamp(2))
+
+    def test_naive_start_time_is_utc(self):
+        self.items = [{'id': 'a', 'update_time': stamp(1)}, {'id': 'b', 'update_time': stamp(5)}]
+        feed = ChangeFeed(self.fetch, start_time=datetime(2021, 1, 1, 0, 0, 3), overlap=0)
+        self.assertEqual(feed.watermark, datetime(2021, 1, 1, 0, 0, 3, tzinfo=timezone.utc))
+        self.assertEqual([i['id'] for i in feed.poll()], ['b'])
+        self.assertEqual(self.requests, [stamp(3)])
+
+    def test_stream(self):
+        self.items = [{'id': 'a', 'update_time': stamp(1)}]
+
+        async def consume(feed):
+            return [item async for item in feed.stream(interval=0, max_polls=3)]
+
+        self.assertEqual(asyncio.run(consume(ChangeFeed(self.fetch))), self.items)
+        self.assertEqual(len(self.requests), 3)
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, ChangeFeed, None)
+        self.assertRaises(ValueError, ChangeFeed, self.fetch, overlap=-1)
+
+
+class TestOccurrenceChangeFeed(unittest.TestCase):
+    """
+    Test FindingsApiV1.occurrence_change_feed against the mock backend
+    """
+
+    def setUp(self):
+        self.backend = MockBackend()
+        self.service = FindingsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend))
+        for provider_id in ('p1', 'p2'):
+            self.backend.add_occurrences(ACCOUNT_ID, provider_id,
+                                         [occurrence(provider_id, '{0}-{1}'.format(provider_id, i)) for i in range(3)])
+
+    def test_scan_feed(self):
+        feed = self.service.occurrence_change_feed(ACCOUNT_ID)
+        changes = feed.poll()
+        self.assertEqual(len(changes), 6)
+        self.assertIsInstance(changes[0], ApiOccurrence)
+        self.assertEqual(feed.poll(), [])
+        self.backend.add_occurrences(ACCOUNT_ID, 'p2', [occurrence('p2', 'p2-1')])
+        self.assertEqual([o.id for o in feed.poll()], ['p2-1'])
+
+    def test_graph_feed(self):
+        query = 'query {{occurrences(updatedSince: "{watermark}") {{id}}}}'
+        feed = self.service.occurrence_change_feed(ACCOUNT_ID, query=query)
+        self.assertEqual(len(feed.poll()), 6)
+        self.assertEqual(feed.poll(), [])
+        self.assertEqual(self.backend.calls['post_graph'], 2)
+        self.assertEqual(self.backend.calls['list_occurrences'], 0)
+
+    def test_missing_account(self):
+        self.assertRaises(ValueError, self.service.occurrence_change_feed, None)
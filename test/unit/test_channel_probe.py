@@ -0,0 +1,96 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test concurrent notification channel probing
+"""
+
+import unittest
+
+import requests
+from ibm_cloud_sdk_core import ApiException
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import NotificationsApiV1
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+from ibm_cloud_security_advisor.transport import get_request_timeout, request_timeout
+
+ACCOUNT_ID = 'account1'
+
+
+class TestProbeChannels(unittest.TestCase):
+    """
+    Test probe_channels against the mock backend
+    """
+
+    def setUp(self):
+        self.backend = MockBackend()
+        self.service = NotificationsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend))
+        self.backend.add_channels(ACCOUNT_ID, [
+            {'channel_id': 'c{0}'.format(i), 'name': 'channel{0}'.format(i), 'type': 'Webhook',
+             'endpoint': 'https://example.com/{0}'.format(i), 'enabled': True} for i in range(10)])
+
+    def test_sweep_is_bounded_by_slowest_probe(self):
+        def latency(operation_id, path):
+            if operation_id != 'test_notification_channel':
+                return 0.0
+            return 0.5 if path.endswith('/c3/test') else 0.05
+
+        self.backend.latency = latency
+        report = self.service.probe_channels(ACCOUNT_ID, timeout=5)
+        self.assertEqual(len(report.healthy), 10)
+        self.assertEqual(report.slowest.channel_id, 'c3')
+        self.assertGreaterEqual(report.slowest.latency, 0.5)
+        self.assertEqual(report.probes[0].name, 'channel0')
+        # Sequential probes would take at least the sum of the latencies.
+        self.assertLess(report.elapsed, sum(probe.latency for probe in report.probes))
+
+    def test_timeouts_and_errors(self):
+        self.backend.latency = lambda operation_id, path: 1.0 if path.endswith('/c1/test') else 0.0
+        self.backend.inject_error(500, operation_id='test_notification_channel')
+        report = self.service.probe_channels(ACCOUNT_ID, ['c0', 'c1', 'c2'], timeout=0.05, max_workers=1)
+        self.assertEqual([p.channel_id for p in report.failing], ['c0', 'c1'])
+        self.assertIsInstance(report.probes[0].error, ApiException)
+        self.assertIsInstance(report.probes[1].error, requests.exceptions.Timeout)
+        self.assertLess(report.probes[1].latency, 0.5)
+        self.assertIsNone(report.probes[0].name)
+        self.assertEqual(report.to_dict()['failing'], 2)
+
+    def test_disable_failing(self):
+        self.backend.inject_error(500, count=2, operation_id='test_notification_channel')
+        report = self.service.probe_channels(ACCOUNT_ID, ['c0', 'c1', 'c2'], max_workers=1, disable_failing=True)
+        self.assertEqual(len(report.disabled), 2)
+        channels = {c['channel_id']: c for c in self.service.list_all_channels(ACCOUNT_ID).get_result()['channels']}
+        self.assertEqual([channels['c{0}'.format(i)]['enabled'] for i in range(4)], [False, False, True, True])
+        self.assertEqual(report.to_dict()['disabled'], ['c0', 'c1'])
+
+    def test_missing_account(self):
+        self.assertRaises(ValueError, self.service.probe_channels, None)
+
+
+class TestRequestTimeout(unittest.TestCase):
+    """
+    Test the request timeout context
+    """
+
+    def test_scoped(self):
+        self.assertIsNone(get_request_timeout())
+        with request_timeout(2):
+            self.assertEqual(get_request_timeout(), 2)
+        self.assertIsNone(get_request_timeout())
+        with self.assertRaises(ValueError):
+            with request_timeout(0):
+                pass
@@ -0,0 +1,148 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the notification channel reconciler
+"""
+
+import json
+import os
+import unittest
+
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import NotificationsApiV1
+from ibm_cloud_security_advisor.channel_sync import channel_arguments, plan_channel_sync
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+from ibm_cloud_security_advisor.notifications_api_v1 import Channel, ChannelSeverity
+
+ACCOUNT_ID = 'account1'
+SAMPLE = os.path.join(os.path.dirname(__file__), '..', '..', 'samples', 'notifications', 'notification.json')
+
+
+def make_channel(name, **kwargs):
+    channel = {'name': name, 'type': 'Webhook', 'endpoint': 'https://example.com/' + name, 'severity': ['high']}
+    channel.update(kwargs)
+    return channel
+
+
+class TestPlanChannelSync(unittest.TestCase):
+    """
+    Test the diff between existing and desired channels
+    """
+
+    def test_channel_arguments(self):
+        with open(SAMPLE) as f:
+            sample = json.load(f)
+        args = channel_arguments(sample)
+        self.assertEqual(args['severity'], ['critical', 'high', 'medium', 'low'])
+        model = Channel(name='c1', type='Webhook', endpoint='https://example.com',
+                        severity=ChannelSeverity(critical=True, high=False))
+        self.assertEqual(channel_arguments(model), {'name': 'c1', 'type': 'Webhook', 'endpoint': 'https://example.com',
+                                                    'severity': ['critical']})
+
+    def test_plan(self):
+        current = [
+            dict(make_channel('same'), channel_id='1', severity={'critical': False, 'high': True}),
+            dict(make_channel('changed'), channel_id='2'),
+            dict(make_channel('extra'), channel_id='3'),
+            dict(make_channel('same'), channel_id='4'),
+        ]
+        desired = [make_channel('same'), make_channel('changed', severity=['low']), make_channel('new')]
+        plan = plan_channel_sync(current, desired)
+        self.assertEqual([c['name'] for c in plan.creates], ['new'])
+        self.assertEqual([(c['name'], c['channel_id']) for c in plan.updates], [('changed', '2')])
+        self.assertEqual(plan.deletes, ['3', '4'])
+        self.assertEqual(plan.unchanged, ['same'])
+        self.assertEqual(plan_channel_sync(current, desired, prune=False).deletes, [])
+
+    def test_alert_source_order_is_ignored(self):
+        sources = [{'provider_name': 'VA', 'finding_types': ['a', 'b']}, {'provider_name': 'CERT'}]
+        current = [dict(make_channel('c'), channel_id='1', alert_source=sources)]
+        desired = [make_channel('c', alert_source=[sources[1], {'provider_name': 'VA', 'finding_types': ['b', 'a']}])]
+        self.assertTrue(plan_channel_sync(current, desired).empty)
+
+    def test_omitted_fields_are_not_compared(self):
+        current = [dict(make_channel('c'), channel_id='1', enabled=True, description='Managed elsewhere')]
+        self.assertTrue(plan_channel_sync(current, [make_channel('c')]).empty)
+        plan = plan_channel_sync(current, [make_channel('c', enabled=False)])
+        self.assertEqual([c['channel_id'] for c in plan.updates], ['1'])
+
+    def test_invalid_desired(self):
+        self.assertRaises(ValueError, plan_channel_sync, [], [make_channel('a'), make_channel('a')])
+        self.assertRaises(ValueError, plan_channel_sync, [], [{'type': 'Webhook'}])
+
+
+class TestSyncChannels(unittest.TestCase):
+    """
+    Test sync_channels against the mock backend
+    """
+
+    def setUp(self):
+        self.backend = MockBackend()
+        self.service = NotificationsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend))
+
+    def channels(self):
+        return {c['name']: c for c in self.service.list_all_channels(ACCOUNT_ID, limit=5000).get_result()['channels']}
+
+    def test_converges(self):
+        self.backend.add_channels(ACCOUNT_ID, [make_channel('keep'), make_channel('change'), make_channel('drop')])
+        desired = [make_channel('keep'), make_channel('change', endpoint='https://example.com/new'),
+                   make_channel('add')]
+        result = self.service.sync_channels(ACCOUNT_ID, desired, page_size=2)
+        self.assertTrue(result.ok)
+        self.assertEqual((len(result.created), len(result.updated), len(result.deleted)), (1, 1, 1))
+        channels = self.channels()
+        self.assertEqual(sorted(channels), ['add', 'change', 'keep'])
+        self.assertEqual(channels['change']['endpoint'], 'https://example.com/new')
+        self.assertTrue(self.service.sync_channels(ACCOUNT_ID, desired).plan.empty)
+        self.assertRaises(ValueError, self.service.sync_channels, ACCOUNT_ID, desired, page_size=0)
+
+    def test_partial_update_keeps_omitted_fields(self):
+        self.backend.add_channels(ACCOUNT_ID, [make_channel('c', enabled=True, description='Paging')])
+        result = self.service.sync_channels(ACCOUNT_ID, [{'name': 'c', 'endpoint': 'https://example.com/new'}])
+        self.assertEqual(len(result.updated), 1)
+        channel = self.channels()['c']
+        self.assertEqual(channel['endpoint'], 'https://example.com/new')
+        self.assertTrue(channel['enabled'])
+        self.assertEqual(channel['description'], 'Paging')
+        self.assertEqual(channel_arguments(channel)['severity'], ['high'])
+
+    def test_thousands_of_channels(self):
+        self.backend.add_channels(ACCOUNT_ID, [make_channel('c{0}'.format(i)) for i in range(2000)])
+        desired = [make_channel('c{0}'.format(i), severity=['high', 'low'] if i % 10 == 0 else ['high'])
+                   for i in range(100, 2100)]
+        result = self.service.sync_channels(ACCOUNT_ID, desired, max_workers=16)
+        self.assertTrue(result.ok)
+        self.assertEqual(len(result.plan.deletes), 100)
+        self.assertEqual(len(result.deleted), 2)
+        self.assertEqual(len(result.created), 100)
+        self.assertEqual(len(result.updated), 190)
+        self.assertEqual(self.backend.calls['list_all_channels'], 21)
+        self.assertEqual(len(self.channels()), 2000)
+
+    def test_dry_run(self):
+        self.backend.add_channels(ACCOUNT_ID, [make_channel('drop')])
+        result = self.service.sync_channels(ACCOUNT_ID, [make_channel('add')], dry_run=True)
+        self.assertEqual(len(result.plan.creates), 1)
+        self.assertEqual(result.created, [])
+        self.assertEqual(list(self.channels()), ['drop'])
+
+    def test_errors_are_reported(self):
+        self.backend.inject_error(500, operation_id='create_notification_channel')
+        result = self.service.sync_channels(ACCOUNT_ID, [make_channel('add')])
+        self.assertFalse(result.ok)
+        self.assertEqual(result.errors[0].item['name'], 'add')
@@ -0,0 +1,121 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Test deadline propagation
+"""
+
+import asyncio
+import time
+import unittest
+
+import requests
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import FindingsApiV1
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+from ibm_cloud_security_advisor.transport import (DeadlineExceeded, budget_timeout, deadline, get_deadline,
+                                                  remaining_time, request_timeout, run_in_executor)
+
+ACCOUNT_ID = 'account1'
+PROVIDER_ID = 'provider1'
+
+
+def occurrence(i):
+    return {'provider_id': PROVIDER_ID, 'id': 'o{0}'.format(i), 'kind': 'FINDING',
+            'note_name': '{0}/providers/{1}/notes/n1'.format(ACCOUNT_ID, PROVIDER_ID)}
+
+
+class RecordingSession(requests.Session):
+    """Session that records the timeout of each request instead of sending it."""
+
+    def __init__(self):
+        super().__init__()
+        self.timeouts = []
+
+    def request(self, method, url, **kwargs):  # pylint: disable=arguments-differ
+        self.timeouts.append(kwargs.get('timeout'))
+        raise requests.exceptions.ConnectionError('not sent')
+
+
+class TestDeadline(unittest.TestCase):
+    """
+    Test the deadline context and the request budget
+    """
+
+    def test_nested_deadlines_only_shorten(self):
+        self.assertIsNone(get_deadline())
+        self.assertEqual(budget_timeout(30), 30)
+        with deadline(10) as outer:
+            with deadline(60) as inner:
+                self.assertEqual(inner, outer)
+            with deadline(1):
+                self.assertLessEqual(remaining_time(), 1)
+                self.assertLessEqual(budget_timeout(30), 1)
+                self.assertEqual(budget_timeout((0.5, 30))[0], 0.5)
+        self.assertIsNone(get_deadline())
+
+    def test_exhausted_budget_fails_early(self):
+        backend = MockBackend()
+        service = FindingsApiV1(NoAuthAuthenticator(), transport=MockTransport(backend))
+        with deadline(0):
+            self.assertRaises(DeadlineExceeded, service.list_providers, ACCOUNT_ID)
+        self.assertEqual(backend.calls['list_providers'], 0)
+
+    def test_multi_call_flow(self):
+        backend = MockBackend(latency={'create_occurrence': 0.1})
+        service = FindingsApiV1(NoAuthAuthenticator(), transport=MockTransport(backend))
+        service.set_http_config({'timeout': 60})
+        start = time.perf_counter()
+        with deadline(0.35):
+            results = service.create_occurrences(ACCOUNT_ID, [occurrence(i) for i in range(10)], max_workers=1)
+        self.assertLess(time.perf_counter() - start, 0.6)
+        self.assertEqual([r.ok for r in results[:3]], [True, True, True])
+        self.assertFalse(any(r.ok for r in results[4:]))
+        self.assertIsInstance(results[-1].error, DeadlineExceeded)
+        self.assertLessEqual(backend.calls['create_occurrence'], 4)
+
+    def test_requests_transport_caps_http_config(self):
+        service = FindingsApiV1(NoAuthAuthenticator())
+        session = RecordingSession()
+        service.set_http_client(session)
+        service.set_http_config({'timeout': 60})
+        with deadline(5):
+            self.assertRaises(requests.exceptions.ConnectionError, service.list_providers, ACCOUNT_ID)
+        with request_timeout(2), deadline(5):
+            self.assertRaises(requests.exceptions.ConnectionError, service.list_providers, ACCOUNT_ID)
+        service.set_http_config({})
+        with request_timeout(2), deadline(5):
+            self.assertRaises(requests.exceptions.ConnectionError, service.list_providers, ACCOUNT_ID)
+        self.assertTrue(4 < session.timeouts[0] <= 5)
+        self.assertTrue(4 < session.timeouts[1] <= 5)
+        self.assertEqual(session.timeouts[2], 2)
+
+    def test_async(self):
+        backend = MockBackend(latency={'list_providers': 0.05, 'list_notes': 1.0})
+        service = FindingsApiV1(NoAuthAuthenticator(), transport=MockTransport(backend))
+
+        async def flow():
+            with deadline(0.3):
+                await run_in_executor(service.list_providers, ACCOUNT_ID)
+                await run_in_executor(service.list_notes, ACCOUNT_ID, PROVIDER_ID)
+
+        start = time.perf_counter()
+        with self.assertRaises(requests.exceptions.Timeout):
+            asyncio.run(flow())
+        self.assertLess(time.perf_counter() - start, 0.6)
+        self.assertEqual(backend.calls['list_notes'], 1)
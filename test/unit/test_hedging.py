@@ -0,0 +1,178 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Test hedged requests
+"""
+
+import itertools
+import threading
+import time
+import unittest
+from concurrent.futures import ALL_COMPLETED
+from unittest import mock
+
+import requests
+
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import FindingsApiV1
+from ibm_cloud_security_advisor import hedging
+from ibm_cloud_security_advisor.hedging import HedgingTransport
+from ibm_cloud_security_advisor.instrumentation import InMemoryMetrics
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+from ibm_cloud_security_advisor.transport import DeadlineExceeded, TransportWrapper, deadline
+
+ACCOUNT_ID = 'account1'
+PROVIDER_ID = 'provider1'
+
+
+class SlowCalls():
+    """Latency function that makes the listed calls of an operation slow."""
+
+    def __init__(self, slow_calls, slow=0.5, fast=0.01):
+        self.slow_calls = set(slow_calls)
+        self.slow = slow
+        self.fast = fast
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def __call__(self, operation_id, path):
+        with self.lock:
+            call = next(self.counter)
+        return self.slow if call in self.slow_calls else self.fast
+
+
+class FailingPrimary(TransportWrapper):
+    """Transport whose first request fails with a connection error after a delay."""
+
+    def __init__(self, transport, delay):
+        super().__init__(transport)
+        self.delay = delay
+        self.calls = itertools.count()
+
+    def send(self, service, request, *, operation_id=None, **kwargs):
+        if next(self.calls) == 0:
+            time.sleep(self.delay)
+            raise requests.exceptions.ConnectionError('connection reset')
+        return self.transport.send(service, request, operation_id=operation_id, **kwargs)
+
+
+class Stalled(TransportWrapper):
+    """Transport whose requests hang, ignoring their timeout, until released."""
+
+    def __init__(self, transport):
+        super().__init__(transport)
+        self.released = threading.Event()
+
+    def send(self, service, request, *, operation_id=None, **kwargs):
+        self.released.wait(5)
+        return self.transport.send(service, request, operation_id=operation_id, **kwargs)
+
+
+class TestHedgingTransport(unittest.TestCase):
+    """
+    Test hedging against the mock backend with injected latency
+    """
+
+    def service(self, latency, **kwargs):
+        self.backend = MockBackend(latency=latency)
+        self.backend.add_occurrences(ACCOUNT_ID, PROVIDER_ID, [{'id': 'o1', 'kind': 'FINDING', 'note_name': 'n'}])
+        self.transport = HedgingTransport(MockTransport(self.backend), **kwargs)
+        self.addCleanup(self.transport.close)
+        return FindingsApiV1(NoAuthAuthenticator(), transport=self.transport)
+
+    def test_hedge_wins_over_slow_primary(self):
+        service = self.service(SlowCalls({0}), delay=0.05)
+        start = time.perf_counter()
+        result = service.get_occurrence(ACCOUNT_ID, PROVIDER_ID, 'o1').get_result()
+        self.assertLess(time.perf_counter() - start, 0.3)
+        self.assertEqual(result['id'], 'o1')
+        self.assertEqual(self.backend.calls['get_occurrence'], 2)
+        self.assertEqual(self.transport.snapshot(), {'requests': 1, 'hedged': 1, 'hedge_wins': 1, 'primary_wins': 0,
+                                                     'throttled': 0})
+
+    def test_fast_requests_are_not_hedged(self):
+        service = self.service(0.0, delay=0.2)
+        for _ in range(5):
+            service.get_occurrence(ACCOUNT_ID, PROVIDER_ID, 'o1')
+        self.assertEqual(self.backend.calls['get_occurrence'], 5)
+        self.assertEqual(self.transport.snapshot()['hedged'], 0)
+
+    def test_budget_caps_extra_load(self):
+        service = self.service(SlowCalls(range(0, 100, 2), slow=0.1), delay=0.02, max_ratio=0.25, burst=1)
+        for _ in range(8):
+            service.get_occurrence(ACCOUNT_ID, PROVIDER_ID, 'o1')
+        counters = self.transport.snapshot()
+        self.assertEqual(counters['requests'], 8)
+        self.assertLessEqual(counters['hedged'], 1 + 8 * 0.25)
+        self.assertGreater(counters['throttled'], 0)
+
+    def test_error_response_wins(self):
+        service = self.service(SlowCalls({0}), delay=0.05)
+        with self.assertRaises(Exception) as context:
+            service.get_note(ACCOUNT_ID, PROVIDER_ID, 'missing')
+        self.assertEqual(context.exception.status_code, 404)
+        self.assertEqual(self.transport.snapshot()['hedge_wins'], 1)
+
+    def test_response_wins_when_both_complete(self):
+        real_wait = hedging.wait
+
+        def wait_for_both(futures, timeout=None, return_when=ALL_COMPLETED):
+            # Both copies complete before the transport looks at them.
+            return real_wait(futures, timeout=None if return_when != ALL_COMPLETED else timeout)
+
+        self.backend = MockBackend()
+        self.backend.add_occurrences(ACCOUNT_ID, PROVIDER_ID, [{'id': 'o1', 'kind': 'FINDING', 'note_name': 'n'}])
+        self.transport = HedgingTransport(FailingPrimary(MockTransport(self.backend), 0.05), delay=0.01)
+        self.addCleanup(self.transport.close)
+        service = FindingsApiV1(NoAuthAuthenticator(), transport=self.transport)
+        with mock.patch.object(hedging, 'wait', side_effect=wait_for_both):
+            result = service.get_occurrence(ACCOUNT_ID, PROVIDER_ID, 'o1').get_result()
+        self.assertEqual(result['id'], 'o1')
+        self.assertEqual(self.transport.snapshot()['hedge_wins'], 1)
+
+    def test_waiting_stops_at_the_deadline(self):
+        self.backend = MockBackend()
+        stalled = Stalled(MockTransport(self.backend))
+        self.addCleanup(stalled.released.set)
+        for (delay, kwargs) in ((0.02, {}), (0.02, {'max_ratio': 0, 'burst': 1}), (1.0, {})):
+            self.transport = HedgingTransport(stalled, delay=delay, **kwargs)
+            self.addCleanup(self.transport.close)
+            service = FindingsApiV1(NoAuthAuthenticator(), transport=self.transport)
+            start = time.perf_counter()
+            with deadline(0.1):
+                self.assertRaises(DeadlineExceeded, service.get_occurrence, ACCOUNT_ID, PROVIDER_ID, 'o1')
+            self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_writes_are_not_hedged(self):
+        service = self.service(0.1, delay=0.01)
+        service.delete_occurrence(ACCOUNT_ID, PROVIDER_ID, 'o1')
+        self.assertEqual(self.backend.calls['delete_occurrence'], 1)
+        self.assertEqual(self.transport.snapshot()['requests'], 0)
+
+    def test_delay_from_metrics(self):
+        metrics = InMemoryMetrics()
+        service = self.service({'get_occurrence': 0.02}, metrics=metrics, default_delay=1.0, min_delay=0.005,
+                               operations=['get_occurrence'])
+        service.add_instrumentation_hook(metrics)
+        self.assertEqual(self.transport.get_delay('get_occurrence'), 1.0)
+        for _ in range(5):
+            service.get_occurrence(ACCOUNT_ID, PROVIDER_ID, 'o1')
+        self.assertAlmostEqual(self.transport.get_delay('get_occurrence'), 0.02, delta=0.05)
+        service.list_providers(ACCOUNT_ID)
+        self.assertEqual(self.transport.snapshot()['requests'], 5)
@@ -0,0 +1,121 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the per-operation instrumentation hooks
+"""
+
+import json
+import unittest
+
+import responses
+from ibm_cloud_sdk_core import ApiException
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import FindingsApiV1, NotificationsApiV1
+from ibm_cloud_security_advisor.instrumentation import (InMemoryMetrics, InstrumentationHook, OpenTelemetryHook,
+                                                        PrometheusHook)
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+
+ACCOUNT_ID = 'account1'
+BASE_URL = 'https://us-south.secadvisor.cloud.ibm.com/findings'
+
+
+class TestInstrumentation(unittest.TestCase):
+    """
+    Test that operation metrics are emitted for both service clients
+    """
+
+    def setUp(self):
+        self.backend = MockBackend()
+        self.records = []
+        self.findings = FindingsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend))
+        self.notifications = NotificationsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend))
+
+    def test_records_are_keyed_by_operation_id(self):
+        self.findings.add_instrumentation_hook(self.records.append)
+        self.notifications.add_instrumentation_hook(self.records.append)
+        self.findings.list_providers(ACCOUNT_ID)
+        self.notifications.create_notification_channel(ACCOUNT_ID, 'c1', 'Webhook', 'https://example.com')
+        self.assertEqual([r.operation_id for r in self.records], ['list_providers', 'create_notification_channel'])
+        self.assertEqual([r.service_name for r in self.records], ['findings_api', 'notifications_api'])
+        create = self.records[1]
+        self.assertEqual(create.status_code, 200)
+        self.assertEqual(create.method, 'POST')
+        self.assertGreater(create.bytes_out, 0)
+        self.assertGreater(create.build_time, 0)
+        self.assertGreaterEqual(create.total_time, create.network_time)
+
+    def test_errors_are_recorded(self):
+        self.findings.add_instrumentation_hook(self.records.append)
+        self.assertRaises(ApiException, self.findings.get_note, ACCOUNT_ID, 'p1', 'missing')
+        self.assertEqual(self.records[0].status_code, 404)
+        self.assertIsInstance(self.records[0].error, ApiException)
+        self.assertEqual(self.records[0].to_dict()['error'], 'ApiException')
+
+    def test_remove_hook(self):
+        hook = self.findings.add_instrumentation_hook(self.records.append)
+        self.findings.remove_instrumentation_hook(hook)
+        self.findings.list_providers(ACCOUNT_ID)
+        self.assertEqual(self.records, [])
+
+    def test_failing_hook_does_not_break_the_call(self):
+        class FailingHook(InstrumentationHook):
+            def on_operation(self, metrics):
+                raise RuntimeError('boom')
+
+        self.findings.add_instrumentation_hook(FailingHook())
+        self.assertEqual(self.findings.list_providers(ACCOUNT_ID).get_status_code(), 200)
+
+    def test_in_memory_metrics(self):
+        metrics = InMemoryMetrics(window=10)
+        self.findings.add_instrumentation_hook(metrics)
+        for _ in range(3):
+            self.findings.list_providers(ACCOUNT_ID)
+        self.assertRaises(ApiException, self.findings.get_occurrence, ACCOUNT_ID, 'p1', 'missing')
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['list_providers']['count'], 3)
+        self.assertEqual(snapshot['get_occurrence']['errors'], 1)
+        self.assertIsNotNone(metrics.percentile('list_providers', 0.95))
+        self.assertIsNone(metrics.percentile('get_note', 0.5))
+        self.assertEqual(sorted(metrics.operations()), ['get_occurrence', 'list_providers'])
+
+    def test_optional_adapters(self):
+        for adapter in (OpenTelemetryHook, PrometheusHook):
+            try:
+                adapter()
+            except ImportError as err:
+                self.assertIn('requires', str(err))
+
+
+class TestHttpInstrumentation(unittest.TestCase):
+    """
+    Test the measurements taken from real HTTP responses
+    """
+
+    @responses.activate
+    def test_network_and_bytes_in(self):
+        body = json.dumps({'providers': [{'id': 'p1', 'name': 'p1'}]})
+        responses.add(responses.GET, BASE_URL + '/v1/{0}/providers'.format(ACCOUNT_ID), body=body, status=200,
+                      content_type='application/json')
+        records = []
+        service = FindingsApiV1(NoAuthAuthenticator())
+        service.add_instrumentation_hook(records.append)
+        service.list_providers(ACCOUNT_ID)
+        self.assertEqual(records[0].status_code, 200)
+        self.assertEqual(records[0].bytes_in, len(body))
+        self.assertEqual(records[0].retries, 0)
+        self.assertAlmostEqual(records[0].network_time + records[0].parse_time, records[0].total_time)
@@ -0,0 +1,204 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Test circuit breakers and bulkheads
+"""
+
+import threading
+import time
+import unittest
+
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import FindingsApiV1, NotificationsApiV1
+from ibm_cloud_security_advisor.isolation import (CLOSED, HALF_OPEN, OPEN, BulkheadFullError, CircuitBreaker,
+                                                  CircuitOpenError, IsolationTransport)
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+from ibm_cloud_security_advisor.transport import DeadlineExceeded, TransportWrapper, deadline
+
+ACCOUNT_ID = 'account1'
+
+
+class FakeClock():
+    """A clock advanced by hand."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SlowStart(TransportWrapper):
+    """Transport that waits before handing a request on."""
+
+    def __init__(self, transport, delay):
+        super().__init__(transport)
+        self.delay = delay
+
+    def send(self, service, request, *, operation_id=None, **kwargs):
+        time.sleep(self.delay)
+        return self.transport.send(service, request, operation_id=operation_id, **kwargs)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """
+    Test the breaker states
+    """
+
+    def test_open_half_open_closed(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=10, clock=clock)
+        for _ in range(2):
+            breaker.acquire()
+            breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        self.assertRaises(CircuitOpenError, breaker.acquire)
+        clock.now = 10
+        self.assertEqual(breaker.state, HALF_OPEN)
+        breaker.acquire()
+        with self.assertRaises(CircuitOpenError) as context:
+            breaker.acquire()
+        self.assertEqual(context.exception.status_code, 503)
+        breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(breaker.rejected, 2)
+
+    def test_failed_probe_reopens(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=5, clock=clock)
+        breaker.acquire()
+        breaker.record_failure()
+        clock.now = 5
+        breaker.acquire()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        clock.now = 9
+        self.assertRaises(CircuitOpenError, breaker.acquire)
+
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker('test', failure_threshold=2)
+        for _ in range(5):
+            breaker.acquire()
+            breaker.record_failure()
+            breaker.acquire()
+            breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+
+
+class TestIsolationTransport(unittest.TestCase):
+    """
+    Test isolating the clients from each other
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.backend = MockBackend()
+        self.transport = IsolationTransport(MockTransport(self.backend), failure_threshold=3, reset_timeout=30,
+                                            clock=self.clock)
+        self.findings = FindingsApiV1(NoAuthAuthenticator(), transport=self.transport)
+        self.notifications = NotificationsApiV1(NoAuthAuthenticator(), transport=self.transport)
+
+    def test_degraded_service_fails_fast(self):
+        self.backend.inject_error(503, count=3, operation_id='list_all_channels')
+        for _ in range(3):
+            self.assertRaises(Exception, self.notifications.list_all_channels, ACCOUNT_ID)
+        self.assertRaises(CircuitOpenError, self.notifications.list_all_channels, ACCOUNT_ID)
+        self.assertEqual(self.backend.calls['list_all_channels'], 3)
+        self.findings.list_providers(ACCOUNT_ID)
+        self.clock.now = 30
+        self.notifications.list_all_channels(ACCOUNT_ID)
+        self.assertEqual(self.transport.breaker(self.notifications).state, CLOSED)
+
+    def test_unsent_probe_is_released(self):
+        transport = IsolationTransport(SlowStart(MockTransport(self.backend), 0.05), failure_threshold=1,
+                                       clock=self.clock)
+        notifications = NotificationsApiV1(NoAuthAuthenticator(), transport=transport)
+        self.backend.inject_error(503, count=1, operation_id='list_all_channels')
+        self.assertRaises(Exception, notifications.list_all_channels, ACCOUNT_ID)
+        self.clock.now = 30
+        # The deadline passes before the request reaches the mock service.
+        with deadline(0.01):
+            self.assertRaises(DeadlineExceeded, notifications.list_all_channels, ACCOUNT_ID)
+        breaker = transport.breaker(notifications)
+        self.assertEqual(breaker.state, HALF_OPEN)
+        notifications.list_all_channels(ACCOUNT_ID)
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_inner_rejection_is_not_a_success(self):
+        inner = IsolationTransport(MockTransport(self.backend), failure_threshold=1, clock=self.clock)
+        outer = IsolationTransport(inner, failure_threshold=1, reset_timeout=30, clock=self.clock)
+        findings = FindingsApiV1(NoAuthAuthenticator(), transport=outer)
+        self.backend.inject_error(500, count=1, operation_id='list_providers')
+        self.assertRaises(Exception, findings.list_providers, ACCOUNT_ID)
+        self.clock.now = 30
+        # The outer probe is rejected by the inner breaker, which is still open.
+        inner.breaker(findings).reset_timeout = 60
+        self.assertRaises(CircuitOpenError, findings.list_providers, ACCOUNT_ID)
+        self.assertEqual(outer.breaker(findings).state, HALF_OPEN)
+
+    def test_client_errors_do_not_open(self):
+        for _ in range(5):
+            self.assertRaises(Exception, self.findings.get_note, ACCOUNT_ID, 'p', 'missing')
+        self.assertEqual(self.transport.breaker(self.findings).state, CLOSED)
+
+    def test_per_operation(self):
+        self.transport.per_operation = True
+        self.backend.inject_error(500, count=3, operation_id='list_providers')
+        for _ in range(3):
+            self.assertRaises(Exception, self.findings.list_providers, ACCOUNT_ID)
+        self.assertRaises(CircuitOpenError, self.findings.list_providers, ACCOUNT_ID)
+        self.findings.list_notes(ACCOUNT_ID, 'p')
+        states = self.transport.snapshot()
+        self.assertEqual(states['findings_api@{0}/list_providers'.format(self.findings.service_url)]['state'], OPEN)
+
+    def test_bulkhead(self):
+        backend = MockBackend(latency={'list_all_channels': 0.3})
+        transport = IsolationTransport(MockTransport(backend), max_concurrent=2, max_wait=0.05)
+        notifications = NotificationsApiV1(NoAuthAuthenticator(), transport=transport)
+        findings = FindingsApiV1(NoAuthAuthenticator(), transport=transport)
+        threads = [threading.Thread(target=notifications.list_all_channels, args=(ACCOUNT_ID,)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        start = time.perf_counter()
+        with self.assertRaises(BulkheadFullError):
+            notifications.list_all_channels(ACCOUNT_ID)
+        self.assertLess(time.perf_counter() - start, 0.2)
+        findings.list_providers(ACCOUNT_ID)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(transport.bulkhead(notifications).rejected, 1)
+        self.assertEqual(transport.bulkhead(notifications).in_flight, 0)
+        self.assertEqual(transport.breaker(notifications).state, CLOSED)
+
+    def test_bulkhead_wait_stops_at_the_deadline(self):
+        backend = MockBackend(latency={'list_all_channels': 0.5})
+        transport = IsolationTransport(MockTransport(backend), max_concurrent=1, max_wait=2.0)
+        notifications = NotificationsApiV1(NoAuthAuthenticator(), transport=transport)
+        thread = threading.Thread(target=notifications.list_all_channels, args=(ACCOUNT_ID,))
+        thread.start()
+        time.sleep(0.05)
+        start = time.perf_counter()
+        with deadline(0.05):
+            self.assertRaises(DeadlineExceeded, notifications.list_all_channels, ACCOUNT_ID)
+        self.assertLess(time.perf_counter() - start, 0.3)
+        thread.join()
+        self.assertEqual(transport.bulkhead(notifications).rejected, 0)
+        self.assertEqual(transport.bulkhead(notifications).in_flight, 0)
+        self.assertEqual(transport.breaker(notifications).failures, 0)
@@ -0,0 +1,184 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the transport abstraction and the in-process mock backend
+"""
+
+import time
+import unittest
+
+import requests
+from ibm_cloud_sdk_core import ApiException, BaseService
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import FindingsApiV1, NotificationsApiV1
+from ibm_cloud_security_advisor.findings_api_v1 import ApiListOccurrencesResponse
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+from ibm_cloud_security_advisor.notifications_api_v1 import ChannelsList
+from ibm_cloud_security_advisor.transport import RequestsTransport, Transport
+
+ACCOUNT_ID = 'account1'
+
+
+def make_occurrence(occurrence_id, severity='LOW'):
+    return {
+        'note_name': '{0}/providers/sdktest/notes/note1'.format(ACCOUNT_ID),
+        'kind': 'FINDING',
+        'id': occurrence_id,
+        'finding': {'severity': severity}
+    }
+
+
+class RecordingTransport(Transport):
+    """Transport that records the operations it is asked to send."""
+
+    def __init__(self):
+        self.operations = []
+
+    def send(self, service, request, *, operation_id=None, **kwargs):
+        self.operations.append(operation_id)
+        return 'sent'
+
+
+class TestTransport(unittest.TestCase):
+    """
+    Test that both service clients route requests through their transport
+    """
+
+    def test_default_transport(self):
+        service = FindingsApiV1(NoAuthAuthenticator())
+        self.assertIsInstance(service.get_transport(), RequestsTransport)
+        service = NotificationsApiV1(NoAuthAuthenticator())
+        self.assertIsInstance(service.get_transport(), RequestsTransport)
+
+    def test_operation_id_is_passed_to_transport(self):
+        transport = RecordingTransport()
+        findings = FindingsApiV1(NoAuthAuthenticator(), transport=transport)
+        notifications = NotificationsApiV1(NoAuthAuthenticator(), transport=transport)
+        self.assertEqual(findings.get_note(ACCOUNT_ID, 'p1', 'n1'), 'sent')
+        notifications.get_public_key(ACCOUNT_ID)
+        self.assertEqual(transport.operations, ['get_note', 'get_public_key'])
+
+    def test_transport_is_keyword_only(self):
+        transport = RecordingTransport()
+        self.assertRaises(TypeError, FindingsApiV1, NoAuthAuthenticator(), 'findings_api', False, transport)
+        self.assertRaises(TypeError, NotificationsApiV1, NoAuthAuthenticator(), transport)
+
+    def test_set_transport(self):
+        service = NotificationsApiV1(NoAuthAuthenticator())
+        transport = RecordingTransport()
+        service.set_transport(transport)
+        self.assertIs(service.get_transport(), transport)
+        self.assertRaises(ValueError, service.set_transport, None)
+
+    def test_base_transport_is_abstract(self):
+        self.assertRaises(NotImplementedError, Transport().send, None, {})
+
+
+class TestMockBackend(unittest.TestCase):
+    """
+    Test the mock Findings and Notifications endpoints
+    """
+
+    def setUp(self):
+        self.backend = MockBackend(seed=1)
+        self.findings = FindingsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend))
+        self.notifications = NotificationsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend))
+
+    def test_occurrence_crud(self):
+        self.findings.create_occurrence(ACCOUNT_ID, 'sdktest', **make_occurrence('o1'))
+        result = self.findings.get_occurrence(ACCOUNT_ID, 'sdktest', 'o1').get_result()
+        self.assertEqual(result['id'], 'o1')
+        self.assertIn('update_time', result)
+        with self.assertRaises(ApiException) as context:
+            self.findings.create_occurrence(ACCOUNT_ID, 'sdktest', **make_occurrence('o1'))
+        self.assertEqual(context.exception.status_code, 409)
+        self.findings.create_occurrence(ACCOUNT_ID, 'sdktest', replace_if_exists=True, **make_occurrence('o1', 'HIGH'))
+        self.findings.delete_occurrence(ACCOUNT_ID, 'sdktest', 'o1')
+        with self.assertRaises(ApiException) as context:
+            self.findings.get_occurrence(ACCOUNT_ID, 'sdktest', 'o1')
+        self.assertEqual(context.exception.status_code, 404)
+
+    def test_list_occurrences_pagination(self):
+        self.backend.add_occurrences(ACCOUNT_ID, 'sdktest', [make_occurrence('o{0:02d}'.format(i)) for i in range(25)])
+        seen = []
+        page_token = None
+        while True:
+            result = self.findings.list_occurrences(ACCOUNT_ID, 'sdktest', page_size=10, page_token=page_token).get_result()
+            page = ApiListOccurrencesResponse.from_dict(result)
+            seen.extend(o.id for o in page.occurrences)
+            page_token = page.next_page_token
+            if not page_token:
+                break
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+    def test_list_providers_ranges(self):
+        for provider_id in ['a', 'b', 'c', 'd']:
+            self.backend.add_provider(ACCOUNT_ID, provider_id)
+        result = self.findings.list_providers(ACCOUNT_ID, start_provider_id='b', end_provider_id='c').get_result()
+        self.assertEqual([p['id'] for p in result['providers']], ['b', 'c'])
+        result = self.findings.list_providers(ACCOUNT_ID, limit=2, skip=1).get_result()
+        self.assertEqual([p['id'] for p in result['providers']], ['b', 'c'])
+
+    def test_channel_lifecycle(self):
+        created = self.notifications.create_notification_channel(
+            ACCOUNT_ID, 'channel1', 'Webhook', 'https://example.com', severity=['high']).get_result()
+        channel_id = created['channel_id']
+        channel = self.notifications.get_notification_channel(ACCOUNT_ID, channel_id).get_result()['channel']
+        self.assertEqual(channel['severity'], {'critical': False, 'high': True, 'medium': False, 'low': False})
+        self.notifications.update_notification_channel(ACCOUNT_ID, channel_id, 'channel2', 'Webhook', 'https://example.com')
+        self.assertEqual(self.notifications.test_notification_channel(ACCOUNT_ID, channel_id).get_result(), {'test': 'success'})
+        channels = ChannelsList.from_dict(self.notifications.list_all_channels(ACCOUNT_ID).get_result()).channels
+        self.assertEqual([c.name for c in channels], ['channel2'])
+        self.notifications.delete_notification_channels(ACCOUNT_ID, [channel_id])
+        self.assertEqual(self.notifications.list_all_channels(ACCOUNT_ID).get_result(), {'channels': []})
+
+    def test_list_channels_limit_skip(self):
+        self.backend.add_channels(ACCOUNT_ID, [{'name': 'c{0}'.format(i)} for i in range(5)])
+        result = self.notifications.list_all_channels(ACCOUNT_ID, limit=2, skip=2).get_result()
+        self.assertEqual([c['name'] for c in result['channels']], ['c2', 'c3'])
+
+    def test_injected_error(self):
+        self.backend.inject_error(503, operation_id='get_public_key')
+        with self.assertRaises(ApiException) as context:
+            self.notifications.get_public_key(ACCOUNT_ID)
+        self.assertEqual(context.exception.status_code, 503)
+        self.assertEqual(self.notifications.get_public_key(ACCOUNT_ID).get_result(), {'public_key': 'mock-public-key'})
+
+    def test_throttling(self):
+        self.backend.throttle_rate = 1.0
+        with self.assertRaises(ApiException) as context:
+            self.notifications.list_all_channels(ACCOUNT_ID)
+        self.assertEqual(context.exception.status_code, 429)
+        self.assertEqual(context.exception.http_response.headers['Retry-After'], '1')
+
+    def test_latency_and_timeout(self):
+        self.backend.latency = {'get_public_key': 0.05}
+        start = time.perf_counter()
+        self.notifications.get_public_key(ACCOUNT_ID)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+        self.notifications.set_http_config({'timeout': 0.01})
+        self.assertRaises(requests.exceptions.Timeout, self.notifications.get_public_key, ACCOUNT_ID)
+
+    def test_calls_are_counted(self):
+        self.notifications.list_all_channels(ACCOUNT_ID)
+        self.notifications.list_all_channels(ACCOUNT_ID)
+        self.assertEqual(self.backend.calls['list_all_channels'], 2)
+
+    def test_invalid_throttle_rate(self):
+        self.assertRaises(ValueError, MockBackend, throttle_rate=2)
@@ -0,0 +1,127 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test decoding and verification of notification payloads
+"""
+
+import json
+import unittest
+
+import pytest
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import NotificationsApiV1
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+from ibm_cloud_security_advisor.notification_receiver import (FindingEvent, NotificationReceiver,
+                                                              NotificationVerificationError, extract_token)
+
+jwt = pytest.importorskip('jwt')
+rsa = pytest.importorskip('cryptography.hazmat.primitives.asymmetric.rsa')
+serialization = pytest.importorskip('cryptography.hazmat.primitives.serialization')
+
+ACCOUNT_ID = 'account1'
+
+
+def make_key_pair():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.public_key().public_bytes(serialization.Encoding.PEM,
+                                                serialization.PublicFormat.SubjectPublicKeyInfo).decode('utf-8')
+    return (private_key, pem)
+
+
+def make_payload(private_key, **claims):
+    return json.dumps({'data': jwt.encode(claims, private_key, algorithm='RS256')})
+
+
+class TestNotificationReceiver(unittest.TestCase):
+    """
+    Test NotificationReceiver against the mock backend
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        (cls.private_key, cls.pem) = make_key_pair()
+        (cls.rotated_private_key, cls.rotated_pem) = make_key_pair()
+
+    def setUp(self):
+        self.backend = MockBackend(public_key=self.pem)
+        self.service = NotificationsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend))
+
+    def test_decode(self):
+        payload = make_payload(self.private_key, id='f1', name='Finding', severity='HIGH', provider_name='VA',
+                               account_id=ACCOUNT_ID, **{'issuer-url': 'https://example.com/f1'})
+        with NotificationReceiver(self.service, ACCOUNT_ID, processes=0) as receiver:
+            (event,) = receiver.decode(payload)
+        self.assertIsInstance(event, FindingEvent)
+        self.assertEqual((event.id, event.severity, event.issuer_url), ('f1', 'HIGH', 'https://example.com/f1'))
+        self.assertEqual(event.data['provider_name'], 'VA')
+
+    def test_findings_list(self):
+        payload = make_payload(self.private_key, account_id=ACCOUNT_ID,
+                               findings=[{'id': 'f1', 'severity': 'LOW'}, {'id': 'f2', 'severity': 'HIGH'}])
+        events = NotificationReceiver(self.service, ACCOUNT_ID, processes=0).decode(json.loads(payload))
+        self.assertEqual([(e.id, e.severity, e.account_id) for e in events],
+                         [('f1', 'LOW', ACCOUNT_ID), ('f2', 'HIGH', ACCOUNT_ID)])
+
+    def test_batch_over_process_pool(self):
+        payloads = [make_payload(self.private_key, id='f{0}'.format(i)) for i in range(40)]
+        with NotificationReceiver(self.service, ACCOUNT_ID, processes=2, chunk_size=8) as receiver:
+            events = list(receiver.iter_events(payloads))
+        self.assertEqual([e.id for e in events], ['f{0}'.format(i) for i in range(40)])
+        self.assertEqual(self.backend.calls['get_public_key'], 1)
+
+    def test_rotated_key_is_refetched(self):
+        receiver = NotificationReceiver(self.service, ACCOUNT_ID, processes=0)
+        receiver.decode(make_payload(self.private_key, id='before'))
+        self.backend.public_key = self.rotated_pem
+        payloads = [make_payload(self.rotated_private_key, id='after{0}'.format(i)) for i in range(3)]
+        self.assertEqual([e.id for e in receiver.iter_events(payloads)], ['after0', 'after1', 'after2'])
+        self.assertEqual(self.backend.calls['get_public_key'], 2)
+
+    def test_invalid_payloads(self):
+        (other_key, _) = make_key_pair()
+        payloads = [make_payload(self.private_key, id='ok'), make_payload(other_key, id='forged'), '{"x": 1}',
+                    'not-a-token']
+        errors = []
+        receiver = NotificationReceiver(self.service, ACCOUNT_ID, processes=0)
+        events = list(receiver.iter_events(payloads, on_error=errors.append))
+        self.assertEqual([e.id for e in events], ['ok'])
+        self.assertEqual([(e.index, e.reason) for e in errors],
+                         [(1, 'InvalidSignatureError'), (2, 'NotificationVerificationError'), (3, 'DecodeError')])
+        self.assertRaises(NotificationVerificationError, receiver.decode, payloads[1])
+
+    def test_forged_payloads_do_not_refetch_the_key(self):
+        (other_key, _) = make_key_pair()
+        forged = [make_payload(other_key, id='forged{0}'.format(i)) for i in range(20)]
+        receiver = NotificationReceiver(self.service, ACCOUNT_ID, processes=0)
+        errors = []
+        list(receiver.iter_events(forged, on_error=errors.append))
+        for payload in forged:
+            self.assertRaises(NotificationVerificationError, receiver.decode, payload)
+        self.assertEqual(len(errors), 20)
+        self.assertEqual(self.backend.calls['get_public_key'], 2)
+
+    def test_extract_token(self):
+        self.assertEqual(extract_token(b'{"data": "abc"}'), 'abc')
+        self.assertEqual(extract_token({'data': 'abc'}), 'abc')
+        self.assertEqual(extract_token(' abc '), 'abc')
+        self.assertRaises(NotificationVerificationError, extract_token, {'data': 1})
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, NotificationReceiver, None, ACCOUNT_ID)
+        self.assertRaises(ValueError, NotificationReceiver, self.service, None)
+        self.assertRaises(ValueError, NotificationReceiver, self.service, ACCOUNT_ID, chunk_size=0)
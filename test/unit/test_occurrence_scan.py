@@ -0,0 +1,176 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the account-wide occurrence scan
+"""
+
+import threading
+import time
+import unittest
+
+from ibm_cloud_sdk_core import ApiException
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import FindingsApiV1
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+from ibm_cloud_security_advisor.occurrence_scan import iter_token_pages, scan_partitions
+from ibm_cloud_security_advisor.transport import TransportWrapper
+
+ACCOUNT_ID = 'account1'
+
+
+def make_occurrences(provider_id, count):
+    return [{'id': '{0}-{1:03d}'.format(provider_id, i), 'note_name': '{0}/providers/{1}/notes/n1'.format(
+        ACCOUNT_ID, provider_id), 'kind': 'FINDING'} for i in range(count)]
+
+
+class PeakTransport(TransportWrapper):
+    """Transport that records the largest number of requests in flight."""
+
+    def __init__(self, transport):
+        super().__init__(transport)
+        self.in_flight = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def send(self, service, request, *, operation_id=None, **kwargs):
+        with self.lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            return self.transport.send(service, request, operation_id=operation_id, **kwargs)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class TestScanOccurrences(unittest.TestCase):
+    """
+    Test FindingsApiV1.scan_occurrences against the mock backend
+    """
+
+    def setUp(self):
+        self.backend = MockBackend()
+        self.service = FindingsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend))
+        self.counts = {'p{0}'.format(i): i * 3 for i in range(8)}
+        for (provider_id, count) in self.counts.items():
+            self.backend.add_provider(ACCOUNT_ID, provider_id)
+            self.backend.add_occurrences(ACCOUNT_ID, provider_id, make_occurrences(provider_id, count))
+
+    def test_iter_providers(self):
+        providers = list(self.service.iter_providers(ACCOUNT_ID, page_size=3, fanout=1))
+        self.assertEqual([p.id for p in providers], sorted(self.counts))
+        self.assertEqual(self.backend.calls['list_providers'], 4)
+        ranged = self.service.iter_providers(ACCOUNT_ID, start_provider_id='p2', end_provider_id='p4')
+        self.assertEqual([p.id for p in ranged], ['p2', 'p3', 'p4'])
+
+    def test_iter_occurrence_pages(self):
+        pages = list(self.service.iter_occurrence_pages(ACCOUNT_ID, 'p7', page_size=5))
+        self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 1])
+        self.assertEqual(pages[0][0]['id'], 'p7-000')
+
+    def test_scan_all_providers(self):
+        scanned = list(self.service.scan_occurrences(ACCOUNT_ID, page_size=4, max_workers=3))
+        self.assertEqual(len(scanned), sum(self.counts.values()))
+        by_provider = {}
+        for item in scanned:
+            by_provider.setdefault(item.provider_id, []).append(item.occurrence['id'])
+        for (provider_id, ids) in by_provider.items():
+            self.assertEqual(ids, [o['id'] for o in make_occurrences(provider_id, self.counts[provider_id])])
+
+    def test_scan_is_concurrent(self):
+        self.backend.latency = {'list_occurrences': 0.05}
+        start = time.perf_counter()
+        scanned = list(self.service.scan_occurrences(ACCOUNT_ID, provider_ids=['p1', 'p2', 'p3', 'p4'],
+                                                     max_workers=4))
+        self.assertEqual(len(scanned), 3 + 6 + 9 + 12)
+        self.assertLess(time.perf_counter() - start, 0.05 * 3)
+
+    def test_provider_listing_shares_the_concurrency_cap(self):
+        backend = MockBackend(latency={'list_providers': 0.01, 'list_occurrences': 0.01})
+        for i in range(600):
+            backend.add_provider(ACCOUNT_ID, 'p{0:03d}'.format(i))
+            backend.add_occurrences(ACCOUNT_ID, 'p{0:03d}'.format(i), make_occurrences('p{0:03d}'.format(i), 1))
+        transport = PeakTransport(MockTransport(backend))
+        service = FindingsApiV1(NoAuthAuthenticator(), transport=transport)
+        self.assertEqual(len(list(service.scan_occurrences(ACCOUNT_ID, max_workers=3))), 600)
+        self.assertGreater(backend.calls['list_providers'], 3)
+        self.assertLessEqual(transport.peak, 3)
+        self.assertRaises(ValueError, service.scan_occurrences, ACCOUNT_ID, max_workers=0)
+
+    def test_provider_errors(self):
+        self.backend.inject_error(500, operation_id='list_occurrences')
+        errors = []
+        scanned = list(self.service.scan_occurrences(ACCOUNT_ID, provider_ids=['p1', 'p2'], max_workers=1,
+                                                     on_error=lambda provider_id, err: errors.append(provider_id)))
+        self.assertEqual(errors, ['p1'])
+        self.assertEqual({item.provider_id for item in scanned}, {'p2'})
+        self.backend.inject_error(500, operation_id='list_occurrences')
+        with self.assertRaises(ApiException):
+            list(self.service.scan_occurrences(ACCOUNT_ID, provider_ids=['p1']))
+
+    def test_missing_account(self):
+        self.assertRaises(ValueError, self.service.scan_occurrences, None)
+        self.assertRaises(ValueError, self.service.iter_occurrence_pages, ACCOUNT_ID, None)
+
+
+class TestScanPartitions(unittest.TestCase):
+    """
+    Test the merging of concurrently streamed partitions
+    """
+
+    def test_concurrency_is_capped(self):
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def stream(partition):
+            with lock:
+                active.append(partition)
+                peak.append(len(active))
+            time.sleep(0.01)
+            with lock:
+                active.remove(partition)
+            yield [partition]
+
+        merged = list(scan_partitions(range(20), stream, max_workers=3))
+        self.assertEqual(sorted(page[0] for (_, page) in merged), list(range(20)))
+        self.assertLessEqual(max(peak), 3)
+
+    def test_close_stops_workers(self):
+        produced = []
+
+        def stream(partition):
+            for i in range(1000):
+                produced.append(i)
+                yield [i]
+
+        scan = scan_partitions(['a', 'b'], stream, max_workers=2, buffer_size=2)
+        next(scan)
+        scan.close()
+        count = len(produced)
+        time.sleep(0.05)
+        self.assertEqual(len(produced), count)
+        self.assertLess(count, 20)
+
+    def test_iter_token_pages(self):
+        tokens = {None: ([1, 2], 'a'), 'a': ([3], '')}
+        self.assertEqual(list(iter_token_pages(tokens.get)), [[1, 2], [3]])
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            next(scan_partitions([], lambda p: [], max_workers=0))
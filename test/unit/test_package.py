@@ -0,0 +1,64 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the lazily imported top-level names of the package
+"""
+
+import subprocess
+import sys
+import unittest
+
+import ibm_cloud_security_advisor
+from ibm_cloud_security_advisor import common
+
+
+def loaded_modules(code):
+    script = '{0}\nimport sys\nprint(" ".join(sorted(sys.modules)))'.format(code)
+    output = subprocess.run([sys.executable, '-c', script], check=True, stdout=subprocess.PIPE).stdout
+    return set(output.decode('utf-8').split())
+
+
+class TestLazyImports(unittest.TestCase):
+    """
+    Test that the service modules are imported on first use
+    """
+
+    def test_import_is_lazy(self):
+        modules = loaded_modules('import ibm_cloud_security_advisor')
+        self.assertNotIn('ibm_cloud_security_advisor.findings_api_v1', modules)
+        self.assertNotIn('ibm_cloud_security_advisor.notifications_api_v1', modules)
+        self.assertNotIn('ibm_cloud_sdk_core', modules)
+
+    def test_first_access_imports_one_module(self):
+        modules = loaded_modules('from ibm_cloud_security_advisor import NotificationsApiV1')
+        self.assertIn('ibm_cloud_security_advisor.notifications_api_v1', modules)
+        self.assertNotIn('ibm_cloud_security_advisor.findings_api_v1', modules)
+
+    def test_exported_names(self):
+        from ibm_cloud_security_advisor.findings_api_v1 import ApiOccurrence, FindingsApiV1
+        self.assertIs(ibm_cloud_security_advisor.FindingsApiV1, FindingsApiV1)
+        self.assertIs(ibm_cloud_security_advisor.ApiOccurrence, ApiOccurrence)
+        self.assertIn('ChannelInfo', dir(ibm_cloud_security_advisor))
+        for name in ibm_cloud_security_advisor.__all__:
+            self.assertTrue(hasattr(ibm_cloud_security_advisor, name), name)
+        with self.assertRaises(AttributeError):
+            ibm_cloud_security_advisor.NoSuchName  # pylint: disable=pointless-statement
+
+    def test_user_agent_is_deferred(self):
+        self.assertNotIn('platform', loaded_modules('import ibm_cloud_security_advisor.common'))
+        self.assertEqual(common.USER_AGENT, common.get_user_agent())
+        self.assertIs(common.get_user_agent(), common.get_user_agent())
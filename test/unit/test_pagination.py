@@ -0,0 +1,175 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the pagination helpers, the channel iterator and the provider iterator
+"""
+
+import random
+import threading
+import unittest
+
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import FindingsApiV1, NotificationsApiV1
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+from ibm_cloud_security_advisor.notifications_api_v1 import Channel
+from ibm_cloud_security_advisor.pagination import iter_key_ranges, iter_offset_windows, iter_unique, split_key_range
+
+ACCOUNT_ID = 'account1'
+
+
+class TestOffsetWindows(unittest.TestCase):
+    """
+    Test the windowed fetching of offset-paginated lists
+    """
+
+    def test_windows_are_in_order(self):
+        items = list(range(23))
+        for prefetch in (1, 3):
+            windows = list(iter_offset_windows(lambda skip, limit: items[skip:skip + limit], page_size=5,
+                                               prefetch=prefetch))
+            self.assertEqual([item for window in windows for item in window], items)
+
+    def test_exact_multiple_of_page_size(self):
+        calls = []
+
+        def fetch(skip, limit):
+            calls.append(skip)
+            return list(range(10))[skip:skip + limit]
+
+        self.assertEqual(sum(len(w) for w in iter_offset_windows(fetch, page_size=5, prefetch=1)), 10)
+        self.assertEqual(calls, [0, 5, 10])
+
+    def test_duplicates_are_skipped(self):
+        items = [{'id': 1}, {'id': 2}, {'id': 2}, {'id': None}, {'id': None}, {'id': 3}]
+        self.assertEqual([i['id'] for i in iter_unique(items, key=lambda i: i['id'])], [1, 2, None, None, 3])
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, list, iter_offset_windows(lambda skip, limit: [], page_size=0))
+        self.assertRaises(ValueError, list, iter_offset_windows(lambda skip, limit: [], prefetch=0))
+
+
+class RangeList():
+    """A sorted key list answering inclusive range requests."""
+
+    def __init__(self, keys):
+        self.keys = sorted(keys)
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def fetch(self, start, end, limit):
+        with self.lock:
+            self.requests.append((start, end))
+        return [k for k in self.keys if (start is None or k >= start) and (end is None or k <= end)][:limit]
+
+
+class TestKeyRanges(unittest.TestCase):
+    """
+    Test the concurrent listing of key ranges
+    """
+
+    def test_lists_every_key_once_in_order(self):
+        rng = random.Random(7)
+        keys = {''.join(rng.choice('abcdefghijklmnopqrstuvwxyz-0123456789') for _ in range(rng.randint(1, 12)))
+                for _ in range(2000)}
+        for (fanout, workers) in ((1, 1), (4, 8), (8, 3)):
+            source = RangeList(keys)
+            pages = list(iter_key_ranges(source.fetch, str, page_size=50, max_workers=workers, fanout=fanout))
+            self.assertEqual([k for page in pages for k in page], sorted(keys))
+
+    def test_dense_prefix(self):
+        keys = ['provider-{0:05d}'.format(i) for i in range(1000)] + ['z']
+        source = RangeList(keys)
+        listed = [k for page in iter_key_ranges(source.fetch, str, page_size=20, fanout=8) for k in page]
+        self.assertEqual(listed, keys)
+        self.assertLess(len(source.requests), 3 * len(keys) / 20)
+
+    def test_bounds_are_inclusive(self):
+        source = RangeList(['k{0:03d}'.format(i) for i in range(100)])
+        listed = [k for page in iter_key_ranges(source.fetch, str, start='k010', end='k060', page_size=7)
+                  for k in page]
+        self.assertEqual(listed, ['k{0:03d}'.format(i) for i in range(10, 61)])
+        self.assertTrue(all(end is not None and end <= 'k060' for (_, end) in source.requests))
+
+    def test_split_points(self):
+        points = split_key_range(['a', 'b'], 'z', 4)
+        self.assertEqual(len(points), 3)
+        self.assertEqual(points, sorted(points))
+        self.assertTrue(all('b' < p < 'z' for p in points))
+        unbounded = split_key_range(['aa', 'ab'], None, 4)
+        self.assertTrue(len(unbounded) == 3 and all(p > 'ab' for p in unbounded))
+        self.assertEqual(split_key_range(['a', 'b'], 'b', 4), [])
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, list, iter_key_ranges(lambda s, e, l: [], str, page_size=1))
+        self.assertRaises(ValueError, list, iter_key_ranges(lambda s, e, l: [], str, fanout=0))
+
+
+class TestIterProviders(unittest.TestCase):
+    """
+    Test streaming the providers of an account by provider_id range
+    """
+
+    def setUp(self):
+        self.backend = MockBackend()
+        self.service = FindingsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend))
+        self.provider_ids = ['provider-{0:04d}'.format(i) for i in range(500)]
+        for provider_id in self.provider_ids:
+            self.backend.add_provider(ACCOUNT_ID, provider_id)
+
+    def test_streams_all_providers(self):
+        providers = list(self.service.iter_providers(ACCOUNT_ID, page_size=50, max_workers=4))
+        self.assertEqual([p.id for p in providers], self.provider_ids)
+
+    def test_provider_range(self):
+        providers = self.service.iter_providers(ACCOUNT_ID, page_size=10, start_provider_id='provider-0100',
+                                                end_provider_id='provider-0149')
+        self.assertEqual([p.id for p in providers], self.provider_ids[100:150])
+
+    def test_account_id_is_validated_eagerly(self):
+        self.assertRaises(ValueError, self.service.iter_providers, None)
+
+
+class TestIterAllChannels(unittest.TestCase):
+    """
+    Test streaming the channels of an account
+    """
+
+    def setUp(self):
+        self.backend = MockBackend()
+        self.service = NotificationsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend))
+        self.backend.add_channels(ACCOUNT_ID, [{'name': 'c{0:04d}'.format(i)} for i in range(1050)])
+
+    def test_streams_all_channels(self):
+        channels = list(self.service.iter_all_channels(ACCOUNT_ID, page_size=100, prefetch=4))
+        self.assertEqual(len(channels), 1050)
+        self.assertIsInstance(channels[0], Channel)
+        self.assertEqual([c.name for c in channels], ['c{0:04d}'.format(i) for i in range(1050)])
+        self.assertLessEqual(self.backend.calls['list_all_channels'], 11 + 4)
+
+    def test_sequential(self):
+        self.assertEqual(len(list(self.service.iter_all_channels(ACCOUNT_ID, page_size=100, prefetch=1))), 1050)
+        self.assertEqual(self.backend.calls['list_all_channels'], 11)
+
+    def test_early_exit_bounds_requests(self):
+        for (index, _) in enumerate(self.service.iter_all_channels(ACCOUNT_ID, page_size=10, prefetch=3)):
+            if index == 15:
+                break
+        self.assertLessEqual(self.backend.calls['list_all_channels'], 1 + 2 * 3)
+
+    def test_account_id_is_validated_eagerly(self):
+        self.assertRaises(ValueError, self.service.iter_all_channels, None)
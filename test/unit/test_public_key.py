@@ -0,0 +1,205 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the notifications public key cache
+"""
+
+import threading
+import time
+import unittest
+
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import NotificationsApiV1
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+from ibm_cloud_security_advisor.public_key import PublicKeyCache, parse_public_key
+
+ACCOUNT_ID = 'account1'
+
+
+class FakeClock():
+    """A clock advanced by hand."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPublicKeyCache(unittest.TestCase):
+    """
+    Test expiry, single-flight refresh and stale key handling
+    """
+
+    def setUp(self):
+        self.keys = iter(['key{0}'.format(i) for i in range(100)])
+        self.fetches = 0
+        self.clock = FakeClock()
+
+    def fetch(self):
+        self.fetches += 1
+        return next(self.keys)
+
+    def test_ttl(self):
+        cache = PublicKeyCache(self.fetch, ttl=10, clock=self.clock)
+        self.assertEqual(cache.get(), 'key0')
+        self.clock.now = 9
+        self.assertEqual(cache.get(), 'key0')
+        self.clock.now = 10
+        self.assertEqual(cache.get(), 'key1')
+        self.assertEqual(self.fetches, 2)
+
+    def test_single_flight(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_fetch():
+            started.set()
+            release.wait(5)
+            return self.fetch()
+
+        cache = PublicKeyCache(slow_fetch)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get())) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        started.wait(5)
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['key0'] * 8)
+        self.assertEqual(self.fetches, 1)
+
+    def test_refresh_of_already_replaced_key(self):
+        cache = PublicKeyCache(self.fetch, clock=self.clock)
+        self.assertEqual(cache.refresh(cache.get()), 'key1')
+        # a second caller that saw key0 does not refetch
+        self.assertEqual(cache.refresh('key0'), 'key1')
+        self.assertEqual(self.fetches, 2)
+
+    def test_call_with_key_refetches_stale_key(self):
+        cache = PublicKeyCache(self.fetch)
+        cache.get()
+
+        def verify(key):
+            if key != 'key1':
+                raise ValueError('bad signature')
+            return 'verified'
+
+        self.assertEqual(cache.call_with_key(verify, retry_on=(ValueError,)), 'verified')
+        self.assertRaises(KeyError, cache.call_with_key, lambda key: {}[key], retry_on=(ValueError,))
+
+    def test_call_with_key_raises_when_key_unchanged(self):
+        cache = PublicKeyCache(lambda: 'same')
+
+        def verify(key):
+            raise ValueError('bad signature')
+
+        self.assertRaises(ValueError, cache.call_with_key, verify)
+
+    def test_unchanged_key_is_not_refetched_within_interval(self):
+        fetches = []
+
+        def fetch():
+            fetches.append(1)
+            return 'same'
+
+        def verify(key):
+            raise ValueError('bad signature')
+
+        cache = PublicKeyCache(fetch, min_refresh_interval=60, clock=self.clock)
+        for _ in range(100):
+            self.assertRaises(ValueError, cache.call_with_key, verify)
+        self.assertEqual(len(fetches), 2)
+        self.clock.now = 60
+        self.assertRaises(ValueError, cache.call_with_key, verify)
+        self.assertEqual(len(fetches), 3)
+        cache.refresh('same', force=True)
+        self.assertEqual(len(fetches), 4)
+
+    def test_fetch_errors_are_shared(self):
+        def failing():
+            raise RuntimeError('down')
+
+        cache = PublicKeyCache(failing)
+        self.assertRaises(RuntimeError, cache.get)
+        self.assertIsNone(cache.current)
+
+    def test_invalid_ttl(self):
+        self.assertRaises(ValueError, PublicKeyCache, self.fetch, ttl=-1)
+        self.assertRaises(ValueError, PublicKeyCache, self.fetch, min_refresh_interval=None)
+
+
+class TestParsePublicKey(unittest.TestCase):
+    """
+    Test that keys are parsed once
+    """
+
+    def test_parse_is_memoized(self):
+        try:
+            from cryptography.hazmat.primitives import serialization
+            from cryptography.hazmat.primitives.asymmetric import ec
+        except ImportError:
+            self.skipTest('cryptography is not installed')
+        pem = ec.generate_private_key(ec.SECP256R1()).public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo).decode('utf-8')
+        self.assertIs(parse_public_key(pem), parse_public_key(pem))
+
+
+class TestCachedPublicKey(unittest.TestCase):
+    """
+    Test the public key cache of NotificationsApiV1
+    """
+
+    def setUp(self):
+        self.backend = MockBackend(public_key='key-a')
+        self.service = NotificationsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend))
+
+    def test_cached_per_account(self):
+        for _ in range(5):
+            self.assertEqual(self.service.get_cached_public_key(ACCOUNT_ID), 'key-a')
+        self.service.get_cached_public_key('account2')
+        self.assertEqual(self.backend.calls['get_public_key'], 2)
+
+    def test_rotation(self):
+        self.service.get_cached_public_key(ACCOUNT_ID)
+        self.backend.public_key = 'key-b'
+        seen = []
+
+        def decrypt(key):
+            seen.append(key)
+            if key != 'key-b':
+                raise ValueError('stale key')
+            return 'payload'
+
+        self.assertEqual(self.service.call_with_public_key(ACCOUNT_ID, decrypt, retry_on=(ValueError,)), 'payload')
+        self.assertEqual(seen, ['key-a', 'key-b'])
+        self.assertEqual(self.service.get_cached_public_key(ACCOUNT_ID), 'key-b')
+
+    def test_refresh_and_ttl(self):
+        self.service.set_public_key_ttl(0)
+        self.service.get_cached_public_key(ACCOUNT_ID)
+        self.service.get_cached_public_key(ACCOUNT_ID)
+        self.assertEqual(self.backend.calls['get_public_key'], 2)
+        self.service.set_public_key_ttl(60)
+        self.service.get_cached_public_key(ACCOUNT_ID, refresh=True)
+        self.service.get_cached_public_key(ACCOUNT_ID)
+        self.assertEqual(self.backend.calls['get_public_key'], 3)
+        self.assertRaises(ValueError, self.service.set_public_key_ttl, -1)
+        self.assertRaises(ValueError, self.service.get_cached_public_key, None)
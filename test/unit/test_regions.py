@@ -0,0 +1,127 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Test routing calls across regions
+"""
+
+import unittest
+
+from ibm_cloud_sdk_core import ApiException
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import FindingsApiV1, NotificationsApiV1
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+from ibm_cloud_security_advisor.regions import RegionalRouter, region_url
+from ibm_cloud_security_advisor.transport import Transport
+
+ACCOUNT_ID = 'account1'
+PROVIDER_ID = 'provider1'
+
+
+class RegionalTransport(Transport):
+    """Transport that serves each region from its own mock backend."""
+
+    def __init__(self, backends):
+        self.transports = {region: MockTransport(backend) for (region, backend) in backends.items()}
+
+    def send(self, service, request, *, operation_id=None, **kwargs):
+        region = service.service_url.split('//')[1].split('.')[0]
+        return self.transports[region].send(service, request, operation_id=operation_id, **kwargs)
+
+
+class TestRegionalRouter(unittest.TestCase):
+    """
+    Test home regions, failover and shared resources
+    """
+
+    def setUp(self):
+        self.backends = {region: MockBackend() for region in ('us-south', 'eu-gb', 'eu-de')}
+        for (region, backend) in self.backends.items():
+            backend.add_occurrences(ACCOUNT_ID, PROVIDER_ID, [{'id': 'o1', 'kind': 'FINDING', 'note_name': region}])
+        self.clock_time = 0.0
+        self.router = RegionalRouter(FindingsApiV1, NoAuthAuthenticator(), transport=RegionalTransport(self.backends),
+                                     home_regions={ACCOUNT_ID: 'eu-de'}, clock=self.clock)
+
+    def clock(self):
+        self.clock_time += 0.01
+        return self.clock_time
+
+    def note_name(self, account_id=ACCOUNT_ID):
+        return self.router.get_occurrence(account_id, PROVIDER_ID, 'o1').get_result()['note_name']
+
+    def test_region_urls(self):
+        self.assertEqual(region_url(FindingsApiV1, 'eu-gb'), 'https://eu-gb.secadvisor.cloud.ibm.com/findings')
+        self.assertEqual(region_url(NotificationsApiV1, 'eu-de'),
+                         'https://eu-de.secadvisor.cloud.ibm.com/notifications')
+        clients = list(self.router.clients.values())
+        self.assertEqual(len({id(client.get_http_client()) for client in clients}), 1)
+        self.assertEqual(len({id(client.authenticator) for client in clients}), 1)
+
+    def test_routes_to_home_region(self):
+        self.assertEqual(self.note_name(), 'eu-de')
+        self.assertEqual(self.router.stats()['eu-de']['requests'], 1)
+        self.assertEqual(self.router.get_occurrence(account_id=ACCOUNT_ID, provider_id=PROVIDER_ID,
+                                                    occurrence_id='o1').get_result()['note_name'], 'eu-de')
+
+    def test_read_fails_over(self):
+        self.backends['eu-de'].inject_error(503, operation_id='get_occurrence')
+        self.assertIn(self.note_name(), ('us-south', 'eu-gb'))
+        self.assertEqual(self.router.failovers, 1)
+        self.assertEqual(self.router.stats()['eu-de']['errors'], 1)
+
+    def test_client_errors_and_writes_do_not_fail_over(self):
+        self.assertRaises(ApiException, self.router.get_note, ACCOUNT_ID, PROVIDER_ID, 'missing')
+        self.backends['eu-de'].inject_error(503, operation_id='delete_occurrence')
+        self.assertRaises(ApiException, self.router.delete_occurrence, ACCOUNT_ID, PROVIDER_ID, 'o1')
+        self.assertEqual(self.router.failovers, 0)
+        self.assertEqual(sum(backend.calls['delete_occurrence'] for backend in self.backends.values()), 1)
+
+    def test_accounts_without_home_go_to_fastest_healthy_region(self):
+        self.router._stats['us-south'].record(0.5, False)
+        self.router._stats['eu-gb'].record(0.1, False)
+        self.router._stats['eu-de'].record(0.05, False)
+        for _ in range(5):
+            self.router._stats['eu-de'].record(0.05, True)
+        self.assertEqual(self.router.route('other'), ['eu-gb', 'us-south', 'eu-de'])
+        self.assertEqual(self.router.route(ACCOUNT_ID)[0], 'eu-de')
+
+    def test_writes_of_accounts_without_home_stay_in_one_region(self):
+        for backend in self.backends.values():
+            backend.add_occurrences('other', PROVIDER_ID, [{'id': 'o{0}'.format(i), 'kind': 'FINDING',
+                                                            'note_name': 'n'} for i in range(2)])
+        self.router._stats['us-south'].record(0.5, False)
+        self.router._stats['eu-gb'].record(0.1, False)
+        self.router._stats['eu-de'].record(0.2, False)
+        self.router.delete_occurrence('other', PROVIDER_ID, 'o0')
+        self.router._stats['eu-gb'].record(5.0, False)
+        self.router.delete_occurrence('other', PROVIDER_ID, 'o1')
+        self.assertEqual(self.backends['eu-gb'].calls['delete_occurrence'], 2)
+        self.assertEqual(self.router.home_region('other'), 'eu-gb')
+        self.assertEqual(self.router.route('other')[0], 'eu-gb')
+        router = RegionalRouter(FindingsApiV1, NoAuthAuthenticator(), transport=RegionalTransport(self.backends),
+                                default_region='us-south')
+        router.delete_occurrence('other', PROVIDER_ID, 'o0')
+        self.assertEqual(self.backends['us-south'].calls['delete_occurrence'], 1)
+        self.assertRaises(ValueError, RegionalRouter, FindingsApiV1, NoAuthAuthenticator(), default_region='mars')
+
+    def test_unknown_operations_and_regions(self):
+        self.assertRaises(AttributeError, getattr, self.router, 'no_such_method')
+        self.assertRaises(ValueError, self.router.client, 'mars')
+        router = RegionalRouter(FindingsApiV1, NoAuthAuthenticator(), regions={'local': 'http://localhost/findings'},
+                                home_regions=lambda account_id: 'mars')
+        self.assertRaises(ValueError, router.route, ACCOUNT_ID)
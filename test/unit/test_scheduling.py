@@ -0,0 +1,131 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Test the priority scheduler
+"""
+
+import threading
+import time
+import unittest
+
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import FindingsApiV1
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+from ibm_cloud_security_advisor.scheduling import (BULK, INTERACTIVE, NORMAL, PriorityTransport,
+                                                   get_request_priority, request_priority)
+from ibm_cloud_security_advisor.transport import DeadlineExceeded, deadline
+
+ACCOUNT_ID = 'account1'
+
+
+class TestPriorityTransport(unittest.TestCase):
+    """
+    Test queuing, weighted fairness and reserved slots
+    """
+
+    def setUp(self):
+        self.grants = []
+        self.threads = []
+
+    def enqueue(self, scheduler, priority):
+        waiting = scheduler.snapshot()[priority]['waiting']
+
+        def request():
+            scheduler.acquire(priority)
+            self.grants.append(priority)
+            scheduler.release()
+
+        thread = threading.Thread(target=request)
+        thread.start()
+        self.threads.append(thread)
+        while scheduler.snapshot()[priority]['waiting'] == waiting:
+            time.sleep(0.001)
+
+    def drain(self, scheduler):
+        scheduler.release()
+        for thread in self.threads:
+            thread.join()
+
+    def test_interactive_goes_first(self):
+        scheduler = PriorityTransport(MockTransport(), max_concurrent=1)
+        scheduler.acquire(BULK)
+        for _ in range(5):
+            self.enqueue(scheduler, BULK)
+        self.enqueue(scheduler, INTERACTIVE)
+        self.drain(scheduler)
+        self.assertEqual(self.grants[0], INTERACTIVE)
+        self.assertEqual(scheduler.snapshot()[BULK]['queued'], 5)
+
+    def test_weighted_fair_share(self):
+        scheduler = PriorityTransport(MockTransport(), max_concurrent=1, weights={NORMAL: 4, BULK: 1})
+        scheduler.acquire(NORMAL)
+        for _ in range(8):
+            self.enqueue(scheduler, BULK)
+            self.enqueue(scheduler, NORMAL)
+        self.drain(scheduler)
+        self.assertEqual(self.grants[:5].count(NORMAL), 4)
+        self.assertEqual(self.grants[:10].count(BULK), 2)
+        self.assertEqual(len(self.grants), 16)
+
+    def test_reserved_slots(self):
+        scheduler = PriorityTransport(MockTransport(), max_concurrent=2, reserved=1)
+        scheduler.acquire(BULK)
+        self.enqueue(scheduler, BULK)
+        scheduler.acquire(INTERACTIVE)
+        self.assertEqual(scheduler.snapshot()[INTERACTIVE]['queued'], 0)
+        scheduler.release()
+        self.drain(scheduler)
+        self.assertEqual(self.grants, [BULK])
+        self.assertRaises(ValueError, PriorityTransport, max_concurrent=2, reserved=2)
+        self.assertRaises(ValueError, PriorityTransport, weights={'urgent': 32})
+
+    def test_deadline_while_queued(self):
+        scheduler = PriorityTransport(MockTransport(), max_concurrent=1)
+        scheduler.acquire(NORMAL)
+        with deadline(0.05):
+            self.assertRaises(DeadlineExceeded, scheduler.acquire, NORMAL)
+        self.assertEqual(scheduler.snapshot()[NORMAL]['waiting'], 0)
+        scheduler.release()
+        scheduler.acquire(BULK)
+
+    def test_interactive_latency_during_bulk_ingestion(self):
+        backend = MockBackend(latency=0.05)
+        transport = PriorityTransport(MockTransport(backend), max_concurrent=2)
+        service = FindingsApiV1(NoAuthAuthenticator(), transport=transport)
+
+        def bulk():
+            with request_priority(BULK):
+                for _ in range(5):
+                    service.list_providers(ACCOUNT_ID)
+
+        threads = [threading.Thread(target=bulk) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.1)
+        with request_priority(INTERACTIVE):
+            self.assertEqual(get_request_priority(), INTERACTIVE)
+            start = time.perf_counter()
+            service.list_providers(ACCOUNT_ID)
+            latency = time.perf_counter() - start
+        for thread in threads:
+            thread.join()
+        self.assertLess(latency, 0.15)
+        self.assertEqual(get_request_priority(), NORMAL)
+        self.assertEqual(transport.snapshot()[BULK]['sent'], 40)
+        self.assertRaises(ValueError, request_priority('urgent').__enter__)
@@ -0,0 +1,95 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the scoped SDK logging
+"""
+
+import logging
+import unittest
+
+from ibm_cloud_sdk_core import ApiException
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import FindingsApiV1, NotificationsApiV1
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+from ibm_cloud_security_advisor.sdk_logging import LOGGER_NAME
+
+ACCOUNT_ID = 'account1'
+
+
+class TestSdkLogging(unittest.TestCase):
+    """
+    Test that logging is scoped to the SDK logger and each client
+    """
+
+    def setUp(self):
+        self.backend = MockBackend()
+        logging.getLogger(LOGGER_NAME).setLevel(logging.DEBUG)
+
+    def tearDown(self):
+        logging.getLogger(LOGGER_NAME).setLevel(logging.NOTSET)
+
+    def findings(self, **kwargs):
+        return FindingsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend), **kwargs)
+
+    def test_client_does_not_change_global_logging(self):
+        logging.disable(logging.NOTSET)
+        self.findings()
+        self.findings(enable_error_log=True)
+        self.assertEqual(logging.root.manager.disable, logging.NOTSET)
+        with self.assertLogs('test.application', level=logging.ERROR):
+            logging.getLogger('test.application').error('still logged')
+
+    def test_error_log_disabled_by_default(self):
+        service = self.findings()
+        self.assertFalse(service.log.is_enabled_for(logging.ERROR))
+        with self.assertRaises(AssertionError):
+            with self.assertLogs(LOGGER_NAME):
+                self.assertRaises(ApiException, service.get_note, ACCOUNT_ID, 'p1', 'missing')
+
+    def test_enable_error_log(self):
+        service = self.findings(enable_error_log=True)
+        with self.assertLogs(LOGGER_NAME, level=logging.ERROR) as logs:
+            self.assertRaises(ApiException, service.get_note, ACCOUNT_ID, 'p1', 'missing')
+        self.assertIn('get_note failed with status 404', logs.output[0])
+
+    def test_per_client_level(self):
+        quiet = NotificationsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend),
+                                   log_level=logging.CRITICAL)
+        loud = NotificationsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend),
+                                  enable_error_log=True)
+        default = NotificationsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend))
+        self.assertFalse(quiet.log.is_enabled_for(logging.ERROR))
+        self.assertTrue(loud.log.is_enabled_for(logging.ERROR))
+        self.assertFalse(default.log.is_enabled_for(logging.ERROR))
+        quiet.set_log_level('ERROR')
+        self.assertTrue(quiet.log.is_enabled_for(logging.ERROR))
+        self.assertRaises(ValueError, quiet.set_log_level, 'LOUD')
+
+    def test_sampled_timing(self):
+        service = self.findings(log_level=logging.DEBUG)
+        self.assertEqual(service.instrumentation.hooks, [])
+        service.set_log_level(logging.DEBUG, sample_rate=1.0)
+        with self.assertLogs(LOGGER_NAME, level=logging.DEBUG) as logs:
+            service.list_providers(ACCOUNT_ID)
+        self.assertIn('findings_api.list_providers GET -> 200', logs.output[0])
+        service.set_log_level(logging.INFO)
+        self.assertEqual(service.instrumentation.hooks, [])
+
+    def test_invalid_sample_rate(self):
+        service = self.findings()
+        self.assertRaises(ValueError, service.set_log_level, logging.DEBUG, sample_rate=2)
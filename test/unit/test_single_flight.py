@@ -0,0 +1,178 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Test coalescing of identical concurrent requests
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+
+from ibm_cloud_sdk_core import ApiException
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import FindingsApiV1
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+from ibm_cloud_security_advisor.single_flight import SingleFlight, SingleFlightTransport
+from ibm_cloud_security_advisor.transport import DeadlineExceeded, deadline
+
+ACCOUNT_ID = 'account1'
+PROVIDER_ID = 'provider1'
+CALLERS = 8
+
+
+def run_concurrently(func, count=CALLERS):
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def call(index):
+        barrier.wait()
+        try:
+            results[index] = func()
+        except Exception as err:  # pylint: disable=broad-except
+            results[index] = err
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestSingleFlightTransport(unittest.TestCase):
+    """
+    Test SingleFlightTransport with the findings client
+    """
+
+    def setUp(self):
+        self.backend = MockBackend(latency=0.3)
+        self.backend.add_occurrences(ACCOUNT_ID, PROVIDER_ID, [
+            {'id': 'o1', 'kind': 'FINDING', 'note_name': '{0}/providers/{1}/notes/n1'.format(ACCOUNT_ID, PROVIDER_ID)}])
+        self.transport = SingleFlightTransport(MockTransport(self.backend))
+        self.service = FindingsApiV1(NoAuthAuthenticator(), transport=self.transport)
+
+    def test_identical_reads_share_one_request(self):
+        responses = run_concurrently(lambda: self.service.get_occurrence(ACCOUNT_ID, PROVIDER_ID, 'o1'))
+        self.assertEqual(self.backend.calls['get_occurrence'], 1)
+        self.assertEqual(self.transport.flight.coalesced, CALLERS - 1)
+        self.assertEqual({r.get_result()['id'] for r in responses}, {'o1'})
+        responses[0].get_result()['id'] = 'changed'
+        self.assertEqual(responses[1].get_result()['id'], 'o1')
+
+    def test_errors_are_shared(self):
+        errors = run_concurrently(lambda: self.service.get_note(ACCOUNT_ID, PROVIDER_ID, 'missing'))
+        self.assertEqual(self.backend.calls['get_note'], 1)
+        self.assertTrue(all(isinstance(e, ApiException) and e.status_code == 404 for e in errors))
+
+    def test_different_requests_and_writes_are_not_coalesced(self):
+        run_concurrently(lambda: self.service.get_occurrence(ACCOUNT_ID, PROVIDER_ID, 'o1'), count=2)
+        self.assertEqual(self.backend.calls['get_occurrence'], 1)
+        self.service.get_occurrence(ACCOUNT_ID, PROVIDER_ID, 'o1')
+        self.assertEqual(self.backend.calls['get_occurrence'], 2)
+        run_concurrently(lambda: self.service.delete_occurrence(ACCOUNT_ID, PROVIDER_ID, 'missing'), count=3)
+        self.assertEqual(self.backend.calls['delete_occurrence'], 3)
+
+    def test_operations_filter(self):
+        self.transport = SingleFlightTransport(MockTransport(self.backend), operations=['get_note'])
+        self.service.set_transport(self.transport)
+        run_concurrently(lambda: self.service.get_occurrence(ACCOUNT_ID, PROVIDER_ID, 'o1'), count=3)
+        self.assertEqual(self.backend.calls['get_occurrence'], 3)
+
+
+class TestSingleFlight(unittest.TestCase):
+    """
+    Test waiting for a shared call
+    """
+
+    def test_waiting_stops_at_the_deadline(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        finish = threading.Event()
+
+        def slow():
+            started.set()
+            finish.wait(5)
+            return 'result'
+
+        leader = threading.Thread(target=flight.call, args=('key', slow))
+        leader.start()
+        started.wait(5)
+        start = time.perf_counter()
+        with deadline(0.05):
+            self.assertRaises(DeadlineExceeded, flight.call, 'key', slow)
+        self.assertLess(time.perf_counter() - start, 1)
+        finish.set()
+        leader.join()
+        self.assertEqual(flight.call('key', slow), ('result', False))
+
+    def test_waiting_coroutine_stops_at_the_deadline(self):
+        flight = SingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.5)
+            return 'result'
+
+        async def follower():
+            await asyncio.sleep(0)
+            with deadline(0.05):
+                return await flight.call_async('key', slow)
+
+        async def main():
+            return await asyncio.gather(flight.call_async('key', slow), follower(), return_exceptions=True)
+
+        (leader, waiting) = asyncio.run(main())
+        self.assertEqual(leader, ('result', False))
+        self.assertIsInstance(waiting, DeadlineExceeded)
+
+
+class TestSingleFlightAsync(unittest.TestCase):
+    """
+    Test coalescing coroutines
+    """
+
+    def test_call_async(self):
+        flight = SingleFlight()
+        started = []
+
+        async def fetch():
+            started.append(1)
+            await asyncio.sleep(0.05)
+            return {'id': 'n1'}
+
+        async def main():
+            return await asyncio.gather(*(flight.call_async('n1', fetch) for _ in range(5)))
+
+        results = asyncio.run(main())
+        self.assertEqual(len(started), 1)
+        self.assertEqual([shared for (_, shared) in results], [False, True, True, True, True])
+        self.assertEqual((flight.calls, flight.coalesced), (1, 4))
+
+    def test_client_in_executor(self):
+        backend = MockBackend(latency=0.2)
+        transport = SingleFlightTransport(MockTransport(backend))
+        service = FindingsApiV1(NoAuthAuthenticator(), transport=transport)
+
+        async def main():
+            loop = asyncio.get_event_loop()
+            return await asyncio.gather(*(loop.run_in_executor(None, service.list_providers, ACCOUNT_ID)
+                                          for _ in range(4)), return_exceptions=True)
+
+        asyncio.run(main())
+        self.assertLess(backend.calls['list_providers'], 4)
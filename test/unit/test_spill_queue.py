@@ -0,0 +1,201 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Test the durable spill queue
+"""
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from ibm_cloud_sdk_core import ApiException
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import FindingsApiV1
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+from ibm_cloud_security_advisor.spill_queue import (FSYNC_ALWAYS, SpillQueue, drain_occurrences,
+                                                    is_permanent_failure, main)
+from ibm_cloud_security_advisor.write_buffer import OccurrenceBuffer
+
+ACCOUNT_ID = 'account1'
+PROVIDER_ID = 'provider1'
+
+
+def occurrence(i, note='n1'):
+    return {'provider_id': PROVIDER_ID, 'id': 'o{0}'.format(i), 'kind': 'FINDING',
+            'note_name': '{0}/providers/{1}/notes/{2}'.format(ACCOUNT_ID, PROVIDER_ID, note),
+            'finding': {'severity': 'LOW'}}
+
+
+class TestSpillQueue(unittest.TestCase):
+    """
+    Test appending, committing and recovering
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def segments(self):
+        return sorted(name for name in os.listdir(self.directory) if name.startswith('segment-'))
+
+    def test_redelivers_until_committed(self):
+        with SpillQueue(self.directory) as queue:
+            queue.put_many(range(5))
+            (items, position) = queue.peek(3)
+            self.assertEqual(items, [0, 1, 2])
+            self.assertEqual(queue.peek(3)[0], [0, 1, 2])
+        with SpillQueue(self.directory) as queue:
+            self.assertEqual(len(queue), 5)
+            queue.commit(position)
+            self.assertEqual(queue.peek(10)[0], [3, 4])
+        with SpillQueue(self.directory) as queue:
+            self.assertEqual(len(queue), 2)
+            self.assertRaises(ValueError, queue.commit, (0, 0))
+
+    def test_rotates_and_compacts_segments(self):
+        with SpillQueue(self.directory, segment_bytes=32, fsync=FSYNC_ALWAYS) as queue:
+            queue.put_many({'n': i} for i in range(10))
+            for i in range(10, 20):
+                queue.put({'n': i})
+            self.assertEqual(len(self.segments()), 7)
+            (items, position) = queue.peek(15)
+            self.assertEqual([item['n'] for item in items], list(range(15)))
+            queue.commit(position)
+            self.assertEqual(len(self.segments()), 4)
+            (items, position) = queue.peek(100)
+            self.assertEqual([item['n'] for item in items], list(range(15, 20)))
+
+    def test_skips_torn_and_damaged_records(self):
+        with SpillQueue(self.directory) as queue:
+            queue.put_many(['a', 'b', 'c'])
+        path = os.path.join(self.directory, self.segments()[0])
+        with open(path, 'rb') as segment_file:
+            lines = segment_file.readlines()
+        lines[1] = lines[1].replace(b'"b"', b'"x"')
+        with open(path, 'wb') as segment_file:
+            segment_file.write(b''.join(lines) + b'0000abcd {"tor')
+        with self.assertLogs('ibm_cloud_security_advisor', 'WARNING'):
+            with SpillQueue(self.directory) as queue:
+                queue.put('d')
+                self.assertEqual(queue.peek(10)[0], ['a', 'c', 'd'])
+
+    def test_dead_letters_and_replay(self):
+        with SpillQueue(self.directory) as queue:
+            queue.dead_letter([{'id': 1}, {'id': 2}])
+            self.assertEqual(queue.dead_letters(), [{'id': 1}, {'id': 2}])
+        output = io.StringIO()
+        with redirect_stdout(output):
+            main(['stats', self.directory])
+            main(['replay', self.directory])
+        self.assertEqual(json.loads(output.getvalue().splitlines()[0])['dead_letters'], 2)
+        self.assertIn('replayed 2 items', output.getvalue())
+        with SpillQueue(self.directory) as queue:
+            self.assertEqual(queue.dead_letters(), [])
+            self.assertEqual(queue.peek(10)[0], [{'id': 1}, {'id': 2}])
+
+    def test_is_permanent_failure(self):
+        self.assertTrue(is_permanent_failure(ApiException(400)))
+        self.assertTrue(is_permanent_failure(ValueError('note_name must be provided')))
+        self.assertFalse(is_permanent_failure(ApiException(429)))
+        self.assertFalse(is_permanent_failure(ApiException(503)))
+
+
+class TestDrainOccurrences(unittest.TestCase):
+    """
+    Test draining a queue into the service
+    """
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.backend = MockBackend()
+        self.service = FindingsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend))
+
+    def stored(self):
+        return len(list(self.service.scan_occurrences(ACCOUNT_ID, provider_ids=[PROVIDER_ID])))
+
+    def test_drain(self):
+        with SpillQueue(self.directory) as queue:
+            queue.put_many(occurrence(i) for i in range(10))
+            queue.put(dict(occurrence(10), note_name=None))
+            result = drain_occurrences(self.service, ACCOUNT_ID, queue, batch_size=4, max_workers=1)
+            self.assertEqual((result.written, result.dead_lettered, result.retried), (10, 1, 0))
+            self.assertEqual(len(queue), 0)
+            self.assertEqual(queue.dead_letters()[0]['id'], 'o10')
+        self.assertEqual(self.stored(), 10)
+
+    def test_stops_on_outage_without_losing_items(self):
+        with SpillQueue(self.directory) as queue:
+            queue.put_many(occurrence(i) for i in range(6))
+            self.backend.inject_error(503, count=2, operation_id='create_occurrence')
+            result = drain_occurrences(self.service, ACCOUNT_ID, queue, batch_size=3, max_workers=1)
+            self.assertEqual((result.written, result.retried), (1, 2))
+            self.assertEqual(len(queue), 5)
+            result = drain_occurrences(self.service, ACCOUNT_ID, queue, batch_size=3, max_workers=1)
+            self.assertEqual((result.written, result.retried), (5, 0))
+        self.assertEqual(self.stored(), 6)
+
+    def test_retry_never_overwrites_a_later_version(self):
+        with SpillQueue(self.directory) as queue:
+            queue.put_many([occurrence(1), dict(occurrence(1), finding={'severity': 'HIGH'}), occurrence(2)])
+            queue.put_many([dict(occurrence(2), finding={'severity': 'HIGH'})])
+            self.backend.inject_error(503, count=2, operation_id='create_occurrence')
+            result = drain_occurrences(self.service, ACCOUNT_ID, queue, batch_size=3, max_workers=1)
+            # o1 is written once and the failed o2 is superseded by the version still queued
+            self.assertEqual((result.written, result.retried, result.coalesced), (0, 1, 2))
+            result = drain_occurrences(self.service, ACCOUNT_ID, queue, batch_size=3, max_workers=1)
+            self.assertEqual((result.written, result.retried, result.coalesced), (2, 0, 0))
+            self.assertEqual(len(queue), 0)
+        for occurrence_id in ('o1', 'o2'):
+            stored = self.service.get_occurrence(ACCOUNT_ID, PROVIDER_ID, occurrence_id).get_result()
+            self.assertEqual(stored['finding']['severity'], 'HIGH')
+
+    def test_buffer_spills_failed_writes(self):
+        with SpillQueue(self.directory) as queue:
+            self.backend.inject_error(503, count=3, operation_id='create_occurrence')
+            with OccurrenceBuffer(self.service, ACCOUNT_ID, flush_interval=None, max_workers=1,
+                                  spill=queue) as buffer:
+                for i in range(5):
+                    payload = occurrence(i)
+                    del payload['provider_id']
+                    buffer.add(PROVIDER_ID, payload)
+            self.assertEqual((buffer.written, buffer.spilled), (2, 3))
+            drain_occurrences(self.service, ACCOUNT_ID, queue)
+        self.assertEqual(self.stored(), 5)
+
+    def test_drain_never_replays_a_stale_version(self):
+        with SpillQueue(self.directory) as queue:
+            self.backend.inject_error(503, count=1, operation_id='create_occurrence')
+            buffer = OccurrenceBuffer(self.service, ACCOUNT_ID, flush_interval=None, spill=queue)
+            buffer.add(PROVIDER_ID, dict(occurrence(1), provider_id=None))
+            buffer.flush()
+            buffer.close()
+            # a new buffer, as after a restart, must not write ahead of the spilled version
+            buffer = OccurrenceBuffer(self.service, ACCOUNT_ID, flush_interval=None, spill=queue)
+            buffer.add(PROVIDER_ID, dict(occurrence(1), provider_id=None, finding={'severity': 'HIGH'}))
+            buffer.flush()
+            buffer.close()
+            self.assertEqual(buffer.spilled, 1)
+            drain_occurrences(self.service, ACCOUNT_ID, queue)
+        stored = self.service.get_occurrence(ACCOUNT_ID, PROVIDER_ID, 'o1').get_result()
+        self.assertEqual(stored['finding']['severity'], 'HIGH')
@@ -0,0 +1,181 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the shared IAM token cache
+"""
+
+import json
+import os
+import signal
+import tempfile
+import threading
+import time
+import unittest
+
+import responses
+from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
+
+from ibm_cloud_security_advisor.token_cache import SharedTokenAuthenticator, SharedTokenCache, token_expiration
+
+IAM_URL = 'https://iam.example.com'
+
+
+class FakeClock():
+    """A clock advanced by hand."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSharedTokenCache(unittest.TestCase):
+    """
+    Test caching, refresh scheduling and single-flight fetching
+    """
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.fetch_threads = []
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'token.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def fetch(self, lifetime=100):
+        self.fetch_threads.append(threading.current_thread().name)
+        return {'access_token': 'token{0}'.format(len(self.fetch_threads)), 'expires_in': lifetime}
+
+    def test_cached_until_refresh_time(self):
+        cache = SharedTokenCache(self.fetch, background=False, clock=self.clock)
+        self.assertEqual([cache.get_token() for _ in range(3)], ['token1'] * 3)
+        self.clock.now += 79
+        self.assertEqual(cache.get_token(), 'token1')
+        self.clock.now += 1
+        self.assertEqual(cache.get_token(), 'token2')
+        self.assertEqual(cache.fetches, 2)
+
+    def test_shared_through_file(self):
+        first = SharedTokenCache(self.fetch, path=self.path, background=False, clock=self.clock)
+        second = SharedTokenCache(self.fetch, path=self.path, background=False, clock=self.clock)
+        self.assertEqual(first.get_token(), second.get_token())
+        self.assertEqual(len(self.fetch_threads), 1)
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+        # a token written by another process is adopted on refresh
+        self.clock.now += 80
+        self.assertEqual(first.get_token(), 'token2')
+        self.assertEqual(second.get_token(), 'token2')
+        self.assertEqual(len(self.fetch_threads), 2)
+
+    def test_expired_file_is_ignored(self):
+        with open(self.path, 'w') as cache_file:
+            json.dump({'access_token': 'old', 'expiration': 900, 'refresh_time': 800}, cache_file)
+        cache = SharedTokenCache(self.fetch, path=self.path, background=False, clock=self.clock)
+        self.assertEqual(cache.get_token(), 'token1')
+
+    def test_single_flight(self):
+        release = threading.Event()
+
+        def slow_fetch():
+            release.wait(5)
+            return self.fetch()
+
+        caches = [SharedTokenCache(slow_fetch, path=self.path, background=False, clock=self.clock)] * 4 + [
+            SharedTokenCache(slow_fetch, path=self.path, background=False, clock=self.clock) for _ in range(4)]
+        results = []
+        threads = [threading.Thread(target=lambda c=cache: results.append(c.get_token())) for cache in caches]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ['token1'] * 8)
+        self.assertEqual(len(self.fetch_threads), 1)
+
+    def test_background_refresh(self):
+        cache = SharedTokenCache(lambda: self.fetch(lifetime=0.2), refresh_fraction=0.5, expiry_skew=0)
+        try:
+            self.assertEqual(cache.get_token(), 'token1')
+            deadline = time.time() + 2
+            while len(self.fetch_threads) < 3 and time.time() < deadline:
+                self.assertTrue(cache.get_token().startswith('token'))
+                time.sleep(0.01)
+        finally:
+            cache.close()
+        self.assertGreaterEqual(len(self.fetch_threads), 3)
+        self.assertEqual(set(self.fetch_threads[1:]), {'token-refresh'})
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork')
+    def test_refresh_thread_restarts_after_fork(self):
+        cache = SharedTokenCache(self.fetch)
+        try:
+            cache.get_token()
+            pid = os.fork()
+            if pid == 0:
+                cache.get_token()
+                os._exit(0 if cache._thread.is_alive() else 1)  # pylint: disable=protected-access
+            (_, status) = os.waitpid(pid, 0)
+            self.assertEqual(status, 0)
+        finally:
+            cache.close()
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requires os.fork')
+    def test_fork_while_lock_is_held(self):
+        cache = SharedTokenCache(self.fetch, background=False, expiry_skew=0, clock=self.clock)
+        cache.get_token()
+        self.clock.now += 200
+        # Another thread is refreshing when the process forks.
+        with cache._lock:  # pylint: disable=protected-access
+            pid = os.fork()
+            if pid == 0:
+                signal.alarm(5)
+                os._exit(0 if cache.get_token() == 'token2' else 1)
+        (_, status) = os.waitpid(pid, 0)
+        self.assertEqual(status, 0)
+
+    def test_token_expiration(self):
+        self.assertEqual(token_expiration({'expiration': 1600, 'expires_in': 3600}, 1000), (1000, 1600))
+        self.assertEqual(token_expiration({'expires_in': 60}, 1000), (1000, 1060))
+        self.assertRaises(ValueError, SharedTokenCache, self.fetch, refresh_fraction=0)
+
+
+class TestSharedTokenAuthenticator(unittest.TestCase):
+    """
+    Test wrapping an IAMAuthenticator
+    """
+
+    @responses.activate
+    def test_authenticators_share_token(self):
+        responses.add(responses.POST, IAM_URL + '/identity/token',
+                      json={'access_token': 'iam-token', 'expires_in': 3600, 'expiration': int(time.time()) + 3600})
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'token.json')
+            authenticators = [SharedTokenAuthenticator(IAMAuthenticator('apikey', url=IAM_URL), path=path,
+                                                       background=False) for _ in range(3)]
+            for authenticator in authenticators:
+                request = {'headers': {}}
+                authenticator.authenticate(request)
+                self.assertEqual(request['headers']['Authorization'], 'Bearer iam-token')
+            self.assertEqual(len(responses.calls), 1)
+            self.assertEqual(authenticators[0].authentication_type(), 'iam')
+
+    def test_requires_token_manager(self):
+        self.assertRaises(ValueError, SharedTokenAuthenticator, None)
+        self.assertRaises(ValueError, SharedTokenAuthenticator, object())
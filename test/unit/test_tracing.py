@@ -0,0 +1,151 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test Transaction-Id propagation and the span recorder
+"""
+
+import contextvars
+import threading
+import unittest
+import uuid
+
+from ibm_cloud_sdk_core import ApiException
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import FindingsApiV1, NotificationsApiV1
+from ibm_cloud_security_advisor.instrumentation import record_retry
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+from ibm_cloud_security_advisor.tracing import (SpanRecorder, current_span, get_transaction_id, span, transaction,
+                                                use_span)
+from ibm_cloud_security_advisor.transport import TransportWrapper
+
+ACCOUNT_ID = 'account1'
+
+
+class HeaderRecordingTransport(TransportWrapper):
+    """Transport that records the Transaction-Id of every request."""
+
+    def __init__(self, transport=None):
+        super().__init__(transport)
+        self.transaction_ids = []
+
+    def send(self, service, request, *, operation_id=None, **kwargs):
+        self.transaction_ids.append(request['headers'].get('Transaction-Id'))
+        return self.transport.send(service, request, operation_id=operation_id, **kwargs)
+
+
+class TestTransactionId(unittest.TestCase):
+    """
+    Test that a Transaction-Id is generated and propagated across both clients
+    """
+
+    def setUp(self):
+        self.transport = HeaderRecordingTransport(MockTransport(MockBackend()))
+        self.findings = FindingsApiV1(NoAuthAuthenticator(), transport=self.transport)
+        self.notifications = NotificationsApiV1(NoAuthAuthenticator(), transport=self.transport)
+
+    def test_generated_per_request(self):
+        self.findings.list_providers(ACCOUNT_ID)
+        self.notifications.list_all_channels(ACCOUNT_ID)
+        first, second = self.transport.transaction_ids
+        self.assertEqual(uuid.UUID(first).version, 4)
+        self.assertNotEqual(first, second)
+
+    def test_propagated_from_context(self):
+        with transaction() as transaction_id:
+            self.assertEqual(get_transaction_id(), transaction_id)
+            self.findings.list_providers(ACCOUNT_ID)
+            self.notifications.list_all_channels(ACCOUNT_ID)
+        self.assertIsNone(get_transaction_id())
+        self.assertEqual(self.transport.transaction_ids, [transaction_id, transaction_id])
+
+    def test_explicit_transaction_id_wins(self):
+        with transaction('outer'):
+            self.notifications.list_all_channels(ACCOUNT_ID, transaction_id='explicit')
+        self.assertEqual(self.transport.transaction_ids, ['explicit'])
+
+    def test_nested_transaction_reuses_id(self):
+        with transaction('outer'):
+            with transaction() as inner:
+                self.assertEqual(inner, 'outer')
+
+
+class TestSpanRecorder(unittest.TestCase):
+    """
+    Test the call trees captured by the span recorder
+    """
+
+    def setUp(self):
+        self.backend = MockBackend()
+        self.findings = FindingsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend))
+        self.notifications = NotificationsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend))
+        self.recorder = SpanRecorder()
+
+    def test_call_tree(self):
+        with self.recorder.span('workflow', account_id=ACCOUNT_ID) as root:
+            with span('page', number=1):
+                self.findings.list_providers(ACCOUNT_ID)
+            self.notifications.list_all_channels(ACCOUNT_ID)
+            with self.assertRaises(ApiException):
+                self.findings.get_note(ACCOUNT_ID, 'p1', 'missing')
+        self.assertEqual(self.recorder.spans, [root])
+        self.assertEqual([child.name for child in root.children], ['page', 'list_all_channels', 'get_note'])
+        operation = root.children[0].children[0]
+        self.assertEqual(operation.name, 'list_providers')
+        self.assertEqual(operation.attributes['status_code'], 200)
+        self.assertEqual(operation.transaction_id, root.transaction_id)
+        self.assertEqual(operation.attributes['transaction_id'], root.transaction_id)
+        self.assertIsInstance(root.children[2].error, ApiException)
+        self.assertEqual(len(root.find('list_providers')), 1)
+        self.assertEqual(root.to_dict()['children'][0]['attributes'], {'number': 1})
+
+    def test_fan_out_across_threads(self):
+        with self.recorder.span('fan_out') as root:
+            threads = [threading.Thread(target=contextvars.copy_context().run,
+                                        args=(self.findings.list_providers, ACCOUNT_ID)) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(root.find('list_providers')), 4)
+
+    def test_retry_events(self):
+        with self.recorder.span('retrying') as root:
+            record_retry()
+        self.assertEqual([name for (_, name, _) in root.events], ['retry'])
+
+    def test_use_span(self):
+        with self.recorder.span('root') as root:
+            with use_span(None):
+                self.assertIsNone(current_span())
+                self.findings.list_providers(ACCOUNT_ID)
+            self.assertIs(current_span(), root)
+        self.assertEqual(root.children, [])
+        self.assertIsNone(current_span())
+
+    def test_span_outside_recorder_is_noop(self):
+        with span('orphan') as orphan:
+            self.findings.list_providers(ACCOUNT_ID)
+        self.assertIsNone(orphan)
+        self.assertEqual(self.recorder.spans, [])
+
+    def test_max_spans(self):
+        recorder = SpanRecorder(max_spans=2)
+        for name in ['a', 'b', 'c']:
+            with recorder.span(name):
+                pass
+        self.assertEqual([s.name for s in recorder.spans], ['b', 'c'])
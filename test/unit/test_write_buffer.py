@@ -0,0 +1,190 @@
+# coding: utf-8
+
+# (C) Copyright IBM Corp. 2021.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Test the write-behind occurrence buffer
+"""
+
+import tempfile
+import threading
+import time
+import unittest
+
+from ibm_cloud_sdk_core.authenticators.no_auth_authenticator import NoAuthAuthenticator
+
+from ibm_cloud_security_advisor import FindingsApiV1
+from ibm_cloud_security_advisor.findings_api_v1 import ApiOccurrence
+from ibm_cloud_security_advisor.mock_backend import MockBackend, MockTransport
+from ibm_cloud_security_advisor.spill_queue import SpillQueue
+from ibm_cloud_security_advisor.write_buffer import BufferFullError, OccurrenceBuffer
+
+ACCOUNT_ID = 'account1'
+PROVIDER_ID = 'provider1'
+
+
+def detection(occurrence_id, severity='LOW'):
+    return {'id': occurrence_id, 'note_name': '{0}/providers/{1}/notes/n1'.format(ACCOUNT_ID, PROVIDER_ID),
+            'kind': 'FINDING', 'finding': {'severity': severity}}
+
+
+class TestCreateOccurrences(unittest.TestCase):
+    """
+    Test FindingsApiV1.create_occurrences
+    """
+
+    def setUp(self):
+        self.backend = MockBackend()
+        self.service = FindingsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend))
+
+    def test_results_in_order(self):
+        occurrences = [dict(detection('o{0}'.format(i)), provider_id=PROVIDER_ID) for i in range(5)]
+        self.backend.inject_error(500, operation_id='create_occurrence')
+        results = self.service.create_occurrences(ACCOUNT_ID, occurrences, max_workers=1)
+        self.assertEqual([r.ok for r in results], [False, True, True, True, True])
+        self.assertIsInstance(results[1].result, ApiOccurrence)
+        self.assertEqual(results[4].result.id, 'o4')
+        self.assertRaises(ValueError, self.service.create_occurrences, ACCOUNT_ID, None)
+
+
+class TestOccurrenceBuffer(unittest.TestCase):
+    """
+    Test coalescing and flushing
+    """
+
+    def setUp(self):
+        self.backend = MockBackend()
+        self.service = FindingsApiV1(NoAuthAuthenticator(), transport=MockTransport(self.backend))
+
+    def stored_severity(self, occurrence_id):
+        result = self.service.get_occurrence(ACCOUNT_ID, PROVIDER_ID, occurrence_id).get_result()
+        return result['finding']['severity']
+
+    def test_coalesces_last_write_wins(self):
+        with OccurrenceBuffer(self.service, ACCOUNT_ID, flush_interval=None) as buffer:
+            for i in range(100):
+                buffer.add(PROVIDER_ID, detection('o{0}'.format(i % 10), severity='HIGH' if i >= 90 else 'LOW'))
+            self.assertEqual(len(buffer), 10)
+        self.assertEqual(self.backend.calls['create_occurrence'], 10)
+        self.assertEqual((buffer.added, buffer.coalesced, buffer.written), (100, 90, 10))
+        self.assertEqual(self.stored_severity('o3'), 'HIGH')
+
+    def test_size_triggered_flush(self):
+        buffer = OccurrenceBuffer(self.service, ACCOUNT_ID, max_size=5, flush_interval=None)
+        for i in range(5):
+            buffer.add(PROVIDER_ID, detection('o{0}'.format(i)))
+        deadline = time.time() + 2
+        while buffer.written < 5 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(buffer.written, 5)
+        buffer.close()
+
+    def test_timed_flush_and_rewrite(self):
+        buffer = OccurrenceBuffer(self.service, ACCOUNT_ID, flush_interval=0.02)
+        buffer.add(PROVIDER_ID, detection('o1'))
+        time.sleep(0.1)
+        self.assertEqual(buffer.written, 1)
+        buffer.add(PROVIDER_ID, detection('o1', severity='CRITICAL'))
+        buffer.close()
+        self.assertEqual(self.stored_severity('o1'), 'CRITICAL')
+        self.assertRaises(RuntimeError, buffer.add, PROVIDER_ID, detection('o2'))
+
+    def test_failed_writes(self):
+        failures = []
+        self.backend.inject_error(500, operation_id='create_occurrence')
+        buffer = OccurrenceBuffer(self.service, ACCOUNT_ID, flush_interval=None, on_error=failures.append)
+        buffer.add(PROVIDER_ID, detection('o1'))
+        buffer.add(PROVIDER_ID, detection('o2'))
+        results = buffer.close()
+        self.assertEqual(len(results), 2)
+        self.assertEqual([f.item['id'] for f in failures], ['o1'])
+        self.assertEqual((buffer.written, buffer.failed), (1, 1))
+
+    def stall_writes(self):
+        released = threading.Event()
+        self.backend.latency = lambda operation_id, path: released.wait(5) and 0.0
+        self.addCleanup(released.set)
+        return released
+
+    def wait_for_calls(self, count):
+        deadline = time.time() + 2
+        while self.backend.calls['create_occurrence'] < count and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_pending_cap_blocks_while_stalled(self):
+        released = self.stall_writes()
+        buffer = OccurrenceBuffer(self.service, ACCOUNT_ID, max_size=2, max_pending=4, max_wait=0.05,
+                                  flush_interval=None, max_workers=2)
+        for i in range(2):
+            buffer.add(PROVIDER_ID, detection('o{0}'.format(i)))
+        self.wait_for_calls(2)
+        buffer.add(PROVIDER_ID, detection('o2'))
+        buffer.add(PROVIDER_ID, detection('o3'))
+        self.assertRaises(BufferFullError, buffer.add, PROVIDER_ID, detection('o4'))
+        # replacing a pending occurrence needs no room
+        buffer.add(PROVIDER_ID, detection('o3', severity='HIGH'))
+        self.assertEqual(len(buffer), 2)
+        released.set()
+        buffer.add(PROVIDER_ID, detection('o4'))
+        buffer.close()
+        self.assertEqual((buffer.written, buffer.coalesced), (5, 1))
+
+    def test_pending_cap_spills_while_stalled(self):
+        released = self.stall_writes()
+        with tempfile.TemporaryDirectory() as directory:
+            queue = SpillQueue(directory, fsync='never')
+            buffer = OccurrenceBuffer(self.service, ACCOUNT_ID, max_size=2, max_pending=4, flush_interval=None,
+                                      max_workers=2, spill=queue)
+            for i in range(2):
+                buffer.add(PROVIDER_ID, detection('o{0}'.format(i)))
+            self.wait_for_calls(2)
+            for i in range(2, 10):
+                buffer.add(PROVIDER_ID, detection('o{0}'.format(i)))
+            self.assertEqual((len(buffer), buffer.spilled), (2, 6))
+            released.set()
+            buffer.close()
+            (items, _) = queue.peek(10)
+            queue.close()
+        self.assertEqual([item['id'] for item in items], ['o{0}'.format(i) for i in range(4, 10)])
+        self.assertEqual(items[0]['provider_id'], PROVIDER_ID)
+        self.assertEqual(buffer.written, 4)
+
+    def test_later_versions_follow_a_spilled_one(self):
+        released = self.stall_writes()
+        with tempfile.TemporaryDirectory() as directory:
+            queue = SpillQueue(directory, fsync='never')
+            buffer = OccurrenceBuffer(self.service, ACCOUNT_ID, max_size=2, max_pending=4, flush_interval=None,
+                                      max_workers=2, spill=queue)
+            for i in range(2):
+                buffer.add(PROVIDER_ID, detection('o{0}'.format(i)))
+            self.wait_for_calls(2)
+            for i in range(2, 5):
+                buffer.add(PROVIDER_ID, detection('o{0}'.format(i)))
+            released.set()
+            buffer.flush()
+            # o4 overflowed, so its next version must not be written ahead of it
+            buffer.add(PROVIDER_ID, detection('o4', severity='HIGH'))
+            self.assertEqual((len(buffer), buffer.spilled), (0, 2))
+            buffer.close()
+            (items, _) = queue.peek(10)
+            queue.close()
+        self.assertEqual([item['finding']['severity'] for item in items], ['LOW', 'HIGH'])
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, OccurrenceBuffer, None, ACCOUNT_ID)
+        self.assertRaises(ValueError, OccurrenceBuffer, self.service, ACCOUNT_ID, max_size=0)
+        self.assertRaises(ValueError, OccurrenceBuffer, self.service, ACCOUNT_ID, max_size=10, max_pending=5)
+        with OccurrenceBuffer(self.service, ACCOUNT_ID) as buffer:
+            self.assertRaises(ValueError, buffer.add, PROVIDER_ID, {'note_name': 'x'})